@@ -0,0 +1,84 @@
+"""Benchmark: Supabase round trips per login/refresh, REST call chains vs the session RPCs.
+
+Replays the calls the secure login and refresh endpoints used to make
+(login: user lookup, active-session check, session PATCH, session upsert;
+refresh: session lookup, last_activity PATCH, session PATCH, session upsert,
+user lookup) against the new sequences (login: user lookup +
+``start_user_session``; refresh: ``rotate_user_session``) through a local stub
+that adds ``--rtt`` ms to every request, standing in for the network hop to
+Supabase. Password verification and token signing are left out so the
+numbers reflect round trips only.
+
+    python -m benchmarks.bench_auth_round_trips --rtt 20 --iterations 50
+"""
+import argparse
+import asyncio
+import statistics
+import time
+import httpx
+from benchmarks.stub_server import StubHTTPServer
+
+USER = {"id": "00000000-0000-0000-0000-000000000001", "email": "a@example.com", "plan": "free", "password_hash": "x"}
+SESSION = {"id": "00000000-0000-0000-0000-0000000000aa", "device_id": "device-1", "is_active": True}
+
+def handler(method, path, body):
+    if path.startswith("/rpc/start_user_session"):
+        return "ok"
+    if path.startswith("/rpc/rotate_user_session"):
+        return [{"device_id": "device-1", "email": USER["email"], "plan": USER["plan"]}]
+    if path.startswith("/users"):
+        return [USER]
+    if path.startswith("/user_sessions") and method == "GET":
+        return [SESSION]
+    return []
+
+async def legacy_login(client: httpx.AsyncClient):
+    await client.get(f"/users?email=eq.{USER['email']}")
+    await client.get(f"/user_sessions?user_id=eq.{USER['id']}&is_active=eq.true")
+    await client.patch(f"/user_sessions?user_id=eq.{USER['id']}", json={"is_active": False})
+    await client.post("/user_sessions", json={"user_id": USER["id"], "device_id": "device-1"})
+
+async def rpc_login(client: httpx.AsyncClient):
+    await client.get(f"/users?email=eq.{USER['email']}&select=id,email,plan,password_hash")
+    await client.post("/rpc/start_user_session", json={"p_user_id": USER["id"], "p_device_id": "device-1"})
+
+async def legacy_refresh(client: httpx.AsyncClient):
+    await client.get(f"/user_sessions?user_id=eq.{USER['id']}&refresh_token_hash=eq.x&is_active=eq.true")
+    await client.patch(f"/user_sessions?id=eq.{SESSION['id']}", json={"last_activity": "now"})
+    await client.patch(f"/user_sessions?user_id=eq.{USER['id']}", json={"is_active": False})
+    await client.post("/user_sessions", json={"user_id": USER["id"], "device_id": "device-1"})
+    await client.get(f"/users?id=eq.{USER['id']}")
+
+async def rpc_refresh(client: httpx.AsyncClient):
+    await client.post("/rpc/rotate_user_session", json={"p_user_id": USER["id"], "p_device_id": "device-1"})
+
+async def measure(name: str, flow, client: httpx.AsyncClient, stub: StubHTTPServer, iterations: int):
+    await flow(client)  # warm the pooled connection
+    before = stub.requests
+    latencies = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        await flow(client)
+        latencies.append((time.perf_counter() - start) * 1000)
+    calls = (stub.requests - before) / iterations
+    print(f"{name:16s} {calls:4.0f} calls  p50={statistics.median(latencies):7.2f}ms  "
+          f"p95={sorted(latencies)[int(len(latencies) * 0.95) - 1]:7.2f}ms")
+    return statistics.median(latencies)
+
+async def main(rtt_ms: float, iterations: int):
+    async with StubHTTPServer(request_delay=rtt_ms / 1000, handler=handler) as stub:
+        async with httpx.AsyncClient(base_url=stub.url) as client:
+            print(f"Simulated Supabase round trip: {rtt_ms:.0f}ms")
+            legacy = await measure("login (REST)", legacy_login, client, stub, iterations)
+            rpc = await measure("login (RPC)", rpc_login, client, stub, iterations)
+            print(f"  login speedup x{legacy / rpc:.1f}")
+            legacy = await measure("refresh (REST)", legacy_refresh, client, stub, iterations)
+            rpc = await measure("refresh (RPC)", rpc_refresh, client, stub, iterations)
+            print(f"  refresh speedup x{legacy / rpc:.1f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rtt", type=float, default=20.0, help="simulated round trip in ms")
+    parser.add_argument("--iterations", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(main(args.rtt, args.iterations))
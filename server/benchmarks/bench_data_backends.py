@@ -0,0 +1,89 @@
+"""Benchmark: PostgREST vs direct Postgres repository on the hot-path queries.
+
+Times ``get_user`` (every authenticated request on a user-cache miss) and
+``increment_monthly_usage`` (every analysis; charged with count 0 so the test
+user's usage doesn't change) on both backends, sequentially and with
+``--concurrency`` callers.
+
+Against a real project (needs SUPABASE_URL/SUPABASE_SERVICE_KEY, DATABASE_URL
+and asyncpg, and a test user):
+
+    python -m benchmarks.bench_data_backends --user-id <uuid> --iterations 200
+
+Without ``--user-id`` it only measures the PostgREST backend's in-process
+cost (httpx + JSON on our side) against a zero-latency local stub.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from benchmarks.stub_server import StubHTTPServer
+from config.settings import settings
+from chefbot.services.http_client import upstream_clients
+from chefbot.services.repository import ASYNCPG_AVAILABLE, PostgresRepository, PostgrestRepository, Repository
+
+USER = {
+    "id": "00000000-0000-0000-0000-000000000001", "email": "a@example.com", "plan": "free",
+    "password_hash": "$2b$12$" + "x" * 53, "monthly_usage": 3, "usage_month": "2026-10",
+    "email_verified": True, "created_at": "2026-01-01T00:00:00+00:00",
+}
+
+async def measure(label: str, call, iterations: int, concurrency: int) -> float:
+    await call()  # warm the pool / statement cache
+    latencies = []
+
+    async def worker(count: int):
+        for _ in range(count):
+            start = time.perf_counter()
+            await call()
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(iterations // concurrency) for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    print(f"{label:34s} p50={statistics.median(latencies):7.3f}ms  p95={latencies[int(len(latencies) * 0.95) - 1]:7.3f}ms  "
+          f"{len(latencies) / elapsed:8.0f}/s")
+    return statistics.median(latencies)
+
+async def run_backend(repository: Repository, user_id: str, iterations: int, concurrency: int):
+    month = time.strftime("%Y-%m")
+    for callers in sorted({1, concurrency}):
+        await measure(f"{repository.name} get_user x{callers}", lambda: repository.get_user(user_id), iterations, callers)
+        await measure(f"{repository.name} increment_usage x{callers}",
+                      lambda: repository.increment_monthly_usage(user_id, 0, month, settings.FREE_MAX_MONTHLY),
+                      iterations, callers)
+
+async def local_overhead(iterations: int, concurrency: int):
+    def handler(method, path, body):
+        return [{"allowed": True, "monthly_usage": 3, "usage_month": "2026-10"}] if "/rpc/" in path else [USER]
+
+    async with StubHTTPServer(handler=handler) as stub:
+        settings.SUPABASE_URL = stub.url
+        await run_backend(PostgrestRepository(), USER["id"], iterations, concurrency)
+    print("(local stub, no network: this is the REST/JSON cost the direct backend avoids, plus the stub's own)")
+
+async def main(user_id: str, iterations: int, concurrency: int):
+    if not user_id:
+        await local_overhead(iterations, concurrency)
+    else:
+        await run_backend(PostgrestRepository(), user_id, iterations, concurrency)
+        if not ASYNCPG_AVAILABLE or not settings.DATABASE_URL:
+            print("skipping postgres backend: needs asyncpg and DATABASE_URL")
+        else:
+            direct = PostgresRepository(settings.DATABASE_URL, 1, max(concurrency, 1), settings.DATABASE_STATEMENT_CACHE_SIZE,
+                                        settings.DATABASE_TIMEOUT_SECONDS)
+            await direct.start()
+            try:
+                await run_backend(direct, user_id, iterations, concurrency)
+            finally:
+                await direct.close()
+    await upstream_clients.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--user-id", default="", help="existing test user (omit for the local stub run)")
+    parser.add_argument("--iterations", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+    asyncio.run(main(args.user_id, args.iterations, args.concurrency))
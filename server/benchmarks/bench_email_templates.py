@@ -0,0 +1,62 @@
+"""Benchmark: email rendering cost vs queueing it, as in a bulk re-verification campaign.
+
+Times the one-off template compile (CSS inlining + minify) that now happens
+at startup, the per-message render of the precompiled templates (HTML +
+text), and the outbox enqueue each message also pays.
+
+    python -m benchmarks.bench_email_templates --messages 20000
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from chefbot.services.email_outbox import EmailOutbox
+from chefbot.services.email_templates import EmailTemplates, TEMPLATE_DIR
+
+def bench_compile(rounds: int = 20):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        templates = EmailTemplates(TEMPLATE_DIR)
+    elapsed = (time.perf_counter() - start) / rounds * 1000
+    print(f"compile all templates       {elapsed:8.2f}ms  (once at startup)")
+    return templates
+
+def bench_render(templates: EmailTemplates, messages: int):
+    start = time.perf_counter()
+    for i in range(messages):
+        rendered = templates.render(
+            "verify_email",
+            greeting=f"Hi user{i}!",
+            verification_url=f"https://app.example.com/verify-email?token=token-{i}"
+        )
+    elapsed = time.perf_counter() - start
+    print(f"render verify_email         {elapsed / messages * 1e6:8.2f}us  ({messages / elapsed:,.0f}/s, "
+          f"html {len(rendered.html)}B + text {len(rendered.text)}B)")
+    return elapsed / messages
+
+async def bench_enqueue(templates: EmailTemplates, messages: int):
+    outbox = EmailOutbox(os.path.join(tempfile.mkdtemp(), "outbox.db"), batch_size=50, max_attempts=1, retry_base_seconds=1)
+    rendered = templates.render("verify_email", greeting="Hi!", verification_url="https://app.example.com/verify-email?token=x")
+    message = {"from": "Chef Bot <test@example.com>", "to": ["a@example.com"], "subject": rendered.subject,
+               "html": rendered.html, "text": rendered.text}
+    count = min(messages, 2000)
+    start = time.perf_counter()
+    for _ in range(count):
+        await outbox.enqueue(message)
+    elapsed = time.perf_counter() - start
+    await outbox.stop()
+    print(f"outbox enqueue              {elapsed / count * 1e6:8.2f}us")
+    return elapsed / count
+
+def main(messages: int):
+    templates = bench_compile()
+    render = bench_render(templates, messages)
+    enqueue = asyncio.run(bench_enqueue(templates, messages))
+    print(f"rendering is {100 * render / (render + enqueue):.1f}% of per-message work before the HTTP send")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=20000)
+    args = parser.parse_args()
+    main(args.messages)
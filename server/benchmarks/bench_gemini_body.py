@@ -0,0 +1,176 @@
+"""Benchmark: peak memory and event-loop stalls while sending a Gemini request with a large image.
+
+Compares two ways of sending the same generateContent body to a local stub:
+
+- ``dict``: the previous path. The payload dict holds the whole base64
+  string, and httpx ``json.dumps`` it and encodes it to bytes, all on the
+  event loop
+- ``streamed``: ``GeminiRequestBody``. Prefix JSON, then base64 chunks
+  encoded in a worker thread, then suffix JSON, with an exact
+  ``Content-Length``
+
+Each mode and image size runs in a fresh subprocess, which sends
+``--requests`` requests ``--concurrency`` at a time. A sampler thread records
+peak RSS above the pre-run baseline. A 1 ms heartbeat task records the worst
+event-loop stall, the p99 heartbeat lag, and the time per request that the
+loop spent in stalls over 0.5 ms. The stub (in the parent process) decodes
+every body and checks the image came through intact. First, the streamed
+bytes are checked to equal ``json.dumps`` of the dict.
+
+    python -m benchmarks.bench_gemini_body --sizes-mb 5,10,15
+"""
+import argparse
+import asyncio
+import base64
+import json
+import random
+import sys
+import time
+from benchmarks.bench_upload_memory import PeakRss, rss_kb
+from benchmarks.stub_server import StubHTTPServer
+from chefbot.services import gemini_service
+from chefbot.services.gemini_service import GENERATION_CONFIG, SYSTEM_PROMPT, GeminiRequestBody
+from config.settings import settings
+
+PROMPT = 'vegetarian, "no nuts"'
+REPLY = json.dumps({"ingredients": ["eggs"], "recipes": [{"title": "Omelette", "ingredients": ["2 eggs"],
+                                                          "steps": ["Whisk", "Cook"], "timeMins": 10}]})
+
+def test_image(size: int) -> bytes:
+    """Deterministic incompressible bytes, so the stub can check them"""
+    return random.Random(size).randbytes(size)
+
+def dict_payload(image_data: bytes, prompt: str = "", mime_type: str = "image/jpeg") -> dict:
+    """The generateContent dict as built before the body was streamed"""
+    system_prompt = SYSTEM_PROMPT
+    if prompt:
+        system_prompt += f"\n\nUser's additional request: {prompt}"
+    return {
+        "contents": [{
+            "parts": [
+                {"text": system_prompt},
+                {"inline_data": {"mime_type": mime_type, "data": base64.b64encode(image_data).decode("utf-8")}}
+            ]
+        }],
+        "generationConfig": GENERATION_CONFIG,
+    }
+
+async def check_equivalence():
+    for size in (0, 1, 2, 3, 1000, 3 * 256 * 1024, 3 * 256 * 1024 + 1, 2_000_003):
+        image = test_image(size)
+        for prompt in ("", PROMPT + ' "chefbot-image-data" ünïcode'):
+            body = GeminiRequestBody(image, prompt, "image/png")
+            streamed = b"".join([chunk async for chunk in body])
+            assert streamed == json.dumps(dict_payload(image, prompt, "image/png")).encode(), (size, prompt)
+            assert len(streamed) == len(body), size
+    print("streamed body is byte-identical to json.dumps of the dict payload")
+
+class LoopStalls:
+    """Heartbeat every ``interval``; records how late each beat ran"""
+
+    def __init__(self, interval: float = 0.001):
+        self.interval = interval
+        self.lags = []
+        self._task = None
+
+    async def _beat(self):
+        while True:
+            before = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.lags.append(time.perf_counter() - before - self.interval)
+
+    @property
+    def worst(self) -> float:
+        return max(self.lags, default=0.0)
+
+    @property
+    def p99(self) -> float:
+        return sorted(self.lags)[int(len(self.lags) * 0.99)] if self.lags else 0.0
+
+    @property
+    def blocked(self) -> float:
+        return sum(lag for lag in self.lags if lag > 0.0005)  # below that is timer jitter
+
+    async def __aenter__(self):
+        self._task = asyncio.create_task(self._beat())
+        await asyncio.sleep(0)
+        return self
+
+    async def __aexit__(self, *exc):
+        self._task.cancel()
+
+async def child(mode: str, size: int, url: str, requests: int, concurrency: int) -> dict:
+    settings.GEMINI_API_URL = url
+    settings.GEMINI_MODEL = "bench"
+    settings.GEMINI_API_KEY = "bench-key"
+    image = test_image(size)
+
+    async def send(data: bytes):
+        payload = dict_payload(data, PROMPT) if mode == "dict" else GeminiRequestBody(data, PROMPT)
+        result = await gemini_service._generate(payload)
+        assert result.recipes and result.recipes[0].title == "Omelette", result
+
+    await send(test_image(1000))  # connection, thread pool
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            await send(image)
+
+    baseline = rss_kb()
+    started = time.perf_counter()
+    with PeakRss() as rss:
+        async with LoopStalls() as stalls:
+            await asyncio.gather(*(one() for _ in range(requests)))
+    elapsed = time.perf_counter() - started
+    return {
+        "mode": mode, "size": size, "peak_mb": (rss.peak - baseline) / 1024,
+        "worst_stall_ms": stalls.worst * 1000, "p99_lag_ms": stalls.p99 * 1000,
+        "blocked_ms_per_request": stalls.blocked * 1000 / requests,
+        "ms_per_request": elapsed * 1000 * concurrency / requests,
+    }
+
+def stub_handler(method: str, path: str, body: bytes):
+    payload = json.loads(body)
+    data = payload["contents"][0]["parts"][1]["inline_data"]["data"]
+    image = base64.b64decode(data, validate=True)
+    if image != test_image(len(image)):
+        return 400, {"error": "image corrupted"}
+    return {"candidates": [{"content": {"parts": [{"text": REPLY}]}, "finishReason": "STOP"}]}
+
+async def run_child(mode: str, size: int, url: str, args) -> dict:
+    process = await asyncio.create_subprocess_exec(
+        sys.executable, "-m", "benchmarks.bench_gemini_body", "--child", mode, "--size", str(size), "--url", url,
+        "--requests", str(args.requests), "--concurrency", str(args.concurrency),
+        stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+    )
+    stdout, stderr = await process.communicate()
+    if process.returncode != 0:
+        raise RuntimeError(stderr.decode())
+    return json.loads(stdout.decode().strip().splitlines()[-1])
+
+async def main(args):
+    await check_equivalence()
+    print(f"\n{args.requests} requests per run, {args.concurrency} at a time\n")
+    print(f"{'image':>7s} {'mode':9s} {'peak RSS':>10s} {'worst stall':>12s} {'p99 lag':>9s} {'blocked/req':>12s} "
+          f"{'time/req':>9s}")
+    async with StubHTTPServer(handler=stub_handler) as stub:
+        for size_mb in [float(s) for s in args.sizes_mb.split(",")]:
+            for mode in ("dict", "streamed"):
+                r = await run_child(mode, int(size_mb * 1024 * 1024), stub.url + "/v1beta", args)
+                print(f"{size_mb:5.0f}MB {mode:9s} {r['peak_mb']:7.1f} MB {r['worst_stall_ms']:9.1f} ms "
+                      f"{r['p99_lag_ms']:6.1f} ms {r['blocked_ms_per_request']:9.1f} ms {r['ms_per_request']:6.0f} ms")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes-mb", default="5,10,15", help="comma-separated image sizes")
+    parser.add_argument("--requests", type=int, default=8)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--child", choices=["dict", "streamed"], help=argparse.SUPPRESS)
+    parser.add_argument("--size", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--url", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        print(json.dumps(asyncio.run(child(args.child, args.size, args.url, args.requests, args.concurrency))))
+    else:
+        asyncio.run(main(args))
@@ -0,0 +1,57 @@
+"""Benchmark: per-call httpx clients vs the shared pooled upstream client.
+
+Replays the ``login_secure`` access pattern (four sequential Supabase calls)
+against a local stub that charges a handshake delay on every new connection.
+
+    python -m benchmarks.bench_http_pool --iterations 200 --handshake-ms 40
+"""
+import argparse
+import asyncio
+import statistics
+import time
+import httpx
+from benchmarks.stub_server import StubHTTPServer
+
+HOPS = ["/users?email=eq.a@b.c", "/user_sessions?user_id=eq.1&is_active=eq.true",
+        "/user_sessions?user_id=eq.1", "/user_sessions"]
+
+async def per_call_clients(base_url: str):
+    for path in HOPS:
+        async with httpx.AsyncClient() as client:
+            await client.get(base_url + path)
+
+async def pooled_client(client: httpx.AsyncClient):
+    for path in HOPS:
+        await client.get(path)
+
+def _report(name: str, samples: list, connections: int):
+    samples.sort()
+    p95 = samples[int(len(samples) * 0.95) - 1]
+    print(f"{name:<18} mean={statistics.mean(samples):7.2f}ms  p50={statistics.median(samples):7.2f}ms  "
+          f"p95={p95:7.2f}ms  connections={connections}")
+
+async def main(iterations: int, handshake_ms: float):
+    async with StubHTTPServer(connect_delay=handshake_ms / 1000) as server:
+        samples = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            await per_call_clients(server.url)
+            samples.append((time.perf_counter() - start) * 1000)
+        _report("per-call clients", samples, server.connections)
+
+    async with StubHTTPServer(connect_delay=handshake_ms / 1000) as server:
+        samples = []
+        async with httpx.AsyncClient(base_url=server.url, limits=httpx.Limits(max_keepalive_connections=10)) as client:
+            for _ in range(iterations):
+                start = time.perf_counter()
+                await pooled_client(client)
+                samples.append((time.perf_counter() - start) * 1000)
+        _report("pooled client", samples, server.connections)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--handshake-ms", type=float, default=40.0,
+                        help="simulated TCP+TLS setup cost per new connection")
+    args = parser.parse_args()
+    asyncio.run(main(args.iterations, args.handshake_ms))
@@ -0,0 +1,64 @@
+"""Benchmark: event-loop latency during a login storm.
+
+Runs a burst of concurrent bcrypt verifications (what ``login`` and
+``login_secure`` do) while a probe coroutine standing in for an unrelated
+endpoint wakes every 10ms and records how late it runs. Compares verifying
+inline on the event loop with the password executor.
+
+    python -m benchmarks.bench_login_storm --logins 50 --executor thread --workers 2
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+os.environ.setdefault("JWT_SECRET", "benchmark-secret-" + "x" * 32)
+
+from config.settings import settings
+from chefbot.utils import auth
+
+PROBE_INTERVAL = 0.01
+
+async def _probe(lags: list, stop: asyncio.Event):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(PROBE_INTERVAL)
+        lags.append((time.perf_counter() - start - PROBE_INTERVAL) * 1000)
+
+async def _inline_login(password: str, hashed: str) -> bool:
+    return auth.verify_password(password, hashed)
+
+async def _storm(name: str, login, logins: int, password: str, hashed: str):
+    lags: list = []
+    stop = asyncio.Event()
+    probe = asyncio.create_task(_probe(lags, stop))
+    await asyncio.sleep(0.05)
+    start = time.perf_counter()
+    results = await asyncio.gather(*(login(password, hashed) for _ in range(logins)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await probe
+    assert all(results)
+    lags.sort()
+    print(f"{name:<22} {logins / elapsed:6.1f} logins/s  loop lag p50={statistics.median(lags):7.1f}ms  "
+          f"p99={lags[int(len(lags) * 0.99) - 1]:7.1f}ms  max={lags[-1]:7.1f}ms")
+
+async def main(logins: int, executor: str, workers: int):
+    settings.PASSWORD_HASH_EXECUTOR = executor
+    settings.PASSWORD_HASH_WORKERS = workers
+    password = "correct horse battery staple"
+    hashed = auth.hash_password(password)
+    print(f"hash: {hashed[:7]}... ({logins} concurrent logins)")
+
+    await _storm("inline (event loop)", _inline_login, logins, password, hashed)
+    await _storm(f"{executor} pool x{workers}", auth.verify_password_async, logins, password, hashed)
+    auth.shutdown_password_executor()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--logins", type=int, default=50)
+    parser.add_argument("--executor", choices=["thread", "process"], default="thread")
+    parser.add_argument("--workers", type=int, default=2)
+    args = parser.parse_args()
+    asyncio.run(main(args.logins, args.executor, args.workers))
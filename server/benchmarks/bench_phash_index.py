@@ -0,0 +1,77 @@
+"""Benchmark: near-duplicate lookups in the multi-index Hamming index.
+
+Fills the index with random 64-bit hashes and measures query latency for
+near-duplicate probes (a stored hash with a few bits flipped) and misses.
+Also times dHash on a synthetic camera-sized JPEG.
+
+    python -m benchmarks.bench_phash_index --entries 300000
+"""
+import argparse
+import io
+import random
+import statistics
+import time
+from chefbot.utils.image_hash import MultiIndexHashIndex, dhash, IMAGE_HASH_AVAILABLE
+
+def _flip_bits(value: int, count: int) -> int:
+    for position in random.sample(range(64), count):
+        value ^= 1 << position
+    return value
+
+def _percentiles(samples: list) -> str:
+    samples.sort()
+    return (f"mean={statistics.mean(samples):7.1f}us  p50={samples[len(samples) // 2]:7.1f}us  "
+            f"p99={samples[int(len(samples) * 0.99) - 1]:7.1f}us  max={samples[-1]:7.1f}us")
+
+def bench_index(entries: int, queries: int, max_distance: int):
+    index = MultiIndexHashIndex(max_distance=max_distance)
+    hashes = [random.getrandbits(64) for _ in range(entries)]
+    start = time.perf_counter()
+    for key, value in enumerate(hashes):
+        index.add(key, value)
+    print(f"built index of {len(index)} entries in {time.perf_counter() - start:.2f}s")
+
+    near, miss = [], []
+    found = 0
+    for _ in range(queries):
+        key = random.randrange(entries)
+        probe = _flip_bits(hashes[key], random.randint(0, max_distance))
+        start = time.perf_counter()
+        matches = index.query(probe)
+        near.append((time.perf_counter() - start) * 1e6)
+        found += any(match_key == key for match_key, _ in matches)
+
+        probe = random.getrandbits(64)
+        start = time.perf_counter()
+        index.query(probe)
+        miss.append((time.perf_counter() - start) * 1e6)
+
+    print(f"near-duplicate  {_percentiles(near)}  recall={found / queries:.3f}")
+    print(f"random miss     {_percentiles(miss)}")
+
+def bench_dhash(iterations: int):
+    if not IMAGE_HASH_AVAILABLE:
+        print("numpy/Pillow not installed - skipping dHash timing")
+        return
+    import numpy as np
+    from PIL import Image
+    pixels = np.random.randint(0, 255, (3024, 4032, 3), dtype=np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, format="JPEG", quality=85)
+    data = buffer.getvalue()
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        dhash(data)
+        samples.append((time.perf_counter() - start) * 1000)
+    print(f"dHash 12MP JPEG ({len(data) / 1e6:.1f} MB)  mean={statistics.mean(samples):.1f}ms")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entries", type=int, default=300_000)
+    parser.add_argument("--queries", type=int, default=5_000)
+    parser.add_argument("--max-distance", type=int, default=8)
+    parser.add_argument("--dhash-iterations", type=int, default=5)
+    args = parser.parse_args()
+    bench_index(args.entries, args.queries, args.max_distance)
+    bench_dhash(args.dhash_iterations)
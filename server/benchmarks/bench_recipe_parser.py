@@ -0,0 +1,62 @@
+"""Corpus check and throughput benchmark for the recipe output parser.
+
+Every case in ``corpus/recipe_outputs.json`` must yield the expected number of
+ingredients and recipes (the script exits non-zero otherwise). Throughput is
+then measured for one-shot parsing and for streaming in small chunks, the way
+Gemini SSE deltas arrive, against plain ``json.loads`` as a baseline.
+
+    python -m benchmarks.bench_recipe_parser
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from chefbot.services.recipe_parser import RecipeStreamParser, parse_recipe_response
+
+CORPUS = os.path.join(os.path.dirname(__file__), "corpus", "recipe_outputs.json")
+
+def check_corpus() -> bool:
+    ok = True
+    for case in json.load(open(CORPUS)):
+        # Same result whether the text arrives at once or in 16-char deltas
+        streamed = RecipeStreamParser()
+        for i in range(0, len(case["text"]), 16):
+            streamed.feed(case["text"][i:i + 16])
+        streamed.finish()
+        for name, result in (("one-shot", parse_recipe_response(case["text"])), ("streamed", streamed.result())):
+            ingredients = None if result is None else len(result.ingredients)
+            recipes = 0 if result is None else len(result.recipes)
+            passed = ingredients == case["ingredients"] and recipes == case["recipes"]
+            ok &= passed
+            print(f"{'ok  ' if passed else 'FAIL'} {case['name']:<28} {name:<9} ingredients={ingredients} recipes={recipes}")
+    return ok
+
+def _throughput(label: str, text: str, iterations: int, parse):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        parse(text)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<22} {iterations * len(text) / elapsed / 1e6:6.2f} MB/s  {elapsed / iterations * 1e6:8.1f}us/doc")
+
+def _streamed(text: str, chunk: int = 24):
+    parser = RecipeStreamParser()
+    for i in range(0, len(text), chunk):
+        parser.feed(text[i:i + chunk])
+    parser.finish()
+    return parser.result()
+
+def bench(iterations: int):
+    text = next(case["text"] for case in json.load(open(CORPUS)) if case["name"] == "fenced")
+    print(f"\ndocument: {len(text)} chars")
+    _throughput("json.loads baseline", text.strip("`json\n"), iterations, json.loads)
+    _throughput("parser one-shot", text, iterations, parse_recipe_response)
+    _throughput("parser 24-char deltas", text, iterations, _streamed)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=5000)
+    args = parser.parse_args()
+    corpus_ok = check_corpus()
+    bench(args.iterations)
+    sys.exit(0 if corpus_ok else 1)
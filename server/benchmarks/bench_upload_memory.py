@@ -0,0 +1,246 @@
+"""Benchmark: peak RSS per concurrent /api/analyze upload, whole-body read vs streamed spool.
+
+Each run is a fresh subprocess. It pushes N concurrent multipart uploads of a
+camera-sized photo through one ingestion path, up to the Gemini request
+body. That body is drained as httpx would send it and is then held for
+``--gemini-ms``:
+
+- ``buffered``: the previous path. Starlette parses the whole form (FastAPI's
+  ``File()``), ``await file.read()`` turns the image into one bytes object,
+  and the quota is checked only after that
+- ``streamed``: the endpoint's ``_receive_upload``. The quota is checked
+  before the body is read; the image is spooled (1 MB in memory, then disk)
+  and hashed as it arrives, and the pipeline decodes straight from the spool
+
+Bodies arrive in 64 KB chunks at ``--mbps`` per upload (phones on a mobile
+network), so the uploads overlap. A sampler thread reads VmRSS; the result
+is the peak above the pre-run baseline, divided by N.
+
+The script then shows how much of the body each path reads before it
+rejects an over-quota user, a non-image, and an image over the size cap.
+
+    python -m benchmarks.bench_upload_memory --concurrency 1,4,16 [--photo photo.jpg]
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from fastapi import HTTPException
+from starlette.requests import Request
+from chefbot.api.routes.analyze import _find_cached, _over_free_quota, _receive_upload
+from chefbot.services.gemini_service import GeminiRequestBody
+from chefbot.services.image_pipeline import sniff_mime_type
+from config.settings import settings
+
+CHUNK_SIZE = 64 * 1024
+BOUNDARY = "chefbot-bench-boundary"
+
+def synthetic_photo(megapixels: float = 12.0) -> bytes:
+    """A noisy gradient JPEG at quality 95, about the size of a phone photo"""
+    import numpy as np
+    from PIL import Image
+    width = int((megapixels * 1e6 * 4 / 3) ** 0.5)
+    height = int(width * 3 / 4)
+    y, x = np.mgrid[0:height, 0:width]
+    base = np.stack([(x / 16) % 255, (y / 12) % 255, ((x + y) / 20) % 255], axis=-1)
+    pixels = np.clip(base + np.random.normal(0, 24, base.shape), 0, 255).astype(np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, format="JPEG", quality=95)
+    return buffer.getvalue()
+
+def multipart_body(image: bytes, prompt: str = "quick dinner", content_type: str = "image/jpeg") -> bytes:
+    head = (
+        f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="prompt"\r\n\r\n{prompt}\r\n'
+        f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="file"; filename="photo.jpg"\r\n'
+        f"Content-Type: {content_type}\r\n\r\n"
+    ).encode()
+    return head + image + f"\r\n--{BOUNDARY}--\r\n".encode()
+
+class ChunkedBody:
+    """ASGI ``receive`` delivering a body in chunks at a fixed bandwidth; counts what was read"""
+
+    def __init__(self, body: bytes, mbps: float):
+        self.body = body
+        self.sent = 0
+        self.delay = CHUNK_SIZE / (mbps * 125_000) if mbps > 0 else 0
+
+    async def __call__(self):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        chunk = self.body[self.sent:self.sent + CHUNK_SIZE]
+        self.sent += len(chunk)
+        return {"type": "http.request", "body": chunk, "more_body": self.sent < len(self.body)}
+
+def make_request(body: ChunkedBody) -> Request:
+    scope = {
+        "type": "http", "method": "POST", "path": "/api/analyze", "query_string": b"",
+        "headers": [
+            (b"content-type", f"multipart/form-data; boundary={BOUNDARY}".encode()),
+            (b"content-length", str(len(body.body)).encode()),
+        ],
+    }
+    return Request(scope, body)
+
+async def buffered_ingest(request: Request, user: dict) -> GeminiRequestBody:
+    """The previous /api/analyze path, up to the Gemini payload"""
+    form = await request.form()
+    try:
+        upload, prompt = form["file"], form.get("prompt", "")
+        image_bytes = await upload.read()
+        mime_type = sniff_mime_type(image_bytes) or upload.content_type or ""
+        if not mime_type.startswith("image/"):
+            raise HTTPException(status_code=400, detail="Only image uploads are supported.")
+        _, _, prepared = await _find_cached(image_bytes, b"", prompt, user)
+        if _over_free_quota(user):
+            raise HTTPException(status_code=429, detail="Free plan limit reached")
+        return GeminiRequestBody(prepared.data, prompt, prepared.mime_type)
+    finally:
+        await form.close()
+
+async def streamed_ingest(request: Request, user: dict) -> GeminiRequestBody:
+    """The current /api/analyze path, up to the Gemini payload"""
+    form = await _receive_upload(request, user)
+    upload, prompt = form.files[0], form.fields.get("prompt", "")
+    try:
+        _, _, prepared = await _find_cached(upload.spool, upload.sha256, prompt, user)
+    finally:
+        form.close()
+    return GeminiRequestBody(prepared.data, prompt, prepared.mime_type)
+
+PATHS = {"buffered": buffered_ingest, "streamed": streamed_ingest}
+
+def rss_kb() -> int:
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    return 0
+
+class PeakRss:
+    """Samples VmRSS every millisecond in a thread"""
+
+    def __init__(self):
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, rss_kb())
+            time.sleep(0.001)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, rss_kb())
+
+def _quiet_settings():
+    # Measure ingestion alone: no rate limiter store, no SQLite cache, no hash index
+    settings.RATE_LIMIT_ENABLED = False
+    settings.ANALYSIS_CACHE_ENABLED = False
+    settings.NEAR_DUPLICATE_ENABLED = False
+
+async def child(path: str, photo_path: str, concurrency: int, mbps: float, gemini_ms: float) -> dict:
+    _quiet_settings()
+    ingest = PATHS[path]
+    user = {"id": "bench", "plan": "pro"}
+    with open(photo_path, "rb") as f:
+        body = multipart_body(f.read())
+
+    async def one():
+        payload = await ingest(make_request(ChunkedBody(body, mbps)), user)
+        async for _ in payload:
+            pass
+        await asyncio.sleep(gemini_ms / 1000)  # the Gemini call holds the payload
+        return len(payload)
+
+    # Warm up codecs, thread pools and the allocator on a small image
+    small = multipart_body(synthetic_photo(0.1))
+    await ingest(make_request(ChunkedBody(small, 0)), user)
+
+    baseline = rss_kb()
+    started = time.perf_counter()
+    with PeakRss() as rss:
+        sizes = await asyncio.gather(*(one() for _ in range(concurrency)))
+    return {
+        "path": path, "concurrency": concurrency, "baseline_mb": baseline / 1024,
+        "peak_mb": rss.peak / 1024, "per_upload_mb": (rss.peak - baseline) / 1024 / concurrency,
+        "seconds": time.perf_counter() - started, "payload_kb": sizes[0] / 1024,
+    }
+
+def run_child(path: str, photo_path: str, concurrency: int, args) -> dict:
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_upload_memory", "--child", path, "--photo", photo_path,
+         "--concurrency", str(concurrency), "--mbps", str(args.mbps), "--gemini-ms", str(args.gemini_ms)],
+        capture_output=True, text=True, check=True,
+    )
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+async def rejection_bytes(path: str, body: bytes, user: dict) -> tuple:
+    """(status, body bytes read) for one upload that should be rejected"""
+    _quiet_settings()
+    received = ChunkedBody(body, 0)
+    try:
+        await PATHS[path](make_request(received), user)
+        return 200, received.sent
+    except HTTPException as e:
+        return e.status_code, received.sent
+
+async def show_rejections(photo: bytes):
+    over_quota = {"id": "bench", "plan": "free", "monthly_usage": settings.FREE_MAX_MONTHLY,
+                  "usage_month": time.strftime("%Y-%m")}
+    pro = {"id": "bench", "plan": "pro"}
+    oversize = photo * (settings.UPLOAD_MAX_BYTES // len(photo) + 1)
+    cases = [
+        ("over-quota free user", multipart_body(photo), over_quota),
+        ("non-image (PDF)", multipart_body(b"%PDF-1.7\n" + photo, content_type="application/pdf"), pro),
+        (f"image over {settings.UPLOAD_MAX_MB} MB", multipart_body(oversize), pro),
+    ]
+    print(f"\n{'rejection':26s} {'path':10s} {'status':>6s} {'body read':>12s}")
+    for name, body, user in cases:
+        for path in PATHS:
+            status, sent = await rejection_bytes(path, body, user)
+            print(f"{name:26s} {path:10s} {status:6d} {sent / 1048576:8.2f} MB  of {len(body) / 1048576:.1f} MB")
+
+def main(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        photo_path = args.photo
+        if not photo_path:
+            photo_path = os.path.join(tmp, "photo.jpg")
+            with open(photo_path, "wb") as f:
+                f.write(synthetic_photo(args.megapixels))
+        with open(photo_path, "rb") as f:
+            photo = f.read()
+        print(f"photo: {len(photo) / 1048576:.1f} MB, uploads at {args.mbps} Mbit/s each, "
+              f"Gemini call held {args.gemini_ms:.0f}ms, spool {settings.UPLOAD_SPOOL_MAX_BYTES // 1024} KB in memory\n")
+        print(f"{'path':10s} {'uploads':>7s} {'baseline':>10s} {'peak':>10s} {'per upload':>11s} {'wall':>7s}")
+        for concurrency in [int(n) for n in args.concurrency.split(",")]:
+            for path in PATHS:
+                r = run_child(path, photo_path, concurrency, args)
+                print(f"{path:10s} {concurrency:7d} {r['baseline_mb']:7.0f} MB {r['peak_mb']:7.0f} MB "
+                      f"{r['per_upload_mb']:8.1f} MB {r['seconds']:6.2f}s")
+        asyncio.run(show_rejections(photo))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", default="1,4,16", help="comma-separated concurrent upload counts")
+    parser.add_argument("--photo", default="", help="image to upload (default: synthetic 12MP JPEG)")
+    parser.add_argument("--megapixels", type=float, default=12.0)
+    parser.add_argument("--mbps", type=float, default=200.0, help="per-upload bandwidth (0 = as fast as possible)")
+    parser.add_argument("--gemini-ms", type=float, default=800.0)
+    parser.add_argument("--child", choices=list(PATHS), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        print(json.dumps(asyncio.run(child(args.child, args.photo, int(args.concurrency), args.mbps, args.gemini_ms))))
+    else:
+        main(args)
@@ -0,0 +1,74 @@
+"""Check: email outbox batching, retries and dead-lettering against a local Resend stub.
+
+Enqueues a burst of messages (timing what a request handler pays), lets the
+worker drain them through a stub that fails the first requests, then runs a
+stub that always fails to show messages landing in the dead-letter state.
+
+    python -m benchmarks.check_email_outbox --messages 120
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import tempfile
+import time
+from benchmarks.stub_server import StubHTTPServer
+from chefbot.services.email_outbox import EmailOutbox, ResendTransport
+
+def _message(i: int) -> dict:
+    return {"from": "Chef Bot <test@example.com>", "to": [f"user{i}@example.com"], "subject": "Hi", "html": "<p>Hi</p>"}
+
+async def _drain(outbox: EmailOutbox, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        counts = await outbox.stats()
+        if not counts["by_status"].get("queued") and not counts["by_status"].get("sending"):
+            return counts
+        await asyncio.sleep(0.05)
+    return await outbox.stats()
+
+async def run(messages: int, fail_first: int, always_fail: bool) -> dict:
+    delivered = []
+
+    def handler(method, path, body):
+        if always_fail or stub.requests <= fail_first:
+            return 503, {"message": "temporarily unavailable"}
+        batch = json.loads(body)
+        delivered.extend(batch)
+        return {"data": [{"id": f"msg-{len(delivered) - len(batch) + i}"} for i in range(len(batch))]}
+
+    stub = StubHTTPServer(request_delay=0.02, handler=handler)
+    async with stub:
+        db_path = os.path.join(tempfile.mkdtemp(), "outbox.db")
+        outbox = EmailOutbox(db_path, batch_size=50, max_attempts=3, retry_base_seconds=0.05)
+        await outbox.start(ResendTransport("test-key", stub.url))
+
+        enqueue_ms = []
+        start = time.perf_counter()
+        for i in range(messages):
+            t = time.perf_counter()
+            await outbox.enqueue(_message(i))
+            enqueue_ms.append((time.perf_counter() - t) * 1000)
+        counts = await _drain(outbox)
+        elapsed = time.perf_counter() - start
+        await outbox.stop()
+
+    print(f"{'always failing' if always_fail else f'first {fail_first} requests fail'}: "
+          f"enqueue p50={statistics.median(enqueue_ms):.2f}ms max={max(enqueue_ms):.2f}ms, "
+          f"drained in {elapsed:.2f}s with {stub.requests} HTTP requests, "
+          f"delivered={len(delivered)} status={counts['by_status']}")
+    return counts["by_status"]
+
+async def main(messages: int):
+    ok = await run(messages, fail_first=2, always_fail=False)
+    dead = await run(messages, fail_first=0, always_fail=True)
+    assert ok.get("sent") == messages, ok
+    assert dead.get("dead") == messages, dead
+    print("OK")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=120)
+    args = parser.parse_args()
+    asyncio.run(main(args.messages))
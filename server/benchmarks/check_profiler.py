@@ -0,0 +1,136 @@
+"""Check: request profiler attribution, its overhead, and the event-loop stall monitor.
+
+Runs a fake request (CPU work on the loop, an awaited "upstream" call and
+work offloaded to a thread) alongside unrelated background tasks. Then
+checks that:
+
+- the profile credits the CPU work to ``on-cpu`` and the waits to ``awaiting``
+- the background tasks never appear in the profile
+- the profile is written as collapsed stacks
+- ProfilerMiddleware only profiles requests carrying the admin token
+- the loop monitor reports a deliberate ``time.sleep`` stall, with that
+  stack, and stays quiet otherwise
+
+Finally it compares CPU throughput with and without profiling.
+
+    python -m benchmarks.check_profiler --interval-ms 5
+"""
+import argparse
+import asyncio
+import hashlib
+import tempfile
+import time
+from pathlib import Path
+from chefbot.api.middleware import ProfilerMiddleware
+from chefbot.services.profiler import LoopLagMonitor, SamplingProfiler
+
+def burn_cpu(ms: float):
+    deadline = time.perf_counter() + ms / 1000
+    digest = b""
+    while time.perf_counter() < deadline:
+        digest = hashlib.sha256(digest).digest()
+
+def block_loop(ms: float):
+    time.sleep(ms / 1000)
+
+async def fake_upstream_call(ms: float):
+    await asyncio.sleep(ms / 1000)
+
+async def fake_request():
+    burn_cpu(60)
+    await fake_upstream_call(80)
+    await asyncio.to_thread(burn_cpu, 40)
+
+async def background_noise(stop: asyncio.Event):
+    while not stop.is_set():
+        burn_cpu(2)
+        await asyncio.sleep(0.001)
+
+async def check_attribution(profiler: SamplingProfiler) -> Path:
+    stop = asyncio.Event()
+    noise = asyncio.create_task(background_noise(stop))
+    session = profiler.begin("POST /api/analyze", "check-1")
+    await fake_request()
+    profiler.end(session)
+    stop.set()
+    await noise
+
+    on_cpu = sum(count for stack, count in session.stacks.items() if stack.startswith("on-cpu") and "burn_cpu" in stack)
+    awaiting = sum(count for stack, count in session.stacks.items()
+                   if stack.startswith("awaiting") and "fake_upstream_call" in stack)
+    offloaded = sum(count for stack, count in session.stacks.items() if stack.startswith("awaiting") and "to_thread" in stack)
+    print(f"{session.samples} samples in {session.duration_ms:.0f}ms: on-cpu burn={on_cpu} "
+          f"awaiting upstream={awaiting} awaiting thread={offloaded}")
+    assert on_cpu and awaiting and offloaded, dict(session.stacks)
+    assert not any("background_noise" in stack for stack in session.stacks), "background task leaked into profile"
+
+    path = await profiler.save(session)
+    lines = path.read_text().splitlines()
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in lines), lines[:3]
+    print(f"wrote {path.name} ({len(lines)} distinct stacks)")
+    return path
+
+async def check_middleware(profiler: SamplingProfiler):
+    async def app(scope, receive, send):
+        await fake_request()
+
+    middleware = ProfilerMiddleware(app, profiler, admin_token="secret")
+    scope = {"type": "http", "method": "POST", "path": "/api/analyze", "headers": []}
+    before = profiler.profiles_written
+    await middleware(scope, None, None)
+    assert profiler.profiles_written == before, "profiled without token or sampling"
+    await middleware({**scope, "headers": [(b"x-profile-token", b"wrong")]}, None, None)
+    assert profiler.profiles_written == before, "profiled with a wrong token"
+    await middleware({**scope, "headers": [(b"x-profile-token", b"secret")]}, None, None)
+    assert profiler.profiles_written == before + 1, "admin token did not trigger a profile"
+    profiler.enabled = False
+    await middleware({**scope, "headers": [(b"x-profile-token", b"secret")]}, None, None)
+    assert profiler.profiles_written == before + 1, "profiled while switched off"
+    profiler.enabled = True
+
+async def check_loop_monitor():
+    monitor = LoopLagMonitor(threshold_ms=100)
+    await monitor.start()
+    await asyncio.sleep(0.3)
+    assert monitor.stalls == 0, monitor.stats()
+    block_loop(300)
+    await asyncio.sleep(0.1)
+    await monitor.stop()
+    stall = monitor.last_stall
+    assert monitor.stalls == 1 and stall["blocked_ms"] >= 250, monitor.stats()
+    assert stall["stack"] and "block_loop" in stall["stack"][-1], stall["stack"]
+    print(f"loop monitor: 1 stall of {stall['blocked_ms']:.0f}ms at {stall['stack'][-1]}")
+
+def _hash_loop(seconds: float) -> int:
+    count = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        hashlib.sha256(b"x").digest()
+        count += 1
+    return count
+
+async def measure_overhead(profiler: SamplingProfiler, seconds: float = 0.5):
+    baseline = _hash_loop(seconds)
+    session = profiler.begin("overhead")
+    profiled = _hash_loop(seconds)
+    profiler.end(session)
+    print(f"overhead at {profiler.interval * 1000:.0f}ms interval: {profiled / baseline * 100:.1f}% of unprofiled "
+          f"throughput ({session.samples} samples)")
+
+async def main(interval_ms: float):
+    with tempfile.TemporaryDirectory() as tmp:
+        profiler = SamplingProfiler(interval_ms=interval_ms, output_dir=tmp, max_files=3, enabled=True)
+        await check_attribution(profiler)
+        for _ in range(4):
+            await check_middleware(profiler)
+        assert len(list(Path(tmp).glob("*.collapsed"))) == 3, "max_files not enforced"
+        print("middleware: profiles only with the admin token and while enabled; keeps the newest max_files")
+        await check_loop_monitor()
+        await measure_overhead(profiler)
+    print("✅ profiler checks passed")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--interval-ms", type=float, default=5.0)
+    args = parser.parse_args()
+    asyncio.run(main(args.interval_ms))
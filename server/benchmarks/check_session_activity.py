@@ -0,0 +1,73 @@
+"""Check: session last_activity write-behind against a local Supabase stub.
+
+Simulates authenticated traffic over a set of sessions, counting the bulk
+``touch_user_sessions`` calls the buffer makes (vs one PATCH per request),
+then checks that a failed flush keeps its entries and that shutdown flushes
+whatever is still pending.
+
+    python -m benchmarks.check_session_activity --requests 5000 --sessions 200
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from benchmarks.stub_server import StubHTTPServer
+from config.settings import settings
+from chefbot.services.http_client import upstream_clients
+from chefbot.services.session_activity import SessionActivityBuffer
+
+async def main(requests: int, sessions: int, interval: float):
+    written = {}
+    failing = False
+
+    def handler(method, path, body):
+        if failing:
+            return 503, {"message": "unavailable"}
+        updates = json.loads(body)["p_updates"]
+        for update in updates:
+            written[(update["user_id"], update["device_id"])] = update["last_activity"]
+        return len(updates)
+
+    async with StubHTTPServer(request_delay=0.01, handler=handler) as stub:
+        settings.SUPABASE_URL = stub.url
+        buffer = SessionActivityBuffer(flush_interval=interval, max_pending=sessions * 2)
+        await buffer.start()
+
+        touch_us = []
+        touched = set()
+        duration = interval * 5
+        for i in range(requests):
+            t = time.perf_counter()
+            user_id = f"user-{random.randrange(sessions)}"
+            touched.add((user_id, "device-1"))
+            buffer.touch(user_id, "device-1")
+            touch_us.append((time.perf_counter() - t) * 1e6)
+            await asyncio.sleep(duration / requests)
+        await asyncio.sleep(interval * 1.5)
+        print(f"{requests} requests over {sessions} sessions -> {stub.requests} bulk writes "
+              f"(touch avg {sum(touch_us) / len(touch_us):.2f}us), stats={buffer.stats()}")
+        assert stub.requests < requests / 10, stub.requests
+        assert set(written) == touched, "lost sessions"
+
+        failing = True
+        buffer.touch("user-new", "device-1")
+        await buffer.flush()
+        assert buffer.stats()["pending"] == 1, buffer.stats()
+        failing = False
+
+        buffer.touch("user-late", "device-1")
+        await buffer.stop()
+        assert ("user-new", "device-1") in written and ("user-late", "device-1") in written
+        assert buffer.stats()["pending"] == 0
+        print(f"after failure + shutdown flush: {buffer.stats()}")
+        await upstream_clients.close()
+    print("OK")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--interval", type=float, default=0.2, help="flush interval in seconds")
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.sessions, args.interval))
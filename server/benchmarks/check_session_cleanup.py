@@ -0,0 +1,101 @@
+"""Check: chunked session cleanup and its lease against a local Supabase stub.
+
+The stub keeps an in-memory ``user_sessions`` table and mimics the
+``add_session_cleanup.sql`` functions (keyset chunks on (expires_at, id),
+lease row). Two schedulers, standing in for two workers, run at the same
+time: exactly one should clean up, in bounded chunks, and the expected rows
+should be deactivated or deleted.
+
+    python -m benchmarks.check_session_cleanup --sessions 20000 --chunk-size 500
+"""
+import argparse
+import asyncio
+import json
+import random
+import uuid
+from datetime import datetime, timedelta, timezone
+from benchmarks.stub_server import StubHTTPServer
+from config.settings import settings
+from chefbot.services.http_client import upstream_clients
+from chefbot.services.session_cleanup import SessionCleanupScheduler
+
+def make_sessions(count: int) -> dict:
+    now = datetime.now(timezone.utc)
+    sessions = {}
+    for _ in range(count):
+        session_id = str(uuid.uuid4())
+        sessions[session_id] = {
+            "id": session_id,
+            "expires_at": now + timedelta(days=random.uniform(-90, 30)),
+            "is_active": random.random() < 0.7,
+        }
+    return sessions
+
+def chunk_handler(sessions: dict, lease: dict, chunk_sizes: list):
+    def handler(method, path, body):
+        args = json.loads(body)
+        if path.endswith("/rpc/acquire_maintenance_lease"):
+            now = datetime.now(timezone.utc)
+            if lease.get("holder") in (None, args["p_holder"]) or lease["expires_at"] < now:
+                lease.update(holder=args["p_holder"], expires_at=now + timedelta(seconds=args["p_ttl_seconds"]))
+                return True
+            return False
+        before = datetime.fromisoformat(args["p_before"])
+        cursor = None
+        if args["p_after_expires_at"] is not None:
+            cursor = (datetime.fromisoformat(args["p_after_expires_at"]), args["p_after_id"])
+        deactivate = path.endswith("/rpc/deactivate_expired_sessions")
+        rows = sorted(
+            (s for s in sessions.values()
+             if s["expires_at"] < before and (s["is_active"] or not deactivate)
+             and (cursor is None or (s["expires_at"], s["id"]) > cursor)),
+            key=lambda s: (s["expires_at"], s["id"])
+        )[:args["p_limit"]]
+        for row in rows:
+            if deactivate:
+                row["is_active"] = False
+            else:
+                del sessions[row["id"]]
+        chunk_sizes.append(len(rows))
+        last = rows[-1] if rows else None
+        return [{
+            "processed": len(rows),
+            "last_expires_at": last["expires_at"].isoformat() if last else None,
+            "last_id": last["id"] if last else None,
+        }]
+    return handler
+
+async def main(count: int, chunk_size: int):
+    sessions = make_sessions(count)
+    now = datetime.now(timezone.utc)
+    expect_deleted = sum(s["expires_at"] < now - timedelta(days=30) for s in sessions.values())
+    expect_deactivated = sum(
+        s["is_active"] and now - timedelta(days=30) <= s["expires_at"] < now for s in sessions.values()
+    )
+    lease, chunk_sizes = {}, []
+    async with StubHTTPServer(request_delay=0.002, handler=chunk_handler(sessions, lease, chunk_sizes)) as stub:
+        settings.SUPABASE_URL = stub.url
+        workers = [SessionCleanupScheduler(interval=60, chunk_size=chunk_size, retention_days=30) for _ in range(2)]
+        reports = await asyncio.gather(*(worker.run_once() for worker in workers))
+        await upstream_clients.close()
+
+    ran = [report for report in reports if report is not None]
+    print(f"{count} sessions, chunk size {chunk_size}: {len(ran)} of 2 workers ran, "
+          f"largest chunk {max(chunk_sizes)}, report={ran[0] if ran else None}")
+    assert len(ran) == 1, reports
+    assert max(chunk_sizes) <= chunk_size
+    report = ran[0]
+    assert report["complete"]
+    # Sessions deleted in the second pass may have been deactivated in the first one
+    assert report["deleted"] == expect_deleted, (report, expect_deleted)
+    assert report["deactivated"] >= expect_deactivated, (report, expect_deactivated)
+    now = datetime.now(timezone.utc)
+    assert not any(s["is_active"] and s["expires_at"] < now for s in sessions.values())
+    print("OK")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=20000)
+    parser.add_argument("--chunk-size", type=int, default=500)
+    args = parser.parse_args()
+    asyncio.run(main(args.sessions, args.chunk_size))
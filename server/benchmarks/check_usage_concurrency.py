@@ -0,0 +1,59 @@
+"""Concurrency check: no lost usage increments under parallel analyses.
+
+Fires ``--requests`` concurrent ``check_and_update_usage`` calls for one test
+user, each holding the same stale user dict (as concurrent requests do), then
+reads the row back. Needs the Supabase env vars and the
+``add_usage_metering_rpc.sql`` migration. The test user's usage is reset!
+
+    python -m benchmarks.check_usage_concurrency --user-id <uuid> --plan free
+    python -m benchmarks.check_usage_concurrency --user-id <uuid> --plan pro --legacy
+"""
+import argparse
+import asyncio
+import sys
+import time
+from chefbot.api.routes.analyze import _current_month, check_and_update_usage
+from chefbot.services.http_client import get_supabase_client, upstream_clients
+from config.settings import settings
+
+async def legacy_check_and_update_usage(user: dict, count: int = 1) -> bool:
+    """The previous read-modify-write implementation, for comparison"""
+    if user.get("plan") == "free" and user.get("monthly_usage", 0) + count > settings.FREE_MAX_MONTHLY:
+        return False
+    new_usage = user.get("monthly_usage", 0) + count
+    await get_supabase_client().patch(f"/users?id=eq.{user['id']}", json={"monthly_usage": new_usage})
+    user["monthly_usage"] = new_usage
+    return True
+
+async def main(user_id: str, plan: str, requests: int, legacy: bool) -> bool:
+    await upstream_clients.start()
+    client = get_supabase_client()
+    try:
+        month = _current_month()
+        await client.patch(f"/users?id=eq.{user_id}", json={"plan": plan, "monthly_usage": 0, "usage_month": month})
+        stale_user = {"id": user_id, "plan": plan, "monthly_usage": 0, "usage_month": month}
+
+        charge = legacy_check_and_update_usage if legacy else check_and_update_usage
+        start = time.perf_counter()
+        allowed = await asyncio.gather(*(charge(dict(stale_user)) for _ in range(requests)))
+        elapsed = (time.perf_counter() - start) * 1000
+
+        response = await client.get(f"/users?id=eq.{user_id}&select=monthly_usage")
+        final_usage = response.json()[0]["monthly_usage"]
+        expected = min(requests, settings.FREE_MAX_MONTHLY) if plan == "free" else requests
+        ok = final_usage == expected and sum(allowed) == expected
+        print(f"{'legacy' if legacy else 'rpc'}: {requests} concurrent requests in {elapsed:.0f}ms, "
+              f"allowed={sum(allowed)} final monthly_usage={final_usage} expected={expected} "
+              f"-> {'OK' if ok else 'LOST UPDATES / LIMIT OVERSHOOT'}")
+        return ok
+    finally:
+        await upstream_clients.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--user-id", required=True, help="id of a disposable test user")
+    parser.add_argument("--plan", choices=["free", "pro"], default="pro")
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--legacy", action="store_true", help="run the old read-modify-write version instead")
+    args = parser.parse_args()
+    sys.exit(0 if asyncio.run(main(args.user_id, args.plan, args.requests, args.legacy)) else 1)
@@ -0,0 +1,445 @@
+"""In-memory stand-ins for Supabase (PostgREST) and Gemini, as one ASGI app.
+
+``FakePostgrest`` serves ``/rest/v1/<table>`` with the PostgREST features the
+API uses: ``col=op.value`` filters (eq, neq, lt, lte, gt, gte, is, in),
+``select`` (including ``select=count``), ``order``, ``limit``, the ``Prefer``
+header (``return=representation``, ``resolution=merge-duplicates``) and the
+``/rpc`` functions from ``database/migrations``. ``FakeGemini`` serves
+``generateContent`` and ``streamGenerateContent`` (SSE) with a canned recipe.
+Both take a latency (plus jitter) and a failure rate for fault injection.
+
+Run standalone for the load test (``benchmarks/load_test.py`` does this):
+
+    python -m benchmarks.fakes --port 8787 --users 32 --supabase-latency-ms 15 --gemini-latency-ms 800
+
+Then point the API at it with ``SUPABASE_URL=http://127.0.0.1:8787`` and
+``GEMINI_API_URL=http://127.0.0.1:8787/v1beta``.
+"""
+import argparse
+import asyncio
+import json
+import random
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl
+
+RECIPE_TEXT = json.dumps({
+    "ingredients": ["eggs", "spinach", "cheddar", "tomatoes", "onion"],
+    "recipes": [
+        {"title": "Spinach and Cheddar Omelette", "ingredients": ["3 eggs", "1 cup spinach", "30g cheddar"],
+         "steps": ["Whisk the eggs", "Wilt the spinach", "Cook the eggs, add filling and fold"], "timeMins": 10},
+        {"title": "Shakshuka", "ingredients": ["4 eggs", "4 tomatoes", "1 onion"],
+         "steps": ["Soften the onion", "Simmer the tomatoes", "Poach the eggs in the sauce"], "timeMins": 25},
+    ],
+}, indent=2)
+
+UNIQUE_KEYS = {"users": [("id",), ("email",)], "user_sessions": [("id",), ("user_id", "device_id")]}
+RESERVED_PARAMS = {"select", "order", "limit", "offset", "on_conflict", "columns"}
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+def _coerce(value):
+    """Comparable form of a stored value or a filter argument"""
+    if isinstance(value, bool) or value is None or isinstance(value, (int, float)):
+        return value
+    text = str(value)
+    if text in ("true", "false"):
+        return text == "true"
+    try:
+        return int(text)
+    except ValueError:
+        pass
+    try:
+        parsed = datetime.fromisoformat(text.replace("Z", "+00:00"))
+        return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+    except ValueError:
+        return text
+
+def _matches(row: dict, column: str, expression: str) -> bool:
+    op, _, argument = expression.partition(".")
+    value = _coerce(row.get(column))
+    if op == "is":
+        return value is ({"null": None, "true": True, "false": False}[argument])
+    if op == "in":
+        return value in {_coerce(item.strip('"')) for item in argument.strip("()").split(",")}
+    target = _coerce(argument)
+    if op == "eq":
+        return value == target
+    if op == "neq":
+        return value != target
+    if value is None:
+        return False
+    try:
+        return {"lt": value < target, "lte": value <= target, "gt": value > target, "gte": value >= target}[op]
+    except TypeError:
+        return False
+
+async def _body(receive) -> bytes:
+    chunks = []
+    while True:
+        message = await receive()
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body"):
+            return b"".join(chunks)
+
+async def _respond(send, status: int, payload=None, content_type: str = "application/json"):
+    body = b"" if payload is None else (payload if isinstance(payload, bytes) else json.dumps(payload).encode())
+    await send({"type": "http.response.start", "status": status,
+                "headers": [(b"content-type", content_type.encode()), (b"content-length", str(len(body)).encode())]})
+    await send({"type": "http.response.body", "body": body})
+
+class FaultInjector:
+    """Fixed latency plus uniform jitter, and a probability of failing the call"""
+
+    def __init__(self, latency_ms: float = 0.0, jitter_ms: float = 0.0, failure_rate: float = 0.0,
+                 failure_status: int = 503):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.failure_rate = failure_rate
+        self.failure_status = failure_status
+
+    async def delay(self):
+        latency = self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms)
+        if latency > 0:
+            await asyncio.sleep(latency / 1000)
+
+    def should_fail(self) -> bool:
+        return self.failure_rate > 0 and random.random() < self.failure_rate
+
+class FakePostgrest:
+    """``/rest/v1`` over in-memory tables"""
+
+    def __init__(self, faults: Optional[FaultInjector] = None):
+        self.faults = faults or FaultInjector()
+        self.tables: Dict[str, List[dict]] = {"users": [], "user_sessions": [], "maintenance_leases": []}
+        self.calls: Counter = Counter()
+
+    # ===== SEEDING =====
+    def add_user(self, email: str, password_hash: str, plan: str = "pro") -> dict:
+        user = {
+            "id": str(uuid.uuid4()), "email": email, "password_hash": password_hash, "plan": plan,
+            "monthly_usage": 0, "usage_month": _now().strftime("%Y-%m"), "email_verified": True,
+            "created_at": _now().isoformat(),
+        }
+        self.tables["users"].append(user)
+        return user
+
+    # ===== TABLES =====
+    def _select(self, table: str, params: List[Tuple[str, str]]) -> List[dict]:
+        rows = self.tables.setdefault(table, [])
+        for column, expression in params:
+            if column not in RESERVED_PARAMS:
+                rows = [row for row in rows if _matches(row, column, expression)]
+        return rows
+
+    @staticmethod
+    def _project(rows: List[dict], params: Dict[str, str]) -> list:
+        select = params.get("select", "*")
+        if select == "count":
+            return [{"count": len(rows)}]
+        if "order" in params:
+            column, _, direction = params["order"].partition(".")
+            present = [row for row in rows if row.get(column) is not None]
+            missing = [row for row in rows if row.get(column) is None]
+            rows = sorted(present, key=lambda row: _coerce(row[column]), reverse=direction.startswith("desc")) + missing
+        if "limit" in params:
+            rows = rows[int(params.get("offset", 0)):int(params.get("offset", 0)) + int(params["limit"])]
+        if select != "*":
+            columns = [column.strip() for column in select.split(",")]
+            rows = [{column: row.get(column) for column in columns} for row in rows]
+        return [dict(row) for row in rows]
+
+    def _defaults(self, table: str, row: dict) -> dict:
+        row = dict(row)
+        row.setdefault("id", str(uuid.uuid4()))
+        row.setdefault("created_at", _now().isoformat())
+        if table == "user_sessions":
+            row.setdefault("is_active", True)
+            row.setdefault("last_activity", _now().isoformat())
+            row.setdefault("device_info", {})
+        return row
+
+    def _find_conflict(self, table: str, row: dict) -> Optional[dict]:
+        for key in UNIQUE_KEYS.get(table, [("id",)]):
+            if all(row.get(column) is not None for column in key):
+                for existing in self.tables[table]:
+                    if all(existing.get(column) == row.get(column) for column in key):
+                        return existing
+        return None
+
+    def _insert(self, table: str, payload, merge: bool) -> Tuple[int, List[dict]]:
+        rows = payload if isinstance(payload, list) else [payload]
+        written = []
+        for row in rows:
+            existing = self._find_conflict(table, row)
+            if existing is not None:
+                if not merge:
+                    return 409, [{"code": "23505", "message": "duplicate key value violates unique constraint"}]
+                existing.update(row)
+                written.append(existing)
+            else:
+                row = self._defaults(table, row)
+                self.tables.setdefault(table, []).append(row)
+                written.append(row)
+        return 201, written
+
+    # ===== RPC =====
+    def _rpc(self, function: str, args: dict):
+        handler = getattr(self, f"_rpc_{function}", None)
+        if handler is None:
+            return 404, {"code": "PGRST202", "message": f"Could not find the function public.{function}"}
+        return 200, handler(**args)
+
+    def _user(self, user_id: str) -> Optional[dict]:
+        return next((user for user in self.tables["users"] if user["id"] == str(user_id)), None)
+
+    def _rpc_increment_monthly_usage(self, p_user_id, p_count, p_month, p_free_limit):
+        user = self._user(p_user_id)
+        if user is None:
+            return []
+        current = user.get("monthly_usage") or 0 if user.get("usage_month") == p_month else 0
+        allowed = user.get("plan") != "free" or p_free_limit is None or current + p_count <= p_free_limit
+        if allowed:
+            user["monthly_usage"], user["usage_month"] = max(current + p_count, 0), p_month
+        return [{"allowed": allowed, "monthly_usage": user["monthly_usage"] if allowed else current, "usage_month": p_month}]
+
+    def _sessions(self, user_id: str) -> List[dict]:
+        return [session for session in self.tables["user_sessions"] if session["user_id"] == str(user_id)]
+
+    def _rpc_start_user_session(self, p_user_id, p_device_id, p_device_info, p_refresh_token_hash, p_expires_at,
+                                p_enforce_single_device=True):
+        active = [session for session in self._sessions(p_user_id) if session["is_active"]]
+        if p_enforce_single_device and active and not any(s["device_id"] == p_device_id for s in active):
+            return "conflict"
+        for session in active:
+            if session["device_id"] != p_device_id:
+                session["is_active"] = False
+        self._insert("user_sessions", {
+            "user_id": str(p_user_id), "device_id": p_device_id, "device_info": p_device_info or {},
+            "refresh_token_hash": p_refresh_token_hash, "is_active": True,
+            "last_activity": _now().isoformat(), "expires_at": p_expires_at,
+        }, merge=True)
+        return "ok"
+
+    def _rpc_rotate_user_session(self, p_user_id, p_device_id, p_old_refresh_token_hash, p_new_refresh_token_hash,
+                                 p_expires_at):
+        sessions = self._sessions(p_user_id)
+        session = next((s for s in sessions if s["device_id"] == p_device_id and s["is_active"]
+                        and s.get("refresh_token_hash") == p_old_refresh_token_hash), None)
+        if session is None:
+            return []
+        session.update(refresh_token_hash=p_new_refresh_token_hash, last_activity=_now().isoformat(), expires_at=p_expires_at)
+        for other in sessions:
+            if other is not session:
+                other["is_active"] = False
+        user = self._user(p_user_id) or {}
+        return [{"device_id": p_device_id, "email": user.get("email"), "plan": user.get("plan")}]
+
+    def _rpc_touch_user_sessions(self, p_updates):
+        updated = 0
+        for update in p_updates:
+            for session in self._sessions(update["user_id"]):
+                if session["device_id"] == update["device_id"] and session["is_active"]:
+                    session["last_activity"] = max(session.get("last_activity") or "", update["last_activity"])
+                    updated += 1
+        return updated
+
+    def _rpc_acquire_maintenance_lease(self, p_name, p_holder, p_ttl_seconds):
+        leases = self.tables["maintenance_leases"]
+        lease = next((lease for lease in leases if lease["name"] == p_name), None)
+        expires_at = (_now() + timedelta(seconds=p_ttl_seconds)).isoformat()
+        if lease is None:
+            leases.append({"name": p_name, "holder": p_holder, "expires_at": expires_at})
+            return True
+        if _coerce(lease["expires_at"]) < _now() or lease["holder"] == p_holder:
+            lease.update(holder=p_holder, expires_at=expires_at)
+            return True
+        return False
+
+    def _expired_chunk(self, p_before, p_after_expires_at, p_after_id, p_limit, active_only: bool):
+        before = _coerce(p_before)
+        cursor = (_coerce(p_after_expires_at), p_after_id) if p_after_expires_at else None
+        rows = sorted(
+            (s for s in self.tables["user_sessions"]
+             if s.get("expires_at") and _coerce(s["expires_at"]) < before and (s["is_active"] or not active_only)
+             and (cursor is None or (_coerce(s["expires_at"]), s["id"]) > cursor)),
+            key=lambda s: (_coerce(s["expires_at"]), s["id"])
+        )[:p_limit]
+        last = rows[-1] if rows else None
+        return rows, [{"processed": len(rows), "last_expires_at": last["expires_at"] if last else None,
+                       "last_id": last["id"] if last else None}]
+
+    def _rpc_deactivate_expired_sessions(self, p_before, p_after_expires_at, p_after_id, p_limit):
+        rows, result = self._expired_chunk(p_before, p_after_expires_at, p_after_id, p_limit, active_only=True)
+        for row in rows:
+            row["is_active"] = False
+        return result
+
+    def _rpc_delete_expired_sessions(self, p_before, p_after_expires_at, p_after_id, p_limit):
+        rows, result = self._expired_chunk(p_before, p_after_expires_at, p_after_id, p_limit, active_only=False)
+        ids = {row["id"] for row in rows}
+        self.tables["user_sessions"] = [s for s in self.tables["user_sessions"] if s["id"] not in ids]
+        return result
+
+    # ===== ASGI =====
+    async def __call__(self, scope, receive, send):
+        method = scope["method"]
+        path = scope["path"][len("/rest/v1/"):].strip("/")
+        params = parse_qsl(scope["query_string"].decode(), keep_blank_values=True)
+        headers = {name.decode().lower(): value.decode() for name, value in scope["headers"]}
+        prefer = headers.get("prefer", "")
+        body = await _body(receive)
+        self.calls[f"{method} {path}"] += 1
+
+        await self.faults.delay()
+        if self.faults.should_fail():
+            await _respond(send, self.faults.failure_status, {"message": "injected failure"})
+            return
+
+        if path.startswith("rpc/"):
+            status, result = self._rpc(path[4:], json.loads(body or b"{}"))
+            await _respond(send, status, result)
+            return
+
+        table, query = path, dict(params)
+        representation = "return=representation" in prefer
+        if method == "GET":
+            await _respond(send, 200, self._project(self._select(table, params), query))
+        elif method == "POST":
+            status, rows = self._insert(table, json.loads(body), merge="resolution=merge-duplicates" in prefer)
+            await _respond(send, status, rows if representation or status != 201 else None)
+        elif method == "PATCH":
+            rows = self._select(table, params)
+            for row in rows:
+                row.update(json.loads(body))
+            await _respond(send, 200 if representation else 204, [dict(row) for row in rows] if representation else None)
+        elif method == "DELETE":
+            rows = self._select(table, params)
+            ids = {id(row) for row in rows}
+            self.tables[table] = [row for row in self.tables[table] if id(row) not in ids]
+            await _respond(send, 200 if representation else 204, [dict(row) for row in rows] if representation else None)
+        else:
+            await _respond(send, 405, {"message": f"{method} not supported"})
+
+class FakeGemini:
+    """``/v1beta/models/<model>:generateContent`` and ``:streamGenerateContent``"""
+
+    def __init__(self, faults: Optional[FaultInjector] = None, stream_chunks: int = 8):
+        self.faults = faults or FaultInjector()
+        self.stream_chunks = stream_chunks
+        self.calls: Counter = Counter()
+        self.request_bytes = 0
+
+    @staticmethod
+    def _candidate(text: str, finish: Optional[str] = "STOP") -> dict:
+        candidate = {"content": {"parts": [{"text": text}], "role": "model"}, "index": 0}
+        if finish:
+            candidate["finishReason"] = finish
+        return {"candidates": [candidate]}
+
+    async def __call__(self, scope, receive, send):
+        _, _, method = scope["path"].rpartition(":")
+        body = await _body(receive)
+        self.calls[method] += 1
+        self.request_bytes += len(body)
+        try:
+            payload = json.loads(body)
+            assert payload["contents"][0]["parts"]
+        except Exception:
+            await _respond(send, 400, {"error": {"code": 400, "message": "Invalid JSON payload", "status": "INVALID_ARGUMENT"}})
+            return
+
+        if self.faults.should_fail():
+            await self.faults.delay()
+            await _respond(send, self.faults.failure_status,
+                           {"error": {"code": self.faults.failure_status, "message": "injected failure", "status": "UNAVAILABLE"}})
+            return
+
+        if method == "generateContent":
+            await self.faults.delay()
+            await _respond(send, 200, {**self._candidate(RECIPE_TEXT), "usageMetadata": {"promptTokenCount": len(body) // 4}})
+            return
+        if method != "streamGenerateContent":
+            await _respond(send, 404, {"error": {"code": 404, "message": f"Unknown method {method}"}})
+            return
+
+        # Time to first token, then the rest of the latency spread over the chunks
+        await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"text/event-stream")]})
+        size = -(-len(RECIPE_TEXT) // self.stream_chunks)
+        pieces = [RECIPE_TEXT[i:i + size] for i in range(0, len(RECIPE_TEXT), size)]
+        per_chunk = self.faults.latency_ms / 1000 / (len(pieces) + 1)
+        await asyncio.sleep(per_chunk)
+        for index, piece in enumerate(pieces):
+            await asyncio.sleep(per_chunk)
+            event = self._candidate(piece, "STOP" if index == len(pieces) - 1 else None)
+            await send({"type": "http.response.body", "body": f"data: {json.dumps(event)}\r\n\r\n".encode(), "more_body": True})
+        await send({"type": "http.response.body", "body": b""})
+
+class FakeUpstreams:
+    """Both fakes behind one ASGI app, plus ``/__admin/health`` and ``/__admin/stats``"""
+
+    def __init__(self, postgrest: FakePostgrest, gemini: FakeGemini):
+        self.postgrest = postgrest
+        self.gemini = gemini
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            while True:
+                message = await receive()
+                if message["type"] == "lifespan.startup":
+                    await send({"type": "lifespan.startup.complete"})
+                elif message["type"] == "lifespan.shutdown":
+                    await send({"type": "lifespan.shutdown.complete"})
+                    return
+        path = scope["path"]
+        if path.startswith("/rest/v1/"):
+            await self.postgrest(scope, receive, send)
+        elif path.startswith("/v1beta/models/"):
+            await self.gemini(scope, receive, send)
+        elif path == "/__admin/health":
+            await _respond(send, 200, {"status": "ok"})
+        elif path == "/__admin/stats":
+            await _respond(send, 200, {
+                "postgrest_calls": dict(self.postgrest.calls),
+                "gemini_calls": dict(self.gemini.calls),
+                "gemini_request_bytes": self.gemini.request_bytes,
+                "rows": {table: len(rows) for table, rows in self.postgrest.tables.items()},
+            })
+        else:
+            await _respond(send, 404, {"message": "not found"})
+
+def build_app(users: int = 0, password: str = "load-test-password", bcrypt_rounds: int = 10, plan: str = "pro",
+              supabase: Optional[FaultInjector] = None, gemini: Optional[FaultInjector] = None) -> FakeUpstreams:
+    """Fakes seeded with ``users`` accounts ``load{i}@example.com`` sharing one password"""
+    postgrest = FakePostgrest(supabase)
+    if users:
+        from passlib.hash import bcrypt
+        password_hash = bcrypt.using(rounds=bcrypt_rounds).hash(password)
+        for i in range(users):
+            postgrest.add_user(f"load{i}@example.com", password_hash, plan)
+    return FakeUpstreams(postgrest, FakeGemini(gemini))
+
+if __name__ == "__main__":
+    import uvicorn
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8787)
+    parser.add_argument("--users", type=int, default=32)
+    parser.add_argument("--password", default="load-test-password")
+    parser.add_argument("--bcrypt-rounds", type=int, default=10)
+    parser.add_argument("--plan", default="pro", choices=["free", "pro"])
+    parser.add_argument("--supabase-latency-ms", type=float, default=15.0)
+    parser.add_argument("--supabase-jitter-ms", type=float, default=5.0)
+    parser.add_argument("--supabase-failure-rate", type=float, default=0.0)
+    parser.add_argument("--gemini-latency-ms", type=float, default=800.0)
+    parser.add_argument("--gemini-jitter-ms", type=float, default=200.0)
+    parser.add_argument("--gemini-failure-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    app = build_app(
+        users=args.users, password=args.password, bcrypt_rounds=args.bcrypt_rounds, plan=args.plan,
+        supabase=FaultInjector(args.supabase_latency_ms, args.supabase_jitter_ms, args.supabase_failure_rate),
+        gemini=FaultInjector(args.gemini_latency_ms, args.gemini_jitter_ms, args.gemini_failure_rate),
+    )
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning", access_log=False)
@@ -0,0 +1,328 @@
+"""Load test: the real API against the in-memory fakes, at fixed concurrency.
+
+Starts ``benchmarks.fakes`` and ``uvicorn main:app`` as subprocesses (the API
+configured to use the fakes, with rate limiting, caches and the free-tier
+delay off), logs each virtual user in on its own device, then runs every
+scenario for ``--duration`` seconds with ``--concurrency`` workers:
+
+- ``me``        GET  /api/auth/me
+- ``analyze``   POST /api/analyze (a generated JPEG; one fake Gemini call each)
+- ``refresh``   POST /api/auth/refresh (rotation; the worker keeps the new tokens)
+- ``login``     POST /api/auth/login-secure (bcrypt at ``--bcrypt-rounds``)
+
+Reports p50/p95/p99/mean/max latency, throughput and status counts per
+scenario, plus the upstream time the API spent per call (scraped from
+``/metrics``), and saves them to ``benchmarks/results/load_<commit>_<time>.json``.
+Pass ``--compare`` an earlier result to print the deltas:
+
+    python -m benchmarks.load_test --duration 20 --concurrency 16
+    python -m benchmarks.load_test --compare benchmarks/results/load_0c16de8_20261017-101500.json
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import httpx
+
+SERVER_DIR = Path(__file__).resolve().parent.parent
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+PASSWORD = "load-test-password"
+SCENARIOS = ("me", "analyze", "refresh", "login")
+LABEL_PATTERN = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+
+class VirtualUser:
+    """One account on one device; keeps its latest token pair"""
+
+    def __init__(self, index: int):
+        self.email = f"load{index}@example.com"
+        self.device_id = f"load-device-{index}"
+        self.token = ""
+        self.refresh_token = ""
+
+    def login_body(self) -> dict:
+        return {"email": self.email, "password": PASSWORD, "device_id": self.device_id,
+                "device_info": {"platform": "load-test"}}
+
+    def auth(self) -> dict:
+        return {"Authorization": f"Bearer {self.token}"}
+
+    def remember(self, response: httpx.Response):
+        if response.status_code == 200:
+            body = response.json()
+            self.token = body.get("token") or self.token
+            self.refresh_token = body.get("refresh_token") or self.refresh_token
+
+def make_images(count: int, size: int = 640) -> List[bytes]:
+    """Distinct JPEGs so nothing upstream can dedupe them"""
+    from PIL import Image
+    images = []
+    for _ in range(count):
+        image = Image.effect_noise((size, size * 3 // 4), random.uniform(20, 80)).convert("RGB")
+        buffer = io.BytesIO()
+        image.save(buffer, format="JPEG", quality=85)
+        images.append(buffer.getvalue())
+    return images
+
+def scenario_calls(images: List[bytes]) -> Dict[str, Callable]:
+    async def me(client: httpx.AsyncClient, user: VirtualUser) -> httpx.Response:
+        return await client.get("/api/auth/me", headers=user.auth())
+
+    async def analyze(client: httpx.AsyncClient, user: VirtualUser) -> httpx.Response:
+        files = {"file": ("fridge.jpg", random.choice(images), "image/jpeg")}
+        return await client.post("/api/analyze", headers=user.auth(), files=files, data={"prompt": ""})
+
+    async def refresh(client: httpx.AsyncClient, user: VirtualUser) -> httpx.Response:
+        response = await client.post("/api/auth/refresh", json={"refresh_token": user.refresh_token})
+        user.remember(response)
+        return response
+
+    async def login(client: httpx.AsyncClient, user: VirtualUser) -> httpx.Response:
+        response = await client.post("/api/auth/login-secure", json=user.login_body())
+        user.remember(response)
+        return response
+
+    return {"me": me, "analyze": analyze, "refresh": refresh, "login": login}
+
+def percentile(ordered: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, max(0, int(round(fraction * len(ordered) + 0.5)) - 1))]
+
+def summarize(latencies: List[float], statuses: Counter, elapsed: float) -> dict:
+    ordered = sorted(latencies)
+    return {
+        "requests": len(ordered),
+        "throughput_rps": round(len(ordered) / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": {
+            "mean": round(sum(ordered) / len(ordered), 2) if ordered else 0.0,
+            "p50": round(percentile(ordered, 0.50), 2),
+            "p95": round(percentile(ordered, 0.95), 2),
+            "p99": round(percentile(ordered, 0.99), 2),
+            "max": round(ordered[-1], 2) if ordered else 0.0,
+        },
+        "statuses": dict(sorted(statuses.items())),
+    }
+
+def parse_upstream_metrics(text: str) -> Dict[str, Dict[str, float]]:
+    """``upstream operation`` -> {sum, count} from the /metrics exposition"""
+    series: Dict[str, Dict[str, float]] = defaultdict(lambda: {"sum": 0.0, "count": 0.0})
+    for line in text.splitlines():
+        for suffix in ("sum", "count"):
+            prefix = f"chefbot_upstream_request_duration_seconds_{suffix}{{"
+            if line.startswith(prefix):
+                labels, _, value = line[len(prefix):].rpartition("} ")
+                parsed = dict(LABEL_PATTERN.findall(labels))
+                series[f"{parsed['upstream']} {parsed['operation']}"][suffix] += float(value)
+    return dict(series)
+
+def upstream_delta(before: dict, after: dict, requests: int) -> Dict[str, dict]:
+    """Upstream calls and time per scenario request, from two /metrics scrapes"""
+    delta = {}
+    for key, totals in after.items():
+        previous = before.get(key, {"sum": 0.0, "count": 0.0})
+        calls = totals["count"] - previous["count"]
+        if calls and requests:
+            delta[key] = {
+                "calls_per_request": round(calls / requests, 3),
+                "mean_ms": round((totals["sum"] - previous["sum"]) / calls * 1000, 2),
+            }
+    return delta
+
+async def run_scenario(client: httpx.AsyncClient, call: Callable, users: List[VirtualUser], concurrency: int,
+                       duration: float) -> dict:
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    deadline = time.perf_counter() + duration
+
+    async def worker(user: VirtualUser):
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                response = await call(client, user)
+                statuses[str(response.status_code)] += 1
+            except httpx.HTTPError as e:
+                statuses[type(e).__name__] += 1
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(users[i % len(users)]) for i in range(concurrency)))
+    return summarize(latencies, statuses, time.perf_counter() - start)
+
+def ensure_port_free(port: int):
+    with socket.socket() as probe:
+        if probe.connect_ex(("127.0.0.1", port)) == 0:
+            raise SystemExit(f"port {port} is already in use (a leftover fakes/API process?)")
+
+def start_process(args: List[str], env: dict, log_path: Path) -> subprocess.Popen:
+    log = open(log_path, "w")
+    return subprocess.Popen([sys.executable, *args], cwd=SERVER_DIR, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+async def wait_ready(url: str, process: subprocess.Popen, log_path: Path, timeout: float = 30.0):
+    async with httpx.AsyncClient() as client:
+        deadline = time.perf_counter() + timeout
+        while time.perf_counter() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError(f"{url} exited early:\n{log_path.read_text()[-2000:]}")
+            try:
+                if (await client.get(url)).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"{url} not ready after {timeout:.0f}s:\n{log_path.read_text()[-2000:]}")
+
+def api_env(args, workdir: Path) -> dict:
+    fakes_url = f"http://127.0.0.1:{args.fakes_port}"
+    env = dict(os.environ)
+    env.update({
+        "SUPABASE_URL": fakes_url,
+        "SUPABASE_SERVICE_KEY": "load-test-service-key",
+        "GEMINI_API_URL": f"{fakes_url}/v1beta",
+        "GEMINI_API_KEY": "load-test-gemini-key",
+        "GEMINI_MODEL": "gemini-fake",
+        "JWT_SECRET": "load-test-secret-" + "x" * 32,
+        "DATA_BACKEND": "postgrest",
+        "RATE_LIMIT_ENABLED": "false",
+        "FREE_DELAY_SECONDS": "0",
+        "ANALYSIS_CACHE_ENABLED": "false",
+        "NEAR_DUPLICATE_ENABLED": "false",
+        "EMAIL_TRANSPORT": "log",
+        "EMAIL_OUTBOX_DB_PATH": str(workdir / "email_outbox.db"),
+        "JOB_QUEUE_DB_PATH": str(workdir / "analysis_jobs.db"),
+        "BCRYPT_ROUNDS": str(args.bcrypt_rounds),
+        "BCRYPT_MIN_ROUNDS": str(args.bcrypt_rounds),
+        "METRICS_ENABLED": "true",
+    })
+    return env
+
+def git_commit() -> str:
+    try:
+        sha = subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=SERVER_DIR, text=True).strip()
+        dirty = subprocess.run(["git", "diff", "--quiet", "HEAD", "--", "."], cwd=SERVER_DIR).returncode != 0
+        return sha + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def print_report(results: dict, baseline: Optional[dict]):
+    print(f"\n{'scenario':10s} {'req/s':>9s} {'p50':>9s} {'p95':>9s} {'p99':>9s} {'max':>9s}  statuses")
+    for name, result in results["scenarios"].items():
+        latency = result["latency_ms"]
+        print(f"{name:10s} {result['throughput_rps']:9.1f} {latency['p50']:8.1f}ms {latency['p95']:8.1f}ms "
+              f"{latency['p99']:8.1f}ms {latency['max']:8.1f}ms  {result['statuses']}")
+        for operation, upstream in result["upstream"].items():
+            print(f"{'':10s}   {operation}: {upstream['calls_per_request']} calls/req, {upstream['mean_ms']}ms each")
+        old = (baseline or {}).get("scenarios", {}).get(name)
+        if old:
+            def change(new: float, previous: float) -> str:
+                return f"{(new - previous) / previous * 100:+.1f}%" if previous else "n/a"
+            print(f"{'':10s}   vs {baseline['commit']}: req/s {change(result['throughput_rps'], old['throughput_rps'])}, "
+                  + ", ".join(f"{p} {change(latency[p], old['latency_ms'][p])}" for p in ("p50", "p95", "p99")))
+
+async def main(args):
+    scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        raise SystemExit(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    baseline = json.loads(Path(args.compare).read_text()) if args.compare else None
+    user_count = args.users or args.concurrency
+
+    ensure_port_free(args.fakes_port)
+    ensure_port_free(args.api_port)
+    with tempfile.TemporaryDirectory(prefix="chefbot-load-") as tmp:
+        workdir = Path(tmp)
+        fakes = start_process([
+            "-m", "benchmarks.fakes", "--port", str(args.fakes_port), "--users", str(user_count),
+            "--password", PASSWORD, "--bcrypt-rounds", str(args.bcrypt_rounds), "--plan", args.plan,
+            "--supabase-latency-ms", str(args.supabase_latency_ms), "--supabase-jitter-ms", str(args.supabase_latency_ms / 4),
+            "--supabase-failure-rate", str(args.supabase_failure_rate),
+            "--gemini-latency-ms", str(args.gemini_latency_ms), "--gemini-jitter-ms", str(args.gemini_latency_ms / 4),
+            "--gemini-failure-rate", str(args.gemini_failure_rate),
+        ], dict(os.environ), workdir / "fakes.log")
+        api = start_process([
+            "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(args.api_port),
+            "--log-level", "warning", "--no-access-log",
+        ], api_env(args, workdir), workdir / "api.log")
+        try:
+            await wait_ready(f"http://127.0.0.1:{args.fakes_port}/__admin/health", fakes, workdir / "fakes.log")
+            await wait_ready(f"http://127.0.0.1:{args.api_port}/api/health", api, workdir / "api.log")
+
+            limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+            async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.api_port}", limits=limits,
+                                         timeout=60.0) as client:
+                users = [VirtualUser(i) for i in range(user_count)]
+                for user in users:
+                    response = await client.post("/api/auth/login-secure", json=user.login_body())
+                    if response.status_code != 200:
+                        raise RuntimeError(f"login for {user.email} failed: {response.status_code} {response.text}")
+                    user.remember(response)
+                print(f"✅ {user_count} users logged in; {len(scenarios)} scenarios x {args.duration:.0f}s "
+                      f"at concurrency {args.concurrency}")
+
+                calls = scenario_calls(make_images(8) if "analyze" in scenarios else [])
+                results = {"scenarios": {}}
+                for name in scenarios:
+                    before = parse_upstream_metrics((await client.get("/metrics")).text)
+                    result = await run_scenario(client, calls[name], users, args.concurrency, args.duration)
+                    after = parse_upstream_metrics((await client.get("/metrics")).text)
+                    result["upstream"] = upstream_delta(before, after, result["requests"])
+                    results["scenarios"][name] = result
+                    print(f"  {name}: {result['requests']} requests, p95 {result['latency_ms']['p95']}ms")
+                fake_stats = (await client.get(f"http://127.0.0.1:{args.fakes_port}/__admin/stats")).json()
+        finally:
+            for process in (api, fakes):
+                process.terminate()
+                try:
+                    process.wait(timeout=10)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+
+    commit = git_commit()
+    results = {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "config": {
+            "duration_seconds": args.duration, "concurrency": args.concurrency, "users": user_count,
+            "plan": args.plan, "bcrypt_rounds": args.bcrypt_rounds,
+            "supabase_latency_ms": args.supabase_latency_ms, "gemini_latency_ms": args.gemini_latency_ms,
+            "supabase_failure_rate": args.supabase_failure_rate, "gemini_failure_rate": args.gemini_failure_rate,
+        },
+        **results,
+        "fakes": fake_stats,
+    }
+    print_report(results, baseline)
+
+    output = Path(args.output) if args.output else RESULTS_DIR / f"load_{commit}_{time.strftime('%Y%m%d-%H%M%S')}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2))
+    print(f"\n💾 saved {output}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds per scenario")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--users", type=int, default=0, help="accounts to spread workers over (default: concurrency)")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--plan", default="pro", choices=["free", "pro"])
+    parser.add_argument("--bcrypt-rounds", type=int, default=10)
+    parser.add_argument("--supabase-latency-ms", type=float, default=15.0)
+    parser.add_argument("--gemini-latency-ms", type=float, default=800.0)
+    parser.add_argument("--supabase-failure-rate", type=float, default=0.0)
+    parser.add_argument("--gemini-failure-rate", type=float, default=0.0)
+    parser.add_argument("--api-port", type=int, default=8799)
+    parser.add_argument("--fakes-port", type=int, default=8787)
+    parser.add_argument("--output", default="", help="result path (default: benchmarks/results/load_<commit>_<time>.json)")
+    parser.add_argument("--compare", default="", help="earlier result JSON to diff against")
+    asyncio.run(main(parser.parse_args()))
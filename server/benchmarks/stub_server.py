@@ -0,0 +1,78 @@
+"""Minimal local HTTP/1.1 stub server used by the benchmarks.
+
+Speaks just enough HTTP/1.1 (keep-alive, Content-Length bodies) to stand in
+for Supabase/Gemini. ``connect_delay`` is paid once per new TCP connection and
+models the TCP+TLS handshake round trips to a remote upstream; ``request_delay``
+is paid on every request and models server processing time. A handler may
+return ``(status, payload)`` to answer with a status other than 200.
+"""
+import asyncio
+import json
+from typing import Callable, Optional
+
+class StubHTTPServer:
+    def __init__(self, connect_delay: float = 0.0, request_delay: float = 0.0,
+                 handler: Optional[Callable[[str, str, bytes], object]] = None):
+        self.connect_delay = connect_delay
+        self.request_delay = request_delay
+        self.handler = handler or (lambda method, path, body: [])
+        self.connections = 0
+        self.requests = 0
+        self._server = None
+        self.port = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc):
+        await self.stop()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        if self.connect_delay:
+            await asyncio.sleep(self.connect_delay)
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                lines = head.decode("latin-1").split("\r\n")
+                method, path, _ = lines[0].split(" ", 2)
+                headers = {}
+                for line in lines[1:]:
+                    if ":" in line:
+                        key, value = line.split(":", 1)
+                        headers[key.strip().lower()] = value.strip()
+                body = b""
+                if "content-length" in headers:
+                    body = await reader.readexactly(int(headers["content-length"]))
+                self.requests += 1
+                if self.request_delay:
+                    await asyncio.sleep(self.request_delay)
+                result = self.handler(method, path, body)
+                status = 200
+                if isinstance(result, tuple):
+                    status, result = result
+                payload = json.dumps(result).encode()
+                writer.write(
+                    f"HTTP/1.1 {status} {'OK' if status < 400 else 'Error'}\r\n".encode()
+                    + b"Content-Type: application/json\r\n"
+                    + f"Content-Length: {len(payload)}\r\n\r\n".encode()
+                    + payload
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionResetError):
+            pass
+        finally:
+            writer.close()
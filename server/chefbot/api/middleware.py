@@ -0,0 +1,197 @@
+"""ASGI middleware"""
+import hmac
+import logging
+import random
+import re
+import time
+from typing import Optional
+from starlette.datastructures import MutableHeaders
+from starlette.responses import JSONResponse
+from chefbot.services import metrics
+from chefbot.services.profiler import SamplingProfiler
+from chefbot.services.rate_limiter import RateLimiter
+from chefbot.utils import log
+from chefbot.utils.auth import verify_token
+
+logger = logging.getLogger(__name__)
+
+class RateLimitMiddleware:
+    """Rate limits analysis uploads before the request body is read.
+
+    The user is identified from the bearer token alone (signature check, no
+    database call), so over-limit clients are rejected before their image
+    is uploaded or Supabase is queried. Requests without a valid token pass
+    through and are rejected by the auth dependency as usual.
+    """
+
+    def __init__(self, app, limiter: RateLimiter, path_prefix: str = "/api/analyze"):
+        self.app = app
+        self.limiter = limiter
+        self.path_prefix = path_prefix
+
+    @staticmethod
+    def _user_id(scope) -> Optional[str]:
+        for name, value in scope.get("headers", []):
+            if name == b"authorization":
+                scheme, _, token = value.decode("latin-1").partition(" ")
+                if scheme.lower() != "bearer" or not token:
+                    return None
+                try:
+                    return verify_token(token.strip())
+                except Exception:
+                    return None
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or not scope["path"].startswith(self.path_prefix):
+            await self.app(scope, receive, send)
+            return
+
+        user_id = self._user_id(scope)
+        if user_id is None:
+            await self.app(scope, receive, send)
+            return
+
+        result = await self.limiter.hit(user_id)
+        if not result.allowed:
+            logger.info("Rate limit exceeded", extra={"user_id": user_id, "limit": result.limit,
+                                                      "retry_after": round(result.retry_after)})
+            response = JSONResponse(
+                {"detail": "Rate limit exceeded. Please try again later."},
+                status_code=429,
+                headers=result.headers()
+            )
+            await response(scope, receive, send)
+            return
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                for name, value in result.headers().items():
+                    headers.setdefault(name, value)
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
+
+class MetricsMiddleware:
+    """Per-route request latency and status counts.
+
+    Requests are labelled with the matched route template (``/api/analyze/jobs/{job_id}``),
+    never the raw path, so label cardinality stays bounded. Latency runs until
+    the last body chunk is sent, which includes streamed responses.
+    """
+
+    def __init__(self, app, exclude_paths: tuple = ("/metrics",)):
+        self.app = app
+        self.exclude_paths = exclude_paths
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.exclude_paths:
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            route = getattr(route, "path", None) or "unmatched"
+            metrics.http_request_duration.observe(time.perf_counter() - start, scope["method"], route)
+            metrics.http_requests.inc(scope["method"], route, str(status))
+
+class RequestLoggingMiddleware:
+    """Request ids, timing spans and one structured log line per request.
+
+    The id comes from a well-formed incoming ``X-Request-ID`` (so a proxy's id
+    is kept) or is generated, and is echoed on the response. Everything the
+    request logs carries it, and the final ``request`` line lists the spans
+    recorded with ``log.span`` plus the fields added with ``log.annotate``.
+    """
+
+    REQUEST_ID_PATTERN = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+    def __init__(self, app, exclude_paths: tuple = ("/metrics", "/api/health")):
+        self.app = app
+        self.exclude_paths = exclude_paths
+        self.logger = logging.getLogger("chefbot.request")
+
+    def _incoming_id(self, scope) -> Optional[str]:
+        for name, value in scope.get("headers", []):
+            if name == b"x-request-id":
+                request_id = value.decode("latin-1")
+                return request_id if self.REQUEST_ID_PATTERN.match(request_id) else None
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with log.trace(self._incoming_id(scope)) as trace:
+            request_id = log.request_id_var.get()
+            status = 500
+
+            async def send_with_id(message):
+                nonlocal status
+                if message["type"] == "http.response.start":
+                    status = message["status"]
+                    MutableHeaders(scope=message).setdefault("X-Request-ID", request_id)
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_with_id)
+            finally:
+                if scope["path"] not in self.exclude_paths or status >= 500:
+                    route = getattr(scope.get("route"), "path", None) or "unmatched"
+                    self.logger.log(
+                        logging.ERROR if status >= 500 else logging.INFO, "request",
+                        extra={"method": scope["method"], "route": route, "status": status,
+                               "duration_ms": trace.elapsed_ms(), "spans": trace.timeline(), **trace.fields}
+                    )
+
+class ProfilerMiddleware:
+    """Samples selected requests with the statistical profiler.
+
+    A request is profiled when the profiler is enabled and either a
+    ``sample_rate`` coin flip selects it or it carries ``X-Profile-Token``
+    matching PROFILER_ADMIN_TOKEN. Both settings are read per request, so
+    switching them at runtime takes effect immediately. Unprofiled requests
+    cost one attribute check.
+    """
+
+    def __init__(self, app, profiler: SamplingProfiler, admin_token: str = ""):
+        self.app = app
+        self.profiler = profiler
+        self.admin_token = admin_token.encode()
+
+    def _requested(self, scope) -> bool:
+        if not self.admin_token:
+            return False
+        for name, value in scope.get("headers", []):
+            if name == b"x-profile-token":
+                return hmac.compare_digest(value, self.admin_token)
+        return False
+
+    async def __call__(self, scope, receive, send):
+        if (scope["type"] != "http" or not self.profiler.enabled
+                or not (self._requested(scope) or random.random() < self.profiler.sample_rate)):
+            await self.app(scope, receive, send)
+            return
+
+        session = self.profiler.begin(f"{scope['method']} {scope['path']}", log.request_id_var.get())
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.profiler.end(session)
+            route = getattr(scope.get("route"), "path", None)
+            if route:
+                session.label = f"{scope['method']} {route}"
+            await self.profiler.save(session)
@@ -1,12 +1,29 @@
 """Recipe analysis routes"""
-import base64
+import logging
 import asyncio
-from typing import List
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Depends
-from chefbot.models.schemas import AnalyzeResponse, Recipe
+import json
+from typing import List, Optional, Tuple
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
+from fastapi.responses import StreamingResponse
+from chefbot.models.schemas import AnalyzeResponse, Recipe, BatchAnalyzeItem, BatchAnalyzeResponse, AnalysisJobResponse
 from chefbot.api.routes.auth import get_current_user
+from chefbot.services.repository import RepositoryError, repository
+from chefbot.services.gemini_service import (
+    analyze_with_gemini, stream_gemini_text, suggest_recipes_for_ingredients, FALLBACK_RESPONSE
+)
+from chefbot.services.recipe_parser import RecipeStreamParser
+from chefbot.services.analysis_cache import analysis_cache
+from chefbot.services.near_duplicates import near_duplicates
+from chefbot.services.job_queue import analysis_jobs
+from chefbot.services.rate_limiter import RateLimitResult, rate_limiter
+from chefbot.services.user_cache import user_cache
+from chefbot.services.image_pipeline import PreparedImage, prepare_image
+from chefbot.services.uploads import UploadForm, check_upload_headers, read_upload
+from chefbot.services import metrics
+from chefbot.utils import log
 from config.settings import settings
-import httpx
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api", tags=["analysis"])
 
@@ -21,193 +38,431 @@ def _choose_provider() -> str:
         return "gemini" if settings.GEMINI_API_KEY else "none"
     return settings.PROVIDER
 
-async def check_and_update_usage(user: dict) -> bool:
-    """Check if user can make a request and update usage"""
-    current_month = _current_month()
-    
-    # Update usage month if needed
-    if user.get("usage_month") != current_month:
-        user["monthly_usage"] = 0
-        user["usage_month"] = current_month
-        
-        async with httpx.AsyncClient() as client:
-            await client.patch(
-                f"{settings.SUPABASE_URL}/rest/v1/users?id=eq.{user['id']}",
-                headers=settings.SUPABASE_HEADERS,
-                json={"monthly_usage": 0, "usage_month": current_month}
-            )
+async def check_and_update_usage(user: dict, count: int = 1) -> bool:
+    """Check if user can make ``count`` analyses and update usage.
+
+    Month rollover, the free-tier limit check and the increment happen in one
+    atomic database call (``increment_monthly_usage``), so concurrent requests
+    can't lose increments or overshoot the limit.
+    """
+    try:
+        with log.span("usage_check"):
+            row = await repository.increment_monthly_usage(user["id"], count, _current_month(), settings.FREE_MAX_MONTHLY)
+    except RepositoryError as e:
+        logger.error("Usage metering failed: %s", e, extra={"user_id": user["id"]})
+        raise HTTPException(status_code=500, detail="Database error")
+
+    if row is None:
+        raise HTTPException(status_code=401, detail="User not found")
+
+    usage = {"monthly_usage": row["monthly_usage"], "usage_month": row["usage_month"]}
+    user.update(usage)
+    user_cache.update(user["id"], usage)
+    return bool(row["allowed"])
+
+async def check_rate_limit(user: dict) -> Optional[RateLimitResult]:
+    """Check rate limiting; returns the limiter result when the user is over their limit.
+
+    The request itself was already counted by RateLimitMiddleware; this
+    re-checks it against the user's actual plan, before the upload is read.
+    """
+    if not settings.RATE_LIMIT_ENABLED:
+        return None
+    with log.span("rate_limit"):
+        result = await rate_limiter.check(user)
+    return None if result.allowed else result
+
+async def _free_tier_delay(user: dict):
+    """Artificial delay for free tier users"""
+    if user.get("plan") == "free" and settings.FREE_DELAY_SECONDS > 0:
+        with log.span("free_tier_delay"):
+            await asyncio.sleep(settings.FREE_DELAY_SECONDS)
+        metrics.free_tier_delays.inc()
+        metrics.free_tier_delay_seconds.inc(amount=settings.FREE_DELAY_SECONDS)
+
+def _sse(event: str, data) -> str:
+    """Format one server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def _upload_openapi(batch: bool = False) -> dict:
+    """Request body schema for the docs (the multipart body is streamed by hand, not declared)"""
+    binary = {"type": "string", "format": "binary"}
+    properties = {"files": {"type": "array", "items": binary}} if batch else {"file": binary}
+    properties["prompt"] = {"type": "string", "default": ""}
+    if batch:
+        properties["merge"] = {"type": "boolean", "default": False}
+    schema = {"type": "object", "properties": properties, "required": ["files" if batch else "file"]}
+    return {"requestBody": {"required": True, "content": {"multipart/form-data": {"schema": schema}}}}
+
+def _over_free_quota(user: dict) -> bool:
+    """Whether the user's cached usage already rules out another analysis"""
+    return (
+        user.get("plan") == "free"
+        and user.get("usage_month") == _current_month()
+        and (user.get("monthly_usage") or 0) >= settings.FREE_MAX_MONTHLY
+    )
+
+def _quota_exceeded() -> HTTPException:
+    return HTTPException(
+        status_code=429, 
+        detail=f"Free plan limit reached: {settings.FREE_MAX_MONTHLY} analyses this month. Upgrade to Pro for unlimited usage."
+    )
+
+async def _precheck_limits(user: dict):
+    """Reject over-limit users before their upload is read.
+
+    Uses the limiter's counters and the user's cached usage, so nothing is
+    charged here; ``_charge_usage`` makes the authoritative atomic check.
+    """
+    rate_limited = await check_rate_limit(user)
+    if rate_limited is not None:
+        metrics.uploads_rejected.inc("rate_limit")
+        raise HTTPException(
+            status_code=429, 
+            detail="Rate limit exceeded. Please try again later.",
+            headers=rate_limited.headers()
+        )
+    if _over_free_quota(user):
+        metrics.uploads_rejected.inc("quota")
+        logger.info("Free plan limit reached", extra={"user_id": user["id"], "monthly_usage": user.get("monthly_usage")})
+        raise _quota_exceeded()
+
+async def _receive_upload(request: Request, user: dict, max_files: int = 1, reject_invalid: bool = True) -> UploadForm:
+    """Check the headers and the user's limits, then stream the body (cheapest rejection first)"""
+    check_upload_headers(request, max_files)
+    await _precheck_limits(user)
+    with log.span("read_upload"):
+        form = await read_upload(request, "files" if max_files > 1 else "file", max_files, reject_invalid)
+    log.annotate(upload_bytes=form.bytes_read)
+    if not form.files:
+        form.close()
+        raise HTTPException(status_code=400, detail="No images uploaded." if max_files > 1 else "No image uploaded.")
+    return form
+
+async def _find_cached(source, image_digest: bytes, prompt: str, user: dict) -> Tuple[Optional[AnalyzeResponse], Optional[str], Optional[PreparedImage]]:
+    """Look for an exact or near-duplicate earlier result; normalize the image on a miss.
+
+    ``source`` is the image bytes or its spooled upload file.
+    """
+    # Serve resubmitted photos from the cache
+    cache_key = None
+    cached = None
+    if settings.ANALYSIS_CACHE_ENABLED:
+        with log.span("cache_lookup"):
+            cache_key = analysis_cache.make_key(image_digest, prompt, settings.GEMINI_MODEL)
+            cached = await analysis_cache.get(cache_key)
     
-    # Check usage limits for free tier
-    if user.get("plan") == "free":
-        if user.get("monthly_usage", 0) >= settings.FREE_MAX_MONTHLY:
-            return False
+    # Normalize the upload (orientation, size, format) off the event loop
+    prepared = None
+    if cached is None:
+        with log.span("image_prepare"):
+            prepared = await prepare_image(source)
+        log.annotate(image=prepared.summary())
     
-    # Increment usage count
-    new_usage = user.get("monthly_usage", 0) + 1
-    async with httpx.AsyncClient() as client:
-        await client.patch(
-            f"{settings.SUPABASE_URL}/rest/v1/users?id=eq.{user['id']}",
-            headers=settings.SUPABASE_HEADERS,
-            json={"monthly_usage": new_usage}
-        )
+        # Reuse a recent result for a near-identical photo from the same user
+        if settings.NEAR_DUPLICATE_ENABLED and prepared.image_hash is not None:
+            hash_scope = analysis_cache.make_key(b"", prompt, settings.GEMINI_MODEL)
+            cached = near_duplicates.find(user["id"], prepared.image_hash, hash_scope)
     
-    user["monthly_usage"] = new_usage
-    return True
+    log.annotate(cache="miss" if cached is None else "hit")
+    return cached, cache_key, prepared
+
+async def _remember_result(result: AnalyzeResponse, prompt: str, user: dict, cache_key: Optional[str], prepared: PreparedImage):
+    """Store a fresh result for exact and near-duplicate reuse"""
+    if result is FALLBACK_RESPONSE:
+        return
+    if cache_key:
+        await analysis_cache.set(cache_key, result)
+    if settings.NEAR_DUPLICATE_ENABLED and prepared.image_hash is not None:
+        hash_scope = analysis_cache.make_key(b"", prompt, settings.GEMINI_MODEL)
+        near_duplicates.add(user["id"], prepared.image_hash, hash_scope, result)
 
-async def check_rate_limit(user: dict) -> bool:
-    """Check rate limiting"""
-    # TODO: Implement rate limiting logic
-    # For now, just return True
-    return True
+async def _charge_usage(user: dict, count: int = 1):
+    """Charge usage, raising 429 when the free plan is used up"""
+    if not await check_and_update_usage(user, count):
+        logger.info("Free plan limit reached", extra={"user_id": user["id"], "monthly_usage": user.get("monthly_usage")})
+        raise _quota_exceeded()
 
-async def analyze_with_gemini(image_data: bytes, prompt: str = "") -> AnalyzeResponse:
-    """Analyze image using Gemini API"""
+    log.annotate(monthly_usage=user.get("monthly_usage"), usage_month=user.get("usage_month"))
+
+async def _refund_usage(user: dict, count: int):
+    """Give back usage charged for analyses that failed (a negative charge)"""
     try:
-        # Encode image to base64
-        image_b64 = base64.b64encode(image_data).decode('utf-8')
-        
-        system_prompt = """You are an expert chef and food analyst. Analyze the image of food ingredients and:
-
-1. **Identify ingredients**: List all visible ingredients you can identify
-2. **Suggest recipes**: Provide 2-3 practical recipes using these ingredients
-3. **Be specific**: Include cooking times, steps, and quantities when possible
-4. **Consider combinations**: Think about how ingredients work together
-
-Format your response as JSON with this structure:
-{
-  "ingredients": ["ingredient1", "ingredient2", ...],
-  "recipes": [
-    {
-      "title": "Recipe Name",
-      "ingredients": ["ingredient with quantity", ...],
-      "steps": ["step 1", "step 2", ...],
-      "timeMins": 30
-    }
-  ]
-}
-"""
-        
-        if prompt:
-            system_prompt += f"\n\nUser's additional request: {prompt}"
-        
-        # Call Gemini API
-        gemini_payload = {
-            "contents": [{
-                "parts": [
-                    {"text": system_prompt},
-                    {
-                        "inline_data": {
-                            "mime_type": "image/jpeg",
-                            "data": image_b64
-                        }
-                    }
-                ]
-            }],
-            "generationConfig": {
-                "temperature": 0.7,
-                "candidateCount": 1,
-                "maxOutputTokens": 2048,
-            }
-        }
-        
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"https://generativelanguage.googleapis.com/v1beta/models/{settings.GEMINI_MODEL}:generateContent?key={settings.GEMINI_API_KEY}",
-                json=gemini_payload,
-                timeout=30.0
-            )
-            
-            if response.status_code != 200:
-                raise HTTPException(status_code=500, detail=f"Gemini API error: {response.status_code}")
-            
-            result = response.json()
-            
-            if "candidates" not in result or not result["candidates"]:
-                raise HTTPException(status_code=500, detail="No response from Gemini API")
-            
-            content = result["candidates"][0]["content"]["parts"][0]["text"]
-            
-            # Try to parse JSON from the response
-            import json
-            try:
-                # Clean up the response text
-                content = content.strip()
-                if content.startswith("```json"):
-                    content = content[7:]
-                if content.endswith("```"):
-                    content = content[:-3]
-                content = content.strip()
-                
-                parsed_result = json.loads(content)
-                
-                # Validate and convert to our model
-                recipes = []
-                for recipe_data in parsed_result.get("recipes", []):
-                    recipe = Recipe(
-                        title=recipe_data.get("title", "Unknown Recipe"),
-                        ingredients=recipe_data.get("ingredients", []),
-                        steps=recipe_data.get("steps", []),
-                        timeMins=recipe_data.get("timeMins")
-                    )
-                    recipes.append(recipe)
-                
-                return AnalyzeResponse(
-                    ingredients=parsed_result.get("ingredients", []),
-                    recipes=recipes
-                )
-                
-            except json.JSONDecodeError:
-                # Fallback: create a simple response
-                return AnalyzeResponse(
-                    ingredients=["Unable to identify ingredients"],
-                    recipes=[Recipe(
-                        title="Analysis Error",
-                        ingredients=["Check image quality"],
-                        steps=["Please try uploading a clearer image"],
-                        timeMins=None
-                    )]
-                )
-                
-    except Exception as e:
-        print(f"Gemini analysis error: {str(e)}")
-        raise HTTPException(status_code=500, detail="Analysis failed")
-
-@router.post("/analyze", response_model=AnalyzeResponse)
-async def analyze(file: UploadFile = File(...), prompt: str = Form(""), user: dict = Depends(get_current_user)):
-    """Analyze uploaded food image and generate recipes"""
-    print("ANALYZE endpoint called")
-    image_bytes = await file.read()
-    mime_type = file.content_type or "image/jpeg"
-    
-    if not (mime_type or "").startswith("image/"):
-        raise HTTPException(status_code=400, detail="Only image uploads are supported.")
+        await check_and_update_usage(user, -count)
+    except HTTPException as e:
+        logger.error("Usage refund failed: %s", e.detail, extra={"user_id": user["id"], "count": count})
+        return
+    log.annotate(refunded=count, monthly_usage=user.get("monthly_usage"))
 
-    # Check usage limits for free tier
-    if not await check_and_update_usage(user):
-        print(f"RAISING 429 for user_id={user['id']}")
-        raise HTTPException(
-            status_code=429, 
-            detail=f"Free plan limit reached: {settings.FREE_MAX_MONTHLY} analyses this month. Upgrade to Pro for unlimited usage."
-        )
+@router.post("/analyze", response_model=AnalyzeResponse, openapi_extra=_upload_openapi())
+async def analyze(request: Request, user: dict = Depends(get_current_user)):
+    """Analyze uploaded food image and generate recipes.
 
-    # Check rate limiting (requests per hour)
-    if not await check_rate_limit(user):
-        raise HTTPException(
-            status_code=429, 
-            detail="Rate limit exceeded. Please try again later."
-        )
+    Accepts JPEG, PNG, WebP and HEIC/HEIF, plus GIF, BMP and TIFF (converted
+    to JPEG); the format is detected from the file's bytes, not its
+    Content-Type. Other uploads get a 400.
+    """
+    form = await _receive_upload(request, user)
+    upload, prompt = form.files[0], form.fields.get("prompt", "")
+    try:
+        cached, cache_key, prepared = await _find_cached(upload.spool, upload.sha256, prompt, user)
+    finally:
+        form.close()
+    if cached is not None and settings.ANALYSIS_CACHE_SKIP_USAGE_ON_HIT:
+        return cached
 
-    print(f"ANALYZE: user_id={user['id']} email={user.get('email')} plan={user.get('plan')} monthly_usage={user.get('monthly_usage')} usage_month={user.get('usage_month')}")
+    await _charge_usage(user)
+
+    if cached is not None:
+        return cached
 
     # Add delay for free tier users
-    if user.get("plan") == "free" and settings.FREE_DELAY_SECONDS > 0:
-        await asyncio.sleep(settings.FREE_DELAY_SECONDS)
+    await _free_tier_delay(user)
 
     # Perform analysis
     try:
-        result = await analyze_with_gemini(image_bytes, prompt)
-        print("ANALYZE: Success")
+        result = await analyze_with_gemini(prepared.data, prompt, prepared.mime_type)
+        await _remember_result(result, prompt, user, cache_key, prepared)
         return result
     except Exception as e:
-        print(f"ANALYZE: Error - {str(e)}")
+        logger.warning("Analysis failed: %s", e, extra={"user_id": user["id"]})
+        raise
+
+@router.post("/analyze/stream", openapi_extra=_upload_openapi())
+async def analyze_stream(request: Request, user: dict = Depends(get_current_user)):
+    """Analyze uploaded food image, streaming results as server-sent events.
+
+    Events: ``status``, ``ingredients`` as soon as the ingredient list is parsed,
+    one ``recipe`` per completed recipe, then ``done`` with the full
+    AnalyzeResponse (or ``error``). Usage charged for a stream that ends in
+    ``error`` or the fallback response is refunded, as for batch items.
+    """
+    form = await _receive_upload(request, user)
+    upload, prompt = form.files[0], form.fields.get("prompt", "")
+    try:
+        cached, cache_key, prepared = await _find_cached(upload.spool, upload.sha256, prompt, user)
+    finally:
+        form.close()
+    if cached is None or not settings.ANALYSIS_CACHE_SKIP_USAGE_ON_HIT:
+        await _charge_usage(user)
+
+    async def events():
+        if cached is not None:
+            yield _sse("ingredients", {"ingredients": cached.ingredients})
+            for index, recipe in enumerate(cached.recipes):
+                yield _sse("recipe", {"index": index, "recipe": recipe.model_dump()})
+            yield _sse("done", cached.model_dump())
+            return
+
+        yield _sse("status", {"stage": "analyzing"})
+
+        # Add delay for free tier users
+        await _free_tier_delay(user)
+
+        parser = RecipeStreamParser()
+        try:
+            async for text in stream_gemini_text(prepared.data, prompt, prepared.mime_type):
+                for event, payload in parser.feed(text):
+                    if event == "ingredients":
+                        yield _sse("ingredients", {"ingredients": payload})
+                    else:
+                        yield _sse("recipe", {"index": len(parser.recipes) - 1, "recipe": payload.model_dump()})
+        except Exception as e:
+            logger.warning("Streaming analysis failed: %s", e, extra={"user_id": user["id"]})
+            await _refund_usage(user, 1)
+            yield _sse("error", {"detail": "Analysis failed"})
+            return
+
+        for event, payload in parser.finish():
+            yield _sse(event, {"ingredients": payload})
+
+        result = parser.result() or FALLBACK_RESPONSE
+        if result is FALLBACK_RESPONSE:
+            await _refund_usage(user, 1)
+        await _remember_result(result, prompt, user, cache_key, prepared)
+        yield _sse("done", result.model_dump())
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def _merge_ingredients(results: List[AnalyzeResponse]) -> List[str]:
+    """Union of ingredient lists, case-insensitive, in first-seen order"""
+    seen = set()
+    merged = []
+    for result in results:
+        for ingredient in result.ingredients:
+            key = ingredient.strip().lower()
+            if key and key not in seen:
+                seen.add(key)
+                merged.append(ingredient.strip())
+    return merged
+
+@router.post("/analyze/batch", response_model=BatchAnalyzeResponse, openapi_extra=_upload_openapi(batch=True))
+async def analyze_batch(request: Request, user: dict = Depends(get_current_user)):
+    """Analyze several photos (fridge, pantry, freezer) in one request.
+
+    Usage is charged once for all images that need a fresh analysis and
+    refunded for those whose analysis fails, Gemini calls run concurrently
+    (bounded by ANALYZE_BATCH_CONCURRENCY), and each image gets its own result
+    or error. With ``merge`` the ingredient lists are
+    combined into one extra recipe suggestion.
+    """
+    # Non-image parts are skipped while streaming and reported per item
+    form = await _receive_upload(request, user, settings.ANALYZE_BATCH_MAX_FILES, reject_invalid=False)
+    files, prompt = form.files, form.fields.get("prompt", "")
+    merge = form.fields.get("merge", "").strip().lower() in ("1", "true", "on", "yes")
+    log.annotate(files=len(files))
+
+    items = [BatchAnalyzeItem(index=index, filename=upload.filename, ok=False, error=upload.error)
+             for index, upload in enumerate(files)]
+
+    async def lookup(index: int):
+        if files[index].error:
+            return None
+        return await _find_cached(files[index].spool, files[index].sha256, prompt, user)
+
+    try:
+        lookups = await asyncio.gather(*(lookup(index) for index in range(len(files))))
+    finally:
+        form.close()
+
+    pending = []
+    for index, found in enumerate(lookups):
+        if found is None:
+            continue
+        cached, cache_key, prepared = found
+        if cached is not None:
+            items[index].ok = True
+            items[index].cached = True
+            items[index].result = cached
+        else:
+            pending.append((index, cache_key, prepared))
+
+    # One usage charge for the whole batch (cache hits follow the single-image rule)
+    billable = len(pending) + (0 if settings.ANALYSIS_CACHE_SKIP_USAGE_ON_HIT else sum(item.cached for item in items))
+    if billable:
+        await _charge_usage(user, billable)
+
+    if pending:
+        # Add delay for free tier users (once per batch)
+        await _free_tier_delay(user)
+
+        semaphore = asyncio.Semaphore(settings.ANALYZE_BATCH_CONCURRENCY)
+
+        async def run(index: int, cache_key: Optional[str], prepared: PreparedImage):
+            async with semaphore:
+                try:
+                    result = await analyze_with_gemini(prepared.data, prompt, prepared.mime_type)
+                except Exception as e:
+                    items[index].error = getattr(e, "detail", None) or "Analysis failed"
+                    return
+            if result is FALLBACK_RESPONSE:
+                items[index].error = "Analysis failed"
+                return
+            await _remember_result(result, prompt, user, cache_key, prepared)
+            items[index].ok = True
+            items[index].result = result
+
+        await asyncio.gather(*(run(*job) for job in pending))
+
+        failed = sum(not items[index].ok for index, _, _ in pending)
+        if failed:
+            await _refund_usage(user, failed)
+
+    response = BatchAnalyzeResponse(results=items)
+    successes = [item.result for item in items if item.ok]
+    if merge and successes:
+        try:
+            response.combined = await suggest_recipes_for_ingredients(_merge_ingredients(successes), prompt)
+        except HTTPException as e:
+            response.combined_error = e.detail
+
+    log.annotate(succeeded=sum(item.ok for item in items))
+    return response
+
+async def run_analysis_job(job: dict) -> AnalyzeResponse:
+    """Job queue handler: analyze a queued upload.
+
+    Usage was charged at submit time; a failed job (or a fallback result) is
+    refunded, as for batch items.
+    """
+    user = {"id": job["user_id"], "plan": job["plan"]}
+    prompt = job["prompt"] or ""
+    image = job["image"]
+    try:
+        cached, cache_key, prepared = await _find_cached(image, analysis_cache.image_digest(image), prompt, user)
+        if cached is not None:
+            return cached
+
+        # Add delay for free tier users
+        await _free_tier_delay(user)
+
+        result = await analyze_with_gemini(prepared.data, prompt, prepared.mime_type)
+        if result is FALLBACK_RESPONSE:
+            raise HTTPException(status_code=502, detail="Analysis failed")
+    except Exception:
+        await _refund_usage(user, 1)
         raise
+    await _remember_result(result, prompt, user, cache_key, prepared)
+    return result
+
+def _job_response(job: dict) -> AnalysisJobResponse:
+    return AnalysisJobResponse(
+        job_id=job["id"],
+        status=job["status"],
+        result=AnalyzeResponse.model_validate_json(job["result"]) if job.get("result") else None,
+        error=job.get("error"),
+        created_at=job.get("created_at"),
+        started_at=job.get("started_at"),
+        finished_at=job.get("finished_at"),
+    )
+
+@router.post("/analyze/jobs", response_model=AnalysisJobResponse, status_code=202, openapi_extra=_upload_openapi())
+async def submit_analysis_job(request: Request, user: dict = Depends(get_current_user)):
+    """Queue an image for analysis and return a job id straight away.
+
+    Poll ``GET /api/analyze/jobs/{job_id}`` (optionally with ``wait`` to
+    long-poll) for the result. Usage is charged when the job is accepted and
+    refunded if the job fails.
+    """
+    form = await _receive_upload(request, user)
+    upload, prompt = form.files[0], form.fields.get("prompt", "")
+    try:
+        # Exact resubmissions complete immediately
+        cached = None
+        if settings.ANALYSIS_CACHE_ENABLED:
+            cached = await analysis_cache.get(analysis_cache.make_key(upload.sha256, prompt, settings.GEMINI_MODEL))
+        if cached is None or not settings.ANALYSIS_CACHE_SKIP_USAGE_ON_HIT:
+            await _charge_usage(user)
+
+        if cached is not None:
+            job_id = await analysis_jobs.complete(user, prompt, cached)
+            return AnalysisJobResponse(job_id=job_id, status="done", result=cached)
+
+        # The job row keeps the original upload, so the spool is read whole here
+        image_bytes = await asyncio.to_thread(upload.read_bytes)
+    finally:
+        form.close()
+
+    job_id = await analysis_jobs.submit(user, image_bytes, prompt)
+    log.annotate(job_id=job_id, queue_depth=analysis_jobs.stats()["queue_depth"])
+    return AnalysisJobResponse(job_id=job_id, status="queued")
+
+@router.get("/analyze/jobs/{job_id}", response_model=AnalysisJobResponse)
+async def get_analysis_job(
+    job_id: str,
+    wait: float = Query(0, ge=0, description="Seconds to wait for the job to finish (long-poll)"),
+    user: dict = Depends(get_current_user)
+):
+    """Job status and, once finished, its result"""
+    timeout = min(wait, settings.JOB_LONG_POLL_MAX_SECONDS)
+    if timeout > 0:
+        job = await analysis_jobs.wait(job_id, user["id"], timeout)
+    else:
+        job = await analysis_jobs.get(job_id, user["id"])
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return _job_response(job)
@@ -1,9 +1,33 @@
 """Utility and debug routes"""
-from fastapi import APIRouter
+import hmac
+from typing import Optional
+from fastapi import APIRouter, Header, HTTPException
+from fastapi.responses import PlainTextResponse
 from config.settings import settings
-import httpx
+from chefbot.services.http_client import get_supabase_client
+from chefbot.services.analysis_cache import analysis_cache
+from chefbot.services.near_duplicates import near_duplicates
+from chefbot.services.image_pipeline import pipeline_stats
+from chefbot.services.job_queue import analysis_jobs
+from chefbot.services.email_outbox import email_outbox
+from chefbot.services.rate_limiter import rate_limiter
+from chefbot.services.user_cache import user_cache
+from chefbot.services.session_activity import session_activity
+from chefbot.services.session_cleanup import session_cleanup
+from chefbot.services import metrics
+from chefbot.services.profiler import loop_monitor, profiler
+from chefbot.models.schemas import ProfilerUpdate
+from chefbot.utils.auth import verified_tokens
 
 router = APIRouter(prefix="/api", tags=["utility"])
+metrics_router = APIRouter(tags=["utility"])
+
+@metrics_router.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """Prometheus scrape endpoint (this worker's metrics)"""
+    if not settings.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return PlainTextResponse(metrics.registry.render(), media_type=metrics.registry.CONTENT_TYPE)
 
 @router.get("/health")
 async def health():
@@ -16,26 +40,99 @@ async def debug_status():
     return {
         "provider": settings.PROVIDER,
         "actual_provider": "gemini" if settings.GEMINI_API_KEY else "none",
+        "data_backend": settings.DATA_BACKEND,
         "free_max_monthly": settings.FREE_MAX_MONTHLY,
         "free_delay": settings.FREE_DELAY_SECONDS,
         "cors_origins": settings.CORS_ORIGINS,
         "environment": "configured" if settings.SUPABASE_URL and settings.SUPABASE_SERVICE_KEY else "missing env vars"
     }
 
+@router.get("/debug/cache")
+async def debug_cache():
+    """Debug endpoint showing analysis cache counters"""
+    return {
+        "enabled": settings.ANALYSIS_CACHE_ENABLED,
+        **analysis_cache.stats(),
+        "near_duplicates": {"enabled": settings.NEAR_DUPLICATE_ENABLED, **near_duplicates.stats()},
+    }
+
+@router.get("/debug/image-pipeline")
+async def debug_image_pipeline():
+    """Debug endpoint showing image normalization totals"""
+    images = pipeline_stats["images"]
+    return {
+        "images": images,
+        "bytes_in": pipeline_stats["bytes_in"],
+        "bytes_out": pipeline_stats["bytes_out"],
+        "avg_stage_ms": {stage: round(ms / images, 2) for stage, ms in pipeline_stats["stage_ms"].items()} if images else {},
+    }
+
+@router.get("/debug/jobs")
+async def debug_jobs():
+    """Debug endpoint showing analysis job queue depth and wait times"""
+    return analysis_jobs.stats()
+
+@router.get("/debug/rate-limit")
+async def debug_rate_limit():
+    """Debug endpoint showing rate limiter counters"""
+    return rate_limiter.stats()
+
+@router.get("/debug/user-cache")
+async def debug_user_cache():
+    """Debug endpoint showing user and verified-token cache hit rates"""
+    return {**user_cache.stats(), "verified_tokens": verified_tokens.stats()}
+
+@router.get("/debug/email-outbox")
+async def debug_email_outbox():
+    """Debug endpoint showing email outbox backlog and failures"""
+    return await email_outbox.stats()
+
+@router.get("/debug/session-activity")
+async def debug_session_activity():
+    """Debug endpoint showing pending last_activity writes and flush latency"""
+    return {"enabled": settings.SESSION_ACTIVITY_ENABLED, **session_activity.stats()}
+
+@router.get("/debug/session-cleanup")
+async def debug_session_cleanup():
+    """Debug endpoint showing session cleanup runs (rows processed, duration)"""
+    return {"enabled": settings.SESSION_CLEANUP_ENABLED, **session_cleanup.stats()}
+
+@router.get("/debug/profiler")
+async def debug_profiler():
+    """Debug endpoint showing profiler and event-loop monitor state"""
+    return {"profiler": profiler.stats(), "loop_monitor": loop_monitor.stats()}
+
+@router.put("/debug/profiler")
+async def update_profiler(update: ProfilerUpdate, x_profile_token: Optional[str] = Header(None)):
+    """Switch profiling and the loop monitor at runtime in this worker (requires X-Profile-Token)"""
+    if not settings.PROFILER_ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="PROFILER_ADMIN_TOKEN is not configured")
+    if not x_profile_token or not hmac.compare_digest(x_profile_token, settings.PROFILER_ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid profiler token")
+
+    if update.enabled is not None:
+        profiler.enabled = update.enabled
+    if update.sample_rate is not None:
+        profiler.sample_rate = update.sample_rate
+    if update.loop_monitor_threshold_ms is not None:
+        loop_monitor.threshold = update.loop_monitor_threshold_ms / 1000
+    if update.loop_monitor_enabled is True:
+        await loop_monitor.start()
+    elif update.loop_monitor_enabled is False:
+        await loop_monitor.stop()
+    return await debug_profiler()
+
 @router.get("/debug/test-db")
 async def test_database():
     """Test database connection"""
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{settings.SUPABASE_URL}/rest/v1/users?select=count",
-                headers=settings.SUPABASE_HEADERS
-            )
-            
-            if response.status_code == 200:
-                return {"status": "ok", "message": "Database connection successful"}
-            else:
-                return {"status": "error", "message": f"Database error: {response.status_code}"}
+        client = get_supabase_client()
+        response = await client.get("/users?select=count")
+
+        if response.status_code == 200:
+            return {"status": "ok", "message": "Database connection successful"}
+        else:
+            return {"status": "error", "message": f"Database error: {response.status_code}"}
     except Exception as e:
         return {"status": "error", "message": f"Database connection failed: {str(e)}"}
 
@@ -43,21 +140,18 @@ async def test_database():
 async def debug_sessions():
     """Debug endpoint to see current sessions"""
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{settings.SUPABASE_URL}/rest/v1/user_sessions?select=*&order=last_activity.desc",
-                headers=settings.SUPABASE_HEADERS
-            )
-            
-            if response.status_code == 200:
-                sessions = response.json()
-                # Remove sensitive data
-                for session in sessions:
-                    if 'hashed_refresh_token' in session:
-                        session['hashed_refresh_token'] = session['hashed_refresh_token'][:10] + "..."
-                return {"sessions": sessions}
-            else:
-                return {"error": f"Failed to fetch sessions: {response.status_code}"}
+        client = get_supabase_client()
+        response = await client.get("/user_sessions?select=*&order=last_activity.desc")
+
+        if response.status_code == 200:
+            sessions = response.json()
+            # Remove sensitive data
+            for session in sessions:
+                if 'hashed_refresh_token' in session:
+                    session['hashed_refresh_token'] = session['hashed_refresh_token'][:10] + "..."
+            return {"sessions": sessions}
+        else:
+            return {"error": f"Failed to fetch sessions: {response.status_code}"}
     except Exception as e:
         return {"error": f"Error fetching sessions: {str(e)}"}
 
@@ -81,22 +175,16 @@ async def debug_openapi():
 async def debug_user_counts():
     """Debug endpoint showing user statistics"""
     try:
-        async with httpx.AsyncClient() as client:
-            # Get total user count
-            users_response = await client.get(
-                f"{settings.SUPABASE_URL}/rest/v1/users?select=count",
-                headers=settings.SUPABASE_HEADERS
-            )
-            
-            # Get active sessions count
-            sessions_response = await client.get(
-                f"{settings.SUPABASE_URL}/rest/v1/user_sessions?select=count",
-                headers=settings.SUPABASE_HEADERS
-            )
-            
-            return {
-                "total_users": len(users_response.json()) if users_response.status_code == 200 else "error",
-                "active_sessions": len(sessions_response.json()) if sessions_response.status_code == 200 else "error"
-            }
+        client = get_supabase_client()
+        # Get total user count
+        users_response = await client.get("/users?select=count")
+
+        # Get active sessions count
+        sessions_response = await client.get("/user_sessions?select=count")
+
+        return {
+            "total_users": len(users_response.json()) if users_response.status_code == 200 else "error",
+            "active_sessions": len(sessions_response.json()) if sessions_response.status_code == 200 else "error"
+        }
     except Exception as e:
         return {"error": f"Error fetching counts: {str(e)}"}
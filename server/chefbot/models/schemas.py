@@ -1,6 +1,6 @@
 """Pydantic models for API request/response validation"""
 from typing import List, Optional
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field
 
 # ===== AUTH MODELS =====
 class UserCreate(BaseModel):
@@ -56,7 +56,35 @@ class AnalyzeResponse(BaseModel):
     ingredients: List[str]
     recipes: List[Recipe]
 
+class BatchAnalyzeItem(BaseModel):
+    index: int
+    filename: Optional[str] = None
+    ok: bool
+    cached: bool = False
+    result: Optional[AnalyzeResponse] = None
+    error: Optional[str] = None
+
+class BatchAnalyzeResponse(BaseModel):
+    results: List[BatchAnalyzeItem]
+    combined: Optional[AnalyzeResponse] = None
+    combined_error: Optional[str] = None
+
+class AnalysisJobResponse(BaseModel):
+    job_id: str
+    status: str  # queued | running | done | failed
+    result: Optional[AnalyzeResponse] = None
+    error: Optional[str] = None
+    created_at: Optional[float] = None
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
 # ===== HEALTH CHECK MODELS =====
+class ProfilerUpdate(BaseModel):
+    enabled: Optional[bool] = None
+    sample_rate: Optional[float] = Field(None, ge=0.0, le=1.0)
+    loop_monitor_enabled: Optional[bool] = None
+    loop_monitor_threshold_ms: Optional[float] = Field(None, gt=0)
+
 class HealthResponse(BaseModel):
     provider: str
     model: str
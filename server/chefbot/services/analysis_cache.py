@@ -0,0 +1,140 @@
+"""Content-addressed cache for image analysis results"""
+import asyncio
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+from chefbot.models.schemas import AnalyzeResponse
+from config.settings import settings
+
+class AnalysisCache:
+    """In-memory LRU with TTL, backed by an optional SQLite tier.
+
+    Keys are a SHA-256 digest of the model name, the normalized prompt and the
+    raw image bytes, so a resubmitted photo maps to the same entry no matter
+    which client retried it.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float, db_path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.db_path = db_path
+        self._memory: "OrderedDict[str, Tuple[float, AnalyzeResponse]]" = OrderedDict()
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def image_digest(image_bytes: bytes) -> bytes:
+        """sha256 of an image (uploads compute it while streaming)"""
+        return hashlib.sha256(image_bytes).digest()
+
+    @staticmethod
+    def make_key(image_digest: bytes, prompt: str, model: str) -> str:
+        """Digest of model + normalized prompt + the image's sha256"""
+        normalized_prompt = " ".join((prompt or "").split()).lower()
+        digest = hashlib.sha256()
+        digest.update((model or "").encode())
+        digest.update(b"\0")
+        digest.update(normalized_prompt.encode())
+        digest.update(b"\0")
+        digest.update(image_digest)
+        return digest.hexdigest()
+
+    # ===== SQLITE TIER =====
+    def _connect(self) -> sqlite3.Connection:
+        if self._db is None:
+            self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS analysis_cache ("
+                "key TEXT PRIMARY KEY, response TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._db.commit()
+        return self._db
+
+    def _disk_get(self, key: str) -> Optional[Tuple[float, str]]:
+        with self._db_lock:
+            row = self._connect().execute(
+                "SELECT expires_at, response FROM analysis_cache WHERE key = ? AND expires_at > ?",
+                (key, time.time())
+            ).fetchone()
+        return row
+
+    def _disk_set(self, key: str, expires_at: float, payload: str):
+        with self._db_lock:
+            db = self._connect()
+            db.execute(
+                "INSERT OR REPLACE INTO analysis_cache (key, response, expires_at) VALUES (?, ?, ?)",
+                (key, payload, expires_at)
+            )
+            db.execute("DELETE FROM analysis_cache WHERE expires_at <= ?", (time.time(),))
+            db.commit()
+
+    # ===== PUBLIC API =====
+    def _remember(self, key: str, expires_at: float, response: AnalyzeResponse):
+        self._memory[key] = (expires_at, response)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    async def get(self, key: str) -> Optional[AnalyzeResponse]:
+        """Return a cached response, or None on a miss"""
+        entry = self._memory.get(key)
+        if entry is not None:
+            expires_at, response = entry
+            if expires_at > time.time():
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return response.model_copy(deep=True)
+            del self._memory[key]
+
+        if self.db_path:
+            row = await asyncio.to_thread(self._disk_get, key)
+            if row is not None:
+                expires_at, payload = row
+                response = AnalyzeResponse.model_validate_json(payload)
+                self._remember(key, expires_at, response)
+                self.hits += 1
+                self.disk_hits += 1
+                return response.model_copy(deep=True)
+
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, response: AnalyzeResponse):
+        """Store a response in memory and, if configured, on disk"""
+        expires_at = time.time() + self.ttl_seconds
+        self._remember(key, expires_at, response.model_copy(deep=True))
+        if self.db_path:
+            await asyncio.to_thread(self._disk_set, key, expires_at, response.model_dump_json())
+
+    def stats(self) -> dict:
+        """Hit/miss counters"""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "memory_entries": len(self._memory),
+            "disk_enabled": bool(self.db_path),
+        }
+
+    def close(self):
+        """Close the SQLite connection"""
+        with self._db_lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+# Global analysis cache instance
+analysis_cache = AnalysisCache(
+    max_entries=settings.ANALYSIS_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.ANALYSIS_CACHE_TTL_SECONDS,
+    db_path=settings.ANALYSIS_CACHE_DB_PATH or None,
+)
@@ -0,0 +1,297 @@
+"""Persistent outbox for transactional email"""
+import asyncio
+import json
+import logging
+import random
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import List, Optional
+import httpx
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+class EmailTransport(ABC):
+    """Sends a batch of messages; returns one error string (or None on success) per message"""
+
+    @abstractmethod
+    async def send_batch(self, messages: List[dict]) -> List[Optional[str]]:
+        ...
+
+    async def close(self):
+        pass
+
+class ResendTransport(EmailTransport):
+    """Resend's batch endpoint (``POST /emails/batch``, up to 100 messages).
+
+    ``base_url`` can point at a local stub that speaks the same endpoint.
+    Larger batches are sent as several requests.
+    """
+
+    MAX_BATCH = 100
+
+    def __init__(self, api_key: str, base_url: str):
+        self._client = httpx.AsyncClient(
+            base_url=base_url,
+            headers={"Authorization": f"Bearer {api_key}"},
+            timeout=settings.EMAIL_TIMEOUT_SECONDS
+        )
+
+    async def send_batch(self, messages: List[dict]) -> List[Optional[str]]:
+        errors = []
+        for start in range(0, len(messages), self.MAX_BATCH):
+            errors += await self._send_chunk(messages[start:start + self.MAX_BATCH])
+        return errors
+
+    async def _send_chunk(self, messages: List[dict]) -> List[Optional[str]]:
+        try:
+            response = await self._client.post("/emails/batch", json=messages)
+        except httpx.HTTPError as e:
+            return [f"{type(e).__name__}: {e}"] * len(messages)
+        if response.status_code >= 400:
+            # Resend validates the whole batch, so an error applies to every message
+            return [f"HTTP {response.status_code}: {response.text[:200]}"] * len(messages)
+        return [None] * len(messages)
+
+    async def close(self):
+        await self._client.aclose()
+
+class LogTransport(EmailTransport):
+    """Prints messages instead of sending them (no RESEND_API_KEY in development)"""
+
+    async def send_batch(self, messages: List[dict]) -> List[Optional[str]]:
+        for message in messages:
+            logger.info("Email not sent (no transport)", extra={"to": message.get("to"), "subject": message.get("subject")})
+        return [None] * len(messages)
+
+def make_transport() -> EmailTransport:
+    if settings.EMAIL_TRANSPORT == "log" or (settings.EMAIL_TRANSPORT == "auto" and not settings.RESEND_API_KEY):
+        return LogTransport()
+    return ResendTransport(settings.RESEND_API_KEY or "", settings.EMAIL_API_URL)
+
+class EmailOutbox:
+    """Messages are written to SQLite and sent by a background worker.
+
+    Request handlers only pay for a local insert. The worker sends due
+    messages in batches, retries failures with exponential backoff and
+    jitter, and moves a message to ``dead`` after ``max_attempts``. Rows
+    claimed by a worker that died are picked up again once their lease runs
+    out, so several processes can share the file.
+    """
+
+    LEASE_SECONDS = 300
+    POLL_SECONDS = 2.0
+    SHUTDOWN_GRACE_SECONDS = 15.0
+    SENT_RETENTION_SECONDS = 7 * 24 * 3600
+
+    def __init__(self, db_path: str, batch_size: int, max_attempts: int, retry_base_seconds: float):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.retry_base_seconds = retry_base_seconds
+        self.transport: Optional[EmailTransport] = None
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self.sent = 0
+        self.retried = 0
+        self.dead = 0
+
+    # ===== SQLITE =====
+    def _connect(self) -> sqlite3.Connection:
+        if self._db is None:
+            self._db = sqlite3.connect(self.db_path, check_same_thread=False, timeout=10, isolation_level=None)
+            self._db.row_factory = sqlite3.Row
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS email_outbox ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, message TEXT NOT NULL, status TEXT NOT NULL, "
+                "attempts INTEGER NOT NULL DEFAULT 0, next_attempt_at REAL NOT NULL, claimed_at REAL, "
+                "last_error TEXT, created_at REAL NOT NULL, sent_at REAL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS idx_email_outbox_due ON email_outbox(status, next_attempt_at)")
+        return self._db
+
+    def _insert(self, message: str) -> int:
+        now = time.time()
+        with self._db_lock:
+            cursor = self._connect().execute(
+                "INSERT INTO email_outbox (message, status, next_attempt_at, created_at) VALUES (?, 'queued', ?, ?)",
+                (message, now, now)
+            )
+            return cursor.lastrowid
+
+    def _claim(self) -> List[sqlite3.Row]:
+        """Atomically take up to batch_size due messages"""
+        now = time.time()
+        with self._db_lock:
+            db = self._connect()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                # Recover rows from a worker that died mid-send
+                db.execute(
+                    "UPDATE email_outbox SET status = 'queued' WHERE status = 'sending' AND claimed_at < ?",
+                    (now - self.LEASE_SECONDS,)
+                )
+                rows = db.execute(
+                    "SELECT id, message, attempts FROM email_outbox "
+                    "WHERE status = 'queued' AND next_attempt_at <= ? ORDER BY next_attempt_at LIMIT ?",
+                    (now, self.batch_size)
+                ).fetchall()
+                if rows:
+                    db.executemany(
+                        "UPDATE email_outbox SET status = 'sending', claimed_at = ? WHERE id = ?",
+                        [(now, row["id"]) for row in rows]
+                    )
+                db.execute("COMMIT")
+            except Exception:
+                db.execute("ROLLBACK")
+                raise
+        return rows
+
+    def _record(self, sent: List[int], failed: List[tuple]):
+        """Mark sent ids, and reschedule or dead-letter (id, attempts, next_attempt_at, status, error) rows"""
+        now = time.time()
+        with self._db_lock:
+            db = self._connect()
+            db.execute("BEGIN")
+            try:
+                db.executemany(
+                    "UPDATE email_outbox SET status = 'sent', sent_at = ?, attempts = attempts + 1 WHERE id = ?",
+                    [(now, message_id) for message_id in sent]
+                )
+                db.executemany(
+                    "UPDATE email_outbox SET status = ?, attempts = ?, next_attempt_at = ?, last_error = ? WHERE id = ?",
+                    [(status, attempts, next_attempt_at, error, message_id)
+                     for message_id, attempts, next_attempt_at, status, error in failed]
+                )
+                db.execute("DELETE FROM email_outbox WHERE status = 'sent' AND sent_at < ?", (now - self.SENT_RETENTION_SECONDS,))
+                db.execute("COMMIT")
+            except Exception:
+                db.execute("ROLLBACK")
+                raise
+
+    def _next_due(self) -> Optional[float]:
+        with self._db_lock:
+            row = self._connect().execute(
+                "SELECT MIN(next_attempt_at) FROM email_outbox WHERE status = 'queued'"
+            ).fetchone()
+        return row[0]
+
+    def _counts(self) -> dict:
+        with self._db_lock:
+            rows = self._connect().execute("SELECT status, COUNT(*) FROM email_outbox GROUP BY status").fetchall()
+        return {row[0]: row[1] for row in rows}
+
+    # ===== LIFECYCLE =====
+    async def start(self, transport: Optional[EmailTransport] = None):
+        self.transport = transport or make_transport()
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._task = asyncio.create_task(self._worker())
+
+    async def stop(self):
+        if self._task is not None:
+            # Let an in-flight batch finish and be recorded: cancelled mid-send,
+            # its rows stay 'sending' until the lease runs out and are sent again
+            self._stopping = True
+            self._wakeup.set()
+            try:
+                await asyncio.wait_for(asyncio.shield(self._task), timeout=self.SHUTDOWN_GRACE_SECONDS)
+            except asyncio.TimeoutError:
+                logger.warning("Email outbox still sending at shutdown, cancelling")
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self.transport is not None:
+            await self.transport.close()
+        with self._db_lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    # ===== PUBLIC API =====
+    async def enqueue(self, message: dict) -> int:
+        """Persist a message for sending; returns its outbox id"""
+        message_id = await asyncio.to_thread(self._insert, json.dumps(message))
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return message_id
+
+    def _backoff(self, attempts: int) -> float:
+        delay = min(self.retry_base_seconds * 2 ** (attempts - 1), 3600)
+        return delay * random.uniform(0.8, 1.2)
+
+    async def flush(self) -> int:
+        """Send one batch of due messages; returns how many were attempted"""
+        rows = await asyncio.to_thread(self._claim)
+        if not rows:
+            return 0
+        messages = [json.loads(row["message"]) for row in rows]
+        try:
+            errors = await self.transport.send_batch(messages)
+        except Exception as e:
+            errors = [f"{type(e).__name__}: {e}"] * len(rows)
+
+        now = time.time()
+        sent, failed = [], []
+        for row, message, error in zip(rows, messages, errors):
+            if error is None:
+                sent.append(row["id"])
+                continue
+            attempts = row["attempts"] + 1
+            if attempts >= self.max_attempts:
+                logger.error("Email dead-lettered", extra={"to": message.get("to"), "attempts": attempts, "error": error})
+                failed.append((row["id"], attempts, now, "dead", error))
+                self.dead += 1
+            else:
+                failed.append((row["id"], attempts, now + self._backoff(attempts), "queued", error))
+                self.retried += 1
+        await asyncio.to_thread(self._record, sent, failed)
+        self.sent += len(sent)
+        if sent:
+            logger.info("Sent emails", extra={"count": len(sent)})
+        if failed:
+            logger.warning("Emails failed", extra={"count": len(failed), "error": failed[0][4]})
+        return len(rows)
+
+    async def _worker(self):
+        while not self._stopping:
+            self._wakeup.clear()
+            try:
+                while not self._stopping and await self.flush() == self.batch_size:
+                    pass
+                next_due = await asyncio.to_thread(self._next_due)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Email outbox worker error")
+                next_due = None
+            # Sleep until the next retry is due or a new message arrives; poll
+            # regularly for messages queued by other processes
+            timeout = self.POLL_SECONDS if next_due is None else min(max(next_due - time.time(), 0), self.POLL_SECONDS)
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def stats(self) -> dict:
+        return {
+            "transport": type(self.transport).__name__ if self.transport else None,
+            "by_status": await asyncio.to_thread(self._counts),
+            "sent": self.sent,
+            "retried": self.retried,
+            "dead": self.dead,
+        }
+
+# Global email outbox instance
+email_outbox = EmailOutbox(
+    db_path=settings.EMAIL_OUTBOX_DB_PATH,
+    batch_size=settings.EMAIL_BATCH_SIZE,
+    max_attempts=settings.EMAIL_MAX_ATTEMPTS,
+    retry_base_seconds=settings.EMAIL_RETRY_BASE_SECONDS
+)
@@ -0,0 +1,194 @@
+"""Precompiled email templates (HTML + plain text)"""
+import html
+import re
+from dataclasses import dataclass
+from html.parser import HTMLParser
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+TEMPLATE_DIR = Path(__file__).resolve().parent.parent / "templates" / "email"
+
+_SLOT = re.compile(r"\{\{\s*(\w+)\s*\}\}")
+_STYLE_BLOCK = re.compile(r"<style[^>]*>(.*?)</style>", re.S | re.I)
+_CSS_RULE = re.compile(r"([^{}]+)\{([^{}]*)\}")
+_WHITESPACE = re.compile(r"\s+")
+_VOID_TAGS = {"meta", "br", "img", "hr", "input", "link", "col", "area", "base", "source", "wbr"}
+
+# ===== CSS INLINING =====
+Selector = List[Tuple[str, List[str]]]  # descendant chain of (tag, classes)
+
+def _parse_css(css: str) -> List[Tuple[Selector, int, List[str]]]:
+    """Rules as (selector, specificity, declarations); pseudo-class rules are dropped"""
+    rules = []
+    for selectors, body in _CSS_RULE.findall(css):
+        declarations = [" ".join(d.split()) for d in body.split(";") if d.strip()]
+        for selector in selectors.split(","):
+            selector = selector.strip()
+            if not selector or ":" in selector:
+                continue  # :hover etc. can't be inlined
+            chain = []
+            for part in selector.split():
+                tag, *classes = part.split(".")
+                chain.append((tag.lower(), classes))
+            specificity = sum(10 * len(classes) + (1 if tag else 0) for tag, classes in chain)
+            rules.append((chain, specificity, declarations))
+    return rules
+
+def _matches(compound: Tuple[str, List[str]], element: Tuple[str, set]) -> bool:
+    tag, classes = compound
+    return (not tag or tag == element[0]) and all(c in element[1] for c in classes)
+
+def _selector_matches(chain: Selector, stack: List[Tuple[str, set]]) -> bool:
+    """Last compound must match the element, earlier ones some ancestors in order"""
+    if not _matches(chain[-1], stack[-1]):
+        return False
+    position = len(stack) - 2
+    for compound in reversed(chain[:-1]):
+        while position >= 0 and not _matches(compound, stack[position]):
+            position -= 1
+        if position < 0:
+            return False
+        position -= 1
+    return True
+
+def _escape_attribute(value: str) -> str:
+    return value.replace("&", "&amp;").replace('"', "&quot;").replace("<", "&lt;")
+
+class _Inliner(HTMLParser):
+    """Rewrites HTML with CSS rules moved into style attributes, minifying as it goes"""
+
+    def __init__(self, rules):
+        super().__init__(convert_charrefs=False)
+        self.rules = sorted(rules, key=lambda rule: rule[1])  # stable: source order within a specificity
+        self.out: List[str] = []
+        self.stack: List[Tuple[str, set]] = []
+        self.in_style = False
+
+    def _open(self, tag: str, attrs, self_closing: bool):
+        attributes = dict(attrs)
+        element = (tag, set((attributes.get("class") or "").split()))
+        self.stack.append(element)
+        declarations = [d for chain, _, decls in self.rules if _selector_matches(chain, self.stack) for d in decls]
+        if tag in _VOID_TAGS or self_closing:
+            self.stack.pop()
+        if declarations:
+            existing = attributes.get("style") or ""
+            attributes["style"] = ";".join(declarations + [" ".join(existing.split()).rstrip(";")]).strip(";")
+        attributes.pop("class", None)
+        rendered = "".join(
+            f" {name}" if value is None else f' {name}="{_escape_attribute(value)}"'
+            for name, value in attributes.items()
+        )
+        self.out.append(f"<{tag}{rendered}{' /' if self_closing else ''}>")
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "style":
+            self.in_style = True
+            return
+        self._open(tag, attrs, False)
+
+    def handle_startendtag(self, tag, attrs):
+        self._open(tag, attrs, True)
+
+    def handle_endtag(self, tag):
+        if tag == "style":
+            self.in_style = False
+            return
+        while self.stack:
+            if self.stack.pop()[0] == tag:
+                break
+        self.out.append(f"</{tag}>")
+
+    def handle_data(self, data):
+        if self.in_style:
+            return
+        if not data.strip():
+            # Indentation between tags carries no meaning
+            if "\n" not in data:
+                self.out.append(" ")
+            return
+        self.out.append(_WHITESPACE.sub(" ", data))
+
+    def handle_entityref(self, name):
+        self.out.append(f"&{name};")
+
+    def handle_charref(self, name):
+        self.out.append(f"&#{name};")
+
+    def handle_decl(self, decl):
+        self.out.append(f"<!{decl}>")
+
+    def handle_comment(self, data):
+        pass
+
+def inline_css(document: str) -> str:
+    """Move <style> rules into style attributes and minify whitespace"""
+    rules = _parse_css("\n".join(_STYLE_BLOCK.findall(document)))
+    inliner = _Inliner(rules)
+    inliner.feed(document)
+    inliner.close()
+    return "".join(inliner.out)
+
+# ===== COMPILED TEMPLATES =====
+def _compile(source: str) -> Tuple[Tuple[str, ...], Tuple[str, ...]]:
+    """Split into literal chunks and slot names: literals[0], slot[0], literals[1], ..."""
+    parts = _SLOT.split(source)
+    return tuple(parts[0::2]), tuple(parts[1::2])
+
+def _fill(literals: Tuple[str, ...], slots: Tuple[str, ...], values: Dict[str, str]) -> str:
+    out = [literals[0]]
+    for slot, literal in zip(slots, literals[1:]):
+        out.append(values[slot])
+        out.append(literal)
+    return "".join(out)
+
+@dataclass
+class RenderedEmail:
+    subject: str
+    html: str
+    text: str
+
+class EmailTemplate:
+    """One email: subject, inlined+minified HTML and plain text, precompiled into slots"""
+
+    def __init__(self, name: str, html_source: str, text_source: str):
+        self.name = name
+        first_line, _, text_body = text_source.partition("\n")
+        if not first_line.startswith("Subject:"):
+            raise ValueError(f"Email template {name}.txt must start with a 'Subject:' line")
+        self._subject = _compile(first_line[len("Subject:"):].strip())
+        self._html = _compile(inline_css(html_source))
+        self._text = _compile(text_body.strip() + "\n")
+        self.slots = set(self._subject[1]) | set(self._html[1]) | set(self._text[1])
+
+    def render(self, **values: str) -> RenderedEmail:
+        missing = self.slots - values.keys()
+        if missing:
+            raise KeyError(f"Email template {self.name} missing values: {', '.join(sorted(missing))}")
+        values = {key: str(value) for key, value in values.items()}
+        escaped = {key: html.escape(value, quote=True) for key, value in values.items()}
+        return RenderedEmail(
+            subject=_fill(*self._subject, values),
+            html=_fill(*self._html, escaped),
+            text=_fill(*self._text, values),
+        )
+
+class EmailTemplates:
+    """Every ``<name>.html`` / ``<name>.txt`` pair in the template directory, compiled once"""
+
+    def __init__(self, directory: Path = TEMPLATE_DIR):
+        self.directory = directory
+        self.templates: Dict[str, EmailTemplate] = {}
+        for html_path in sorted(directory.glob("*.html")):
+            text_path = html_path.with_suffix(".txt")
+            self.templates[html_path.stem] = EmailTemplate(
+                html_path.stem,
+                html_path.read_text(encoding="utf-8"),
+                text_path.read_text(encoding="utf-8"),
+            )
+
+    def render(self, name: str, **values: str) -> RenderedEmail:
+        return self.templates[name].render(**values)
+
+# Global templates, compiled at import (i.e. at startup)
+email_templates = EmailTemplates()
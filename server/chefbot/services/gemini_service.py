@@ -0,0 +1,210 @@
+"""Gemini recipe analysis service"""
+import asyncio
+import logging
+import base64
+import json
+from typing import AsyncIterator, List, Union
+from fastapi import HTTPException
+from chefbot.models.schemas import AnalyzeResponse, Recipe
+from chefbot.services.http_client import get_gemini_client
+from chefbot.services import metrics
+from chefbot.services.recipe_parser import parse_recipe_response
+from chefbot.utils import log
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+SYSTEM_PROMPT = """You are an expert chef and food analyst. Analyze the image of food ingredients and:
+
+1. **Identify ingredients**: List all visible ingredients you can identify
+2. **Suggest recipes**: Provide 2-3 practical recipes using these ingredients
+3. **Be specific**: Include cooking times, steps, and quantities when possible
+4. **Consider combinations**: Think about how ingredients work together
+
+Format your response as JSON with this structure:
+{
+  "ingredients": ["ingredient1", "ingredient2", ...],
+  "recipes": [
+    {
+      "title": "Recipe Name",
+      "ingredients": ["ingredient with quantity", ...],
+      "steps": ["step 1", "step 2", ...],
+      "timeMins": 30
+    }
+  ]
+}
+"""
+
+COMBINED_PROMPT = """You are an expert chef. The user photographed several storage spaces (fridge, pantry, freezer).
+Using the combined ingredient list below, suggest 2-3 practical recipes that make good use of ingredients from
+all of them. Include cooking times, steps, and quantities when possible.
+
+Format your response as JSON with this structure:
+{
+  "ingredients": ["ingredient1", "ingredient2", ...],
+  "recipes": [
+    {
+      "title": "Recipe Name",
+      "ingredients": ["ingredient with quantity", ...],
+      "steps": ["step 1", "step 2", ...],
+      "timeMins": 30
+    }
+  ]
+}
+"""
+
+# Returned when the model output can't be parsed; never cached
+FALLBACK_RESPONSE = AnalyzeResponse(
+    ingredients=["Unable to identify ingredients"],
+    recipes=[Recipe(
+        title="Analysis Error",
+        ingredients=["Check image quality"],
+        steps=["Please try uploading a clearer image"],
+        timeMins=None
+    )]
+)
+
+GENERATION_CONFIG = {
+    "temperature": 0.7,
+    "candidateCount": 1,
+    "maxOutputTokens": 2048,
+}
+
+# Image bytes per base64 chunk; a multiple of 3, so the chunks join into one valid string.
+# binascii keeps the GIL while encoding, so the chunk size is what bounds each
+# loop stall (~1.5ms); the worker thread lets encoding overlap the socket writes.
+B64_CHUNK_BYTES = 3 * 128 * 1024
+# Smaller chunks are encoded inline - cheaper than the hop to a worker thread
+B64_INLINE_BYTES = 64 * 1024
+
+_IMAGE_PLACEHOLDER = "chefbot-image-data"
+
+class GeminiRequestBody:
+    """generateContent body for one image, streamed as prefix JSON, base64 chunks, suffix JSON.
+
+    The base64 string and the serialized payload never exist in full: each
+    chunk of the image is encoded (in a worker thread) as httpx sends it.
+    The bytes match ``json.dumps`` of the equivalent dict, the length is
+    known up front, and the body can be iterated again if a request is resent.
+    """
+
+    def __init__(self, image_data: bytes, prompt: str = "", mime_type: str = "image/jpeg"):
+        system_prompt = SYSTEM_PROMPT
+        if prompt:
+            system_prompt += f"\n\nUser's additional request: {prompt}"
+        payload = {
+            "contents": [{
+                "parts": [
+                    {"text": system_prompt},
+                    {"inline_data": {"mime_type": mime_type, "data": _IMAGE_PLACEHOLDER}}
+                ]
+            }],
+            "generationConfig": GENERATION_CONFIG,
+        }
+        # The placeholder comes after the (user-controlled) prompt, so split at its last occurrence
+        prefix, _, suffix = json.dumps(payload).rpartition(f'"{_IMAGE_PLACEHOLDER}"')
+        self.prefix = (prefix + '"').encode()
+        self.suffix = ('"' + suffix).encode()
+        self.image = memoryview(image_data)
+
+    def __len__(self) -> int:
+        return len(self.prefix) + 4 * ((len(self.image) + 2) // 3) + len(self.suffix)
+
+    @property
+    def headers(self) -> dict:
+        return {"Content-Type": "application/json", "Content-Length": str(len(self))}
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        yield self.prefix
+        for start in range(0, len(self.image), B64_CHUNK_BYTES):
+            chunk = self.image[start:start + B64_CHUNK_BYTES]
+            if len(chunk) <= B64_INLINE_BYTES:
+                yield base64.b64encode(chunk)
+            else:
+                yield await asyncio.to_thread(base64.b64encode, chunk)
+        yield self.suffix
+
+def _body(payload: Union[dict, GeminiRequestBody]) -> dict:
+    """httpx arguments for a JSON payload or a streamed image body"""
+    if isinstance(payload, GeminiRequestBody):
+        return {"content": payload, "headers": payload.headers}
+    return {"json": payload}
+
+async def _generate(gemini_payload: Union[dict, GeminiRequestBody]) -> AnalyzeResponse:
+    """Call generateContent and parse the recipe JSON out of the reply"""
+    # Call Gemini API
+    with log.span("gemini_request"):
+        response = await get_gemini_client().post(
+            f"/models/{settings.GEMINI_MODEL}:generateContent",
+            params={"key": settings.GEMINI_API_KEY},
+            **_body(gemini_payload)
+        )
+    
+    if response.status_code != 200:
+        raise HTTPException(status_code=500, detail=f"Gemini API error: {response.status_code}")
+    
+    result = response.json()
+    
+    if "candidates" not in result or not result["candidates"]:
+        raise HTTPException(status_code=500, detail="No response from Gemini API")
+    
+    candidate = result["candidates"][0]
+    content = "".join(part.get("text", "") for part in candidate.get("content", {}).get("parts", []))
+    if candidate.get("finishReason") == "MAX_TOKENS":
+        logger.warning("Gemini output hit maxOutputTokens - salvaging complete recipes")
+    
+    # Parse the JSON out of the response, salvaging partial output
+    with log.span("parse"):
+        parsed = parse_recipe_response(content)
+    if parsed is None:
+        # Fallback: create a simple response
+        return FALLBACK_RESPONSE
+    return parsed
+
+async def analyze_with_gemini(image_data: bytes, prompt: str = "", mime_type: str = "image/jpeg") -> AnalyzeResponse:
+    """Analyze image using Gemini API"""
+    try:
+        with metrics.analyses_in_flight.track(), log.span("gemini"):
+            return await _generate(GeminiRequestBody(image_data, prompt, mime_type))
+    except Exception as e:
+        logger.error("Gemini analysis error: %s", e)
+        raise HTTPException(status_code=500, detail="Analysis failed")
+
+async def suggest_recipes_for_ingredients(ingredients: List[str], prompt: str = "") -> AnalyzeResponse:
+    """Suggest recipes for a known ingredient list (text-only Gemini call)"""
+    request_text = COMBINED_PROMPT + "\n\nAvailable ingredients: " + ", ".join(ingredients)
+    if prompt:
+        request_text += f"\n\nUser's additional request: {prompt}"
+    
+    try:
+        with metrics.analyses_in_flight.track(), log.span("gemini", combined=True):
+            return await _generate({
+                "contents": [{"parts": [{"text": request_text}]}],
+                "generationConfig": GENERATION_CONFIG,
+            })
+    except Exception as e:
+        logger.error("Gemini combined suggestion error: %s", e)
+        raise HTTPException(status_code=500, detail="Analysis failed")
+
+async def stream_gemini_text(image_data: bytes, prompt: str = "", mime_type: str = "image/jpeg") -> AsyncIterator[str]:
+    """Stream text deltas from Gemini's streamGenerateContent (server-sent events)"""
+    gemini_payload = GeminiRequestBody(image_data, prompt, mime_type)
+    
+    with metrics.analyses_in_flight.track(), log.span("gemini_stream"):
+        async with get_gemini_client().stream(
+            "POST",
+            f"/models/{settings.GEMINI_MODEL}:streamGenerateContent",
+            params={"alt": "sse", "key": settings.GEMINI_API_KEY},
+            **_body(gemini_payload)
+        ) as response:
+            if response.status_code != 200:
+                raise HTTPException(status_code=500, detail=f"Gemini API error: {response.status_code}")
+            
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                chunk = json.loads(line[5:])
+                for candidate in chunk.get("candidates", [])[:1]:
+                    for part in candidate.get("content", {}).get("parts", []):
+                        if part.get("text"):
+                            yield part["text"]
@@ -0,0 +1,171 @@
+"""Shared pooled HTTP clients for upstream services (Supabase, Gemini)"""
+import logging
+import time
+from typing import Optional
+import httpx
+from config.settings import settings
+from chefbot.services import metrics
+
+logger = logging.getLogger(__name__)
+
+try:
+    import h2  # noqa: F401 - only needed when HTTP/2 is enabled
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+GEMINI_BASE_URL = "https://generativelanguage.googleapis.com/v1beta"
+
+class _TimedStream(httpx.AsyncByteStream):
+    """Response body wrapper that reports the call once the body is consumed"""
+
+    def __init__(self, stream: httpx.AsyncByteStream, on_close):
+        self._stream = stream
+        self._on_close = on_close
+        self._size = 0
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            self._size += len(chunk)
+            yield chunk
+
+    async def aclose(self):
+        await self._stream.aclose()
+        if self._on_close is not None:
+            self._on_close(self._size)
+            self._on_close = None
+
+class InstrumentedTransport(httpx.AsyncBaseTransport):
+    """Records per-upstream latency, errors and (for Gemini) payload sizes.
+
+    Latency runs until the response body has been read, so streamed Gemini
+    responses count their full duration.
+    """
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, upstream: str):
+        self._transport = transport
+        self.upstream = upstream
+
+    def _operation(self, request: httpx.Request):
+        path = request.url.path
+        if self.upstream == "gemini":
+            # /v1beta/models/<model>:<method>
+            model, _, method = path.rsplit("/", 1)[-1].partition(":")
+            return f"{model}:{method}", model
+        # /rest/v1/<table> or /rest/v1/rpc/<function>
+        resource = path.split("/rest/v1/", 1)[-1].strip("/") or "/"
+        return f"{request.method} {resource}", None
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        operation, model = self._operation(request)
+        if model is not None:
+            # From the header: streamed image bodies are not readable here
+            metrics.gemini_request_bytes.observe(int(request.headers.get("content-length", 0)), model)
+        start = time.perf_counter()
+        try:
+            response = await self._transport.handle_async_request(request)
+        except Exception as e:
+            metrics.upstream_request_duration.observe(time.perf_counter() - start, self.upstream, operation, "error")
+            metrics.upstream_errors.inc(self.upstream, operation, type(e).__name__)
+            raise
+        status = response.status_code
+
+        def on_close(size: int):
+            metrics.upstream_request_duration.observe(time.perf_counter() - start, self.upstream, operation, str(status))
+            if status >= 400:
+                metrics.upstream_errors.inc(self.upstream, operation, str(status))
+            if model is not None:
+                metrics.gemini_response_bytes.observe(size, model)
+
+        response.stream = _TimedStream(response.stream, on_close)
+        return response
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+class UpstreamClients:
+    """Long-lived, keep-alive httpx clients, one pool per upstream.
+
+    The app lifespan calls ``start()`` on startup and ``close()`` on shutdown.
+    Clients are also created lazily on first use so scripts and the debug
+    routes keep working outside of the lifespan.
+    """
+
+    def __init__(self):
+        self._supabase: Optional[httpx.AsyncClient] = None
+        self._gemini: Optional[httpx.AsyncClient] = None
+
+    @staticmethod
+    def _http2() -> bool:
+        if settings.HTTP2_ENABLED and not HTTP2_AVAILABLE:
+            logger.warning("HTTP2_ENABLED is set but the 'h2' package is not installed - using HTTP/1.1")
+        return settings.HTTP2_ENABLED and HTTP2_AVAILABLE
+
+    def _build_supabase(self) -> httpx.AsyncClient:
+        transport = httpx.AsyncHTTPTransport(
+            http2=self._http2(),
+            limits=httpx.Limits(
+                max_connections=settings.SUPABASE_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.SUPABASE_MAX_KEEPALIVE,
+                keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY_SECONDS,
+            ),
+        )
+        return httpx.AsyncClient(
+            base_url=f"{settings.SUPABASE_URL or ''}/rest/v1",
+            headers={k: v for k, v in settings.SUPABASE_HEADERS.items() if v is not None},
+            transport=InstrumentedTransport(transport, "supabase") if settings.METRICS_ENABLED else transport,
+            timeout=httpx.Timeout(settings.SUPABASE_TIMEOUT_SECONDS),
+        )
+
+    def _build_gemini(self) -> httpx.AsyncClient:
+        transport = httpx.AsyncHTTPTransport(
+            http2=self._http2(),
+            limits=httpx.Limits(
+                max_connections=settings.GEMINI_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.GEMINI_MAX_KEEPALIVE,
+                keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY_SECONDS,
+            ),
+        )
+        return httpx.AsyncClient(
+            base_url=settings.GEMINI_API_URL or GEMINI_BASE_URL,
+            transport=InstrumentedTransport(transport, "gemini") if settings.METRICS_ENABLED else transport,
+            timeout=httpx.Timeout(settings.GEMINI_TIMEOUT_SECONDS, connect=10.0),
+        )
+
+    @property
+    def supabase(self) -> httpx.AsyncClient:
+        """Client for the Supabase REST API (base URL ``/rest/v1``, service headers preset)"""
+        if self._supabase is None or self._supabase.is_closed:
+            self._supabase = self._build_supabase()
+        return self._supabase
+
+    @property
+    def gemini(self) -> httpx.AsyncClient:
+        """Client for the Gemini generative language API"""
+        if self._gemini is None or self._gemini.is_closed:
+            self._gemini = self._build_gemini()
+        return self._gemini
+
+    async def start(self):
+        """Create the pools up front so the first request doesn't pay for it"""
+        _ = self.supabase
+        _ = self.gemini
+
+    async def close(self):
+        """Close all pooled connections"""
+        for client in (self._supabase, self._gemini):
+            if client is not None and not client.is_closed:
+                await client.aclose()
+        self._supabase = None
+        self._gemini = None
+
+# Global upstream clients instance
+upstream_clients = UpstreamClients()
+
+def get_supabase_client() -> httpx.AsyncClient:
+    """Get the shared Supabase client"""
+    return upstream_clients.supabase
+
+def get_gemini_client() -> httpx.AsyncClient:
+    """Get the shared Gemini client"""
+    return upstream_clients.gemini
@@ -0,0 +1,190 @@
+"""Image normalization before sending uploads to Gemini"""
+import asyncio
+import io
+import logging
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import BinaryIO, Dict, Optional, Union
+from config.settings import settings
+from chefbot.utils.image_hash import dhash_image
+
+logger = logging.getLogger(__name__)
+
+try:
+    from PIL import Image, ImageOps
+    PIL_AVAILABLE = True
+except ImportError:
+    Image = None
+    ImageOps = None
+    PIL_AVAILABLE = False
+
+try:
+    # HEIC/HEIF decoding (iPhone camera default; pillow-heif is in requirements.txt).
+    # Without it HEIC uploads still pass through to Gemini, just not resized.
+    from pillow_heif import register_heif_opener
+    register_heif_opener()
+except ImportError:
+    pass
+
+# Formats Gemini accepts inline
+SUPPORTED_MIME_TYPES = {"image/jpeg", "image/png", "image/webp", "image/heic", "image/heif"}
+# Other formats accepted for upload; Pillow decodes them and they are sent as JPEG
+CONVERTED_MIME_TYPES = {"image/gif", "image/bmp", "image/tiff"}
+
+_executor = ThreadPoolExecutor(max_workers=settings.IMAGE_PIPELINE_WORKERS, thread_name_prefix="image-pipeline")
+
+# Running totals for the debug endpoint
+pipeline_stats = {"images": 0, "bytes_in": 0, "bytes_out": 0, "stage_ms": {}}
+
+@dataclass
+class PreparedImage:
+    """Normalized image ready for the Gemini payload"""
+    data: bytes
+    mime_type: str
+    original_size: int
+    original_mime_type: Optional[str]
+    image_hash: Optional[int] = None
+    timings_ms: Dict[str, float] = field(default_factory=dict)
+
+    def summary(self) -> str:
+        stages = ", ".join(f"{stage} {ms:.1f}ms" for stage, ms in self.timings_ms.items())
+        return (f"{self.original_size / 1024:.0f}KB {self.original_mime_type} -> "
+                f"{len(self.data) / 1024:.0f}KB {self.mime_type} ({stages})")
+
+def sniff_mime_type(data: bytes) -> Optional[str]:
+    """Detect the real image format from magic bytes"""
+    if data[:3] == b"\xff\xd8\xff":
+        return "image/jpeg"
+    if data[:8] == b"\x89PNG\r\n\x1a\n":
+        return "image/png"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    if data[:6] in (b"GIF87a", b"GIF89a"):
+        return "image/gif"
+    if data[:2] == b"BM":
+        return "image/bmp"
+    if data[:4] in (b"II*\x00", b"MM\x00*"):
+        return "image/tiff"
+    if data[4:8] == b"ftyp":
+        brand = data[8:12]
+        if brand in (b"heic", b"heix", b"hevc", b"hevx"):
+            return "image/heic"
+        if brand in (b"mif1", b"msf1", b"heif"):
+            return "image/heif"
+    return None
+
+class _Timer:
+    def __init__(self, timings: Dict[str, float]):
+        self.timings = timings
+        self.last = time.perf_counter()
+
+    def mark(self, stage: str):
+        now = time.perf_counter()
+        self.timings[stage] = (now - self.last) * 1000
+        self.last = now
+
+def _open_source(source: Union[bytes, BinaryIO]) -> tuple:
+    """(stream, size, first bytes) of image bytes or a seekable file"""
+    if isinstance(source, (bytes, bytearray)):
+        return io.BytesIO(source), len(source), bytes(source[:16])
+    size = source.seek(0, io.SEEK_END)
+    source.seek(0)
+    head = source.read(16)
+    source.seek(0)
+    return source, size, head
+
+def normalize_image(source: Union[bytes, BinaryIO], max_edge: int, quality: int) -> PreparedImage:
+    """Sniff, orient, downscale and re-encode an image. CPU-bound, runs in the pipeline pool.
+
+    ``source`` may be a file (a spooled upload): PIL decodes from it directly
+    and it is only read into memory whole when the image is passed through.
+    """
+    timings: Dict[str, float] = {}
+    timer = _Timer(timings)
+    stream, size, head = _open_source(source)
+    sniffed = sniff_mime_type(head)
+    timer.mark("sniff")
+
+    def passthrough(image_hash: Optional[int] = None) -> PreparedImage:
+        stream.seek(0)
+        return PreparedImage(
+            data=source if isinstance(source, bytes) else stream.read(),
+            mime_type=sniffed if sniffed in SUPPORTED_MIME_TYPES else "image/jpeg",
+            original_size=size,
+            original_mime_type=sniffed,
+            image_hash=image_hash,
+            timings_ms=timings,
+        )
+
+    if not PIL_AVAILABLE:
+        return passthrough()
+
+    try:
+        image = Image.open(stream)
+        resized = max(image.size) > max_edge
+        # JPEG can decode straight to a reduced scale. Pillow picks the scale from
+        # the smaller ratio of both edges, so ask for the aspect-preserving size.
+        if resized:
+            ratio = max_edge / max(image.size)
+            image.draft("RGB", (math.ceil(image.width * ratio), math.ceil(image.height * ratio)))
+        image.load()
+        timer.mark("decode")
+
+        # Downscale before rotating - the bounding box is square, so order doesn't matter
+        if max(image.size) > max_edge:
+            image.thumbnail((max_edge, max_edge), Image.BICUBIC, reducing_gap=2.0)
+        timer.mark("resize")
+
+        rotated = image.getexif().get(0x0112, 1) != 1  # EXIF Orientation
+        if rotated:
+            image = ImageOps.exif_transpose(image)
+        timer.mark("orient")
+
+        image_hash = dhash_image(image)
+        timer.mark("hash")
+
+        # Camera JPEGs that are already small and upright go through untouched
+        if sniffed == "image/jpeg" and not resized and not rotated:
+            return passthrough(image_hash)
+
+        if image.mode in ("RGBA", "LA", "P"):
+            image = image.convert("RGBA")
+            background = Image.new("RGB", image.size, (255, 255, 255))
+            background.paste(image, mask=image.getchannel("A"))
+            image = background
+        elif image.mode != "RGB":
+            image = image.convert("RGB")
+        output = io.BytesIO()
+        image.save(output, format="JPEG", quality=quality)
+        encoded = output.getvalue()
+        timer.mark("encode")
+
+        if len(encoded) >= size and sniffed in SUPPORTED_MIME_TYPES and not resized and not rotated:
+            return passthrough(image_hash)
+
+        return PreparedImage(
+            data=encoded,
+            mime_type="image/jpeg",
+            original_size=size,
+            original_mime_type=sniffed,
+            image_hash=image_hash,
+            timings_ms=timings,
+        )
+    except Exception as e:
+        logger.warning("Image normalization skipped: %s", e)
+        return passthrough()
+
+async def prepare_image(source: Union[bytes, BinaryIO]) -> PreparedImage:
+    """Normalize an uploaded image (bytes or spooled file) in the pipeline thread pool"""
+    loop = asyncio.get_running_loop()
+    prepared = await loop.run_in_executor(
+        _executor, normalize_image, source, settings.IMAGE_MAX_EDGE, settings.IMAGE_JPEG_QUALITY
+    )
+    pipeline_stats["images"] += 1
+    pipeline_stats["bytes_in"] += prepared.original_size
+    pipeline_stats["bytes_out"] += len(prepared.data)
+    for stage, ms in prepared.timings_ms.items():
+        pipeline_stats["stage_ms"][stage] = pipeline_stats["stage_ms"].get(stage, 0.0) + ms
+    return prepared
@@ -0,0 +1,320 @@
+"""Persistent asynchronous analysis job queue"""
+import asyncio
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, Set
+from chefbot.models.schemas import AnalyzeResponse
+from chefbot.utils import log
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+JobHandler = Callable[[dict], Awaitable[AnalyzeResponse]]
+
+_COLUMNS = "id, user_id, plan, prompt, status, result, error, created_at, started_at, finished_at"
+
+# Finished jobs past JOB_RETENTION_SECONDS are deleted this often
+_PURGE_INTERVAL_SECONDS = 300
+
+class AnalysisJobQueue:
+    """Analysis jobs persisted in SQLite and drained by an in-process worker pool.
+
+    Jobs (including the uploaded image) are written to disk before the submit
+    call returns, so queued work survives a restart. Several processes can
+    share the file:
+
+    - a worker claims a job with a conditional UPDATE that records this
+      process's ``worker_id`` and a ``heartbeat_at`` lease
+    - a maintenance loop renews the lease of the jobs this process runs,
+      puts jobs whose lease expired (their process died) back on the queue,
+      picks up jobs submitted by other processes, and purges old jobs
+    """
+
+    def __init__(self, db_path: str, workers: int, lease_seconds: float, poll_seconds: float):
+        self.db_path = db_path
+        self.workers = workers
+        self.lease_seconds = lease_seconds
+        self.poll_seconds = poll_seconds
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._known: Set[str] = set()  # queued locally or running here
+        self._events: Dict[str, asyncio.Event] = {}
+        self._waiters: Dict[str, int] = {}
+        self._handler: Optional[JobHandler] = None
+        self._wait_times: Deque[float] = deque(maxlen=500)
+        self._run_times: Deque[float] = deque(maxlen=500)
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+
+    # ===== SQLITE =====
+    def _connect(self) -> sqlite3.Connection:
+        if self._db is None:
+            self._db = sqlite3.connect(self.db_path, check_same_thread=False, timeout=10)
+            self._db.row_factory = sqlite3.Row
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS analysis_jobs ("
+                "id TEXT PRIMARY KEY, user_id TEXT NOT NULL, plan TEXT, prompt TEXT, "
+                "image BLOB, status TEXT NOT NULL, result TEXT, error TEXT, "
+                "created_at REAL NOT NULL, started_at REAL, finished_at REAL)"
+            )
+            columns = {row["name"] for row in self._db.execute("PRAGMA table_info(analysis_jobs)")}
+            for column, kind in (("worker_id", "TEXT"), ("heartbeat_at", "REAL")):
+                if column not in columns:
+                    self._db.execute(f"ALTER TABLE analysis_jobs ADD COLUMN {column} {kind}")
+            self._db.execute("CREATE INDEX IF NOT EXISTS idx_analysis_jobs_status ON analysis_jobs(status, created_at)")
+            self._db.commit()
+        return self._db
+
+    def _execute(self, sql: str, params: tuple = ()) -> int:
+        with self._db_lock:
+            db = self._connect()
+            cursor = db.execute(sql, params)
+            db.commit()
+            return cursor.rowcount
+
+    def _fetch(self, sql: str, params: tuple = ()) -> List[sqlite3.Row]:
+        with self._db_lock:
+            return self._connect().execute(sql, params).fetchall()
+
+    async def _run(self, fn, *args):
+        return await asyncio.to_thread(fn, *args)
+
+    # ===== LIFECYCLE =====
+    async def start(self, handler: JobHandler):
+        """Recover unfinished jobs and start the worker pool"""
+        self._handler = handler
+        self._queue = asyncio.Queue()
+        self._known = set()
+        await self._run(self._purge)
+        await self._run(self._requeue_expired)
+        recovered = await self._poll_queued()
+        if recovered:
+            logger.info("Recovered queued analysis jobs", extra={"count": recovered})
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._maintain()))
+
+    async def stop(self):
+        """Stop workers; unfinished jobs stay queued on disk"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        # Jobs interrupted here run again right away, not after their lease expires
+        requeued = await self._run(
+            self._execute,
+            "UPDATE analysis_jobs SET status = 'queued', worker_id = NULL, heartbeat_at = NULL "
+            "WHERE status = 'running' AND worker_id = ?",
+            (self.worker_id,)
+        )
+        if requeued:
+            logger.info("Requeued interrupted analysis jobs", extra={"count": requeued})
+        with self._db_lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    # ===== JOBS =====
+    async def submit(self, user: dict, image_bytes: bytes, prompt: str) -> str:
+        """Persist a new job and queue it; returns the job id"""
+        job_id = str(uuid.uuid4())
+        await self._run(
+            self._execute,
+            "INSERT INTO analysis_jobs (id, user_id, plan, prompt, image, status, created_at) "
+            "VALUES (?, ?, ?, ?, ?, 'queued', ?)",
+            (job_id, str(user["id"]), user.get("plan"), prompt, image_bytes, time.time())
+        )
+        self._enqueue(job_id)
+        return job_id
+
+    async def complete(self, user: dict, prompt: str, result: AnalyzeResponse) -> str:
+        """Record a job that finished immediately (e.g. served from cache)"""
+        job_id = str(uuid.uuid4())
+        now = time.time()
+        await self._run(
+            self._execute,
+            "INSERT INTO analysis_jobs (id, user_id, plan, prompt, status, result, created_at, started_at, finished_at) "
+            "VALUES (?, ?, ?, ?, 'done', ?, ?, ?, ?)",
+            (job_id, str(user["id"]), user.get("plan"), prompt, result.model_dump_json(), now, now, now)
+        )
+        return job_id
+
+    async def get(self, job_id: str, user_id: str) -> Optional[dict]:
+        """Job status for its owner, or None"""
+        rows = await self._run(
+            self._fetch, f"SELECT {_COLUMNS} FROM analysis_jobs WHERE id = ? AND user_id = ?", (job_id, str(user_id))
+        )
+        return dict(rows[0]) if rows else None
+
+    async def wait(self, job_id: str, user_id: str, timeout: float) -> Optional[dict]:
+        """Long-poll until the job finishes or ``timeout`` elapses"""
+        deadline = time.monotonic() + timeout
+        self._waiters[job_id] = self._waiters.get(job_id, 0) + 1
+        try:
+            while True:
+                job = await self.get(job_id, user_id)
+                remaining = deadline - time.monotonic()
+                if job is None or job["status"] in ("done", "failed") or remaining <= 0:
+                    return job
+                # Local completions wake us immediately; re-read the file in case
+                # another process ran the job
+                event = self._events.setdefault(job_id, asyncio.Event())
+                try:
+                    await asyncio.wait_for(event.wait(), timeout=min(remaining, 1.0))
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            self._waiters[job_id] -= 1
+            if not self._waiters[job_id]:
+                del self._waiters[job_id]
+                self._events.pop(job_id, None)
+
+    # ===== WORKERS =====
+    def _enqueue(self, job_id: str):
+        if job_id not in self._known:
+            self._known.add(job_id)
+            self._queue.put_nowait(job_id)
+
+    def _purge(self) -> int:
+        return self._execute(
+            "DELETE FROM analysis_jobs WHERE finished_at IS NOT NULL AND finished_at < ?",
+            (time.time() - settings.JOB_RETENTION_SECONDS,)
+        )
+
+    def _requeue_expired(self) -> int:
+        """Put back jobs whose process stopped renewing their lease"""
+        return self._execute(
+            "UPDATE analysis_jobs SET status = 'queued', worker_id = NULL, heartbeat_at = NULL "
+            "WHERE status = 'running' AND (heartbeat_at IS NULL OR heartbeat_at < ?)",
+            (time.time() - self.lease_seconds,)
+        )
+
+    async def _poll_queued(self) -> int:
+        """Queue jobs found on disk (submitted by other processes, or requeued); returns how many"""
+        rows = await self._run(
+            self._fetch, "SELECT id FROM analysis_jobs WHERE status = 'queued' ORDER BY created_at LIMIT ?",
+            (len(self._known) + self.workers * 4,)
+        )
+        new = [row["id"] for row in rows if row["id"] not in self._known]
+        for job_id in new:
+            self._enqueue(job_id)
+        return len(new)
+
+    async def _maintain(self):
+        last_purge = time.monotonic()
+        while True:
+            await asyncio.sleep(min(self.poll_seconds, self.lease_seconds / 3))
+            try:
+                await self._run(
+                    self._execute,
+                    "UPDATE analysis_jobs SET heartbeat_at = ? WHERE status = 'running' AND worker_id = ?",
+                    (time.time(), self.worker_id)
+                )
+                requeued = await self._run(self._requeue_expired)
+                if requeued:
+                    logger.warning("Requeued analysis jobs with an expired lease", extra={"count": requeued})
+                if self._queue.qsize() < self.workers:
+                    await self._poll_queued()
+                if time.monotonic() - last_purge >= _PURGE_INTERVAL_SECONDS:
+                    last_purge = time.monotonic()
+                    await self._run(self._purge)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Analysis job maintenance failed")
+
+    async def _worker(self):
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._process(job_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Analysis job worker error")
+            finally:
+                self._known.discard(job_id)
+                self._queue.task_done()
+
+    async def _process(self, job_id: str):
+        started_at = time.time()
+        claimed = await self._run(
+            self._execute,
+            "UPDATE analysis_jobs SET status = 'running', started_at = ?, worker_id = ?, heartbeat_at = ? "
+            "WHERE id = ? AND status = 'queued'",
+            (started_at, self.worker_id, started_at, job_id)
+        )
+        if not claimed:
+            return  # Another worker process got it first
+        rows = await self._run(self._fetch, "SELECT * FROM analysis_jobs WHERE id = ?", (job_id,))
+        job = dict(rows[0])
+        self._wait_times.append(started_at - job["created_at"])
+
+        self.running += 1
+        with log.trace(job_id) as trace:
+            status = "failed"
+            try:
+                result = await self._handler(job)
+                status = "done"
+                await self._run(
+                    self._execute,
+                    "UPDATE analysis_jobs SET status = 'done', result = ?, image = NULL, finished_at = ? "
+                    "WHERE id = ? AND worker_id = ?",
+                    (result.model_dump_json(), time.time(), job_id, self.worker_id)
+                )
+                self.completed += 1
+            except Exception as e:
+                await self._run(
+                    self._execute,
+                    "UPDATE analysis_jobs SET status = 'failed', error = ?, image = NULL, finished_at = ? "
+                    "WHERE id = ? AND worker_id = ?",
+                    (getattr(e, "detail", None) or "Analysis failed", time.time(), job_id, self.worker_id)
+                )
+                self.failed += 1
+            finally:
+                self.running -= 1
+                self._run_times.append(time.time() - started_at)
+                event = self._events.pop(job_id, None)
+                if event is not None:
+                    event.set()
+                # One line per job with its stage timings, like a request
+                logger.info("job", extra={
+                    "job_id": job_id, "status": status, "wait_ms": round((started_at - job["created_at"]) * 1000),
+                    "duration_ms": trace.elapsed_ms(), "spans": trace.timeline(), **trace.fields
+                })
+
+    def stats(self) -> dict:
+        """Queue depth and wait/run time metrics"""
+        def summary(samples: Deque[float]) -> dict:
+            if not samples:
+                return {"avg_seconds": 0.0, "max_seconds": 0.0}
+            return {"avg_seconds": round(sum(samples) / len(samples), 3), "max_seconds": round(max(samples), 3)}
+
+        return {
+            "worker_id": self.worker_id,
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "running": self.running,
+            "workers": self.workers,
+            "completed": self.completed,
+            "failed": self.failed,
+            "wait_time": summary(self._wait_times),
+            "run_time": summary(self._run_times),
+        }
+
+# Global analysis job queue instance
+analysis_jobs = AnalysisJobQueue(
+    db_path=settings.JOB_QUEUE_DB_PATH,
+    workers=settings.JOB_QUEUE_WORKERS,
+    lease_seconds=settings.JOB_LEASE_SECONDS,
+    poll_seconds=settings.JOB_POLL_SECONDS
+)
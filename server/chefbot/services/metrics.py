@@ -0,0 +1,208 @@
+"""Prometheus-style metrics (counters, gauges, fixed-bucket histograms)"""
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Tuple
+
+LabelValues = Tuple[str, ...]
+
+# Seconds; covers cached hits (~ms) up to slow Gemini calls
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Bytes; Gemini payloads are dominated by the base64 image (up to a few MB)
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(names: Iterable[str], values: Iterable[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+
+    def _key(self, labels: Tuple[str, ...]) -> LabelValues:
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {labels}")
+        return tuple(str(label) for label in labels)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+class Counter(_Metric):
+    """Monotonic counter; ``inc`` is a dict update on the event loop thread, no lock"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        if not self.labelnames and not self._values:
+            lines.append(f"{self.name} 0")
+        for key, value in list(self._values.items()):
+            lines.append(f"{self.name}{_labels(self.labelnames, key)} {_number(value)}")
+        return lines
+
+class Gauge(Counter):
+    """Value that goes up and down (e.g. work in flight)"""
+
+    kind = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+    @contextmanager
+    def track(self, *labels: str):
+        self.inc(*labels)
+        try:
+            yield
+        finally:
+            self.dec(*labels)
+
+class Histogram(_Metric):
+    """Fixed-bucket histogram; ``observe`` is a bisect plus two list/float updates"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [per-bucket counts (last = +Inf), sum]
+        self._series: Dict[LabelValues, list] = {}
+
+    def observe(self, value: float, *labels: str):
+        key = self._key(labels)
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    @contextmanager
+    def time(self, *labels: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labels)
+
+    def snapshot(self, *labels: str) -> Optional[dict]:
+        series = self._series.get(self._key(labels))
+        if series is None:
+            return None
+        return {"count": sum(series[0]), "sum": series[1], "buckets": dict(zip(self.buckets + (float("inf"),), series[0]))}
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        for key, (counts, total) in list(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="' + _number(bound) + '"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+class MetricsRegistry:
+    """All metrics of the process, rendered in the Prometheus text format.
+
+    Metrics live in this worker's memory; with several uvicorn workers each
+    one is scraped (or reports) separately.
+    """
+
+    CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def _register(self, metric: _Metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                  buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+# Global registry and the app's metrics
+registry = MetricsRegistry()
+
+http_requests = registry.counter(
+    "chefbot_http_requests_total", "HTTP requests by route template and status", ("method", "route", "status")
+)
+http_request_duration = registry.histogram(
+    "chefbot_http_request_duration_seconds", "HTTP request latency by route template", ("method", "route")
+)
+upstream_request_duration = registry.histogram(
+    "chefbot_upstream_request_duration_seconds",
+    "Upstream call latency including the response body (Supabase table/operation, Gemini model/method)",
+    ("upstream", "operation", "status")
+)
+upstream_errors = registry.counter(
+    "chefbot_upstream_errors_total", "Upstream calls that failed (HTTP status >= 400 or transport error)",
+    ("upstream", "operation", "code")
+)
+gemini_request_bytes = registry.histogram(
+    "chefbot_gemini_request_bytes", "Gemini request body size", ("model",), SIZE_BUCKETS
+)
+gemini_response_bytes = registry.histogram(
+    "chefbot_gemini_response_bytes", "Gemini response body size", ("model",), SIZE_BUCKETS
+)
+analyses_in_flight = registry.gauge(
+    "chefbot_analyses_in_flight", "Gemini analyses currently running"
+)
+free_tier_delay_seconds = registry.counter(
+    "chefbot_free_tier_delay_seconds_total", "Time spent in the free-tier artificial delay"
+)
+free_tier_delays = registry.counter(
+    "chefbot_free_tier_delays_total", "Requests that waited out the free-tier delay"
+)
+event_loop_lag = registry.histogram(
+    "chefbot_event_loop_lag_seconds", "How late the loop monitor's heartbeat ran (loop monitor enabled only)"
+)
+event_loop_stalls = registry.counter(
+    "chefbot_event_loop_stalls_total", "Heartbeats late by more than LOOP_MONITOR_THRESHOLD_MS"
+)
+upload_bytes = registry.histogram(
+    "chefbot_upload_bytes", "Multipart body bytes read per analysis upload", (), SIZE_BUCKETS
+)
+uploads_rejected = registry.counter(
+    "chefbot_uploads_rejected_total", "Analysis uploads rejected before or while the body was read", ("reason",)
+)
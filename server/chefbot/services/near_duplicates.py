@@ -0,0 +1,70 @@
+"""Near-duplicate image lookup so re-shot photos reuse a recent analysis"""
+import itertools
+import time
+from collections import deque
+from typing import Deque, Dict, Optional, Tuple
+from chefbot.models.schemas import AnalyzeResponse
+from chefbot.utils.image_hash import MultiIndexHashIndex
+from config.settings import settings
+
+class NearDuplicateIndex:
+    """Recent analyses indexed by perceptual hash.
+
+    A lookup only reuses a result from the same user, for the same prompt and
+    model (``scope``), analyzed within ``window_seconds``.
+    """
+
+    def __init__(self, max_distance: int, window_seconds: float, max_entries: int):
+        self.max_distance = max_distance
+        self.window_seconds = window_seconds
+        self.max_entries = max_entries
+        self._index = MultiIndexHashIndex(max_distance=max_distance)
+        self._entries: Dict[int, Tuple[str, str, float, AnalyzeResponse]] = {}
+        self._order: Deque[Tuple[float, int]] = deque()
+        self._ids = itertools.count()
+        self.hits = 0
+        self.misses = 0
+
+    def _expire(self, now: float):
+        cutoff = now - self.window_seconds
+        while self._order and (self._order[0][0] < cutoff or len(self._entries) > self.max_entries):
+            _, entry_id = self._order.popleft()
+            self._entries.pop(entry_id, None)
+            self._index.remove(entry_id)
+
+    def find(self, user_id: str, image_hash: int, scope: str) -> Optional[AnalyzeResponse]:
+        """Return the closest recent analysis for a near-identical image"""
+        now = time.time()
+        self._expire(now)
+        for entry_id, _distance in self._index.query(image_hash):
+            entry_user, entry_scope, _, response = self._entries[entry_id]
+            if entry_user == user_id and entry_scope == scope:
+                self.hits += 1
+                return response.model_copy(deep=True)
+        self.misses += 1
+        return None
+
+    def add(self, user_id: str, image_hash: int, scope: str, response: AnalyzeResponse):
+        """Remember an analysis result for later near-duplicate lookups"""
+        now = time.time()
+        entry_id = next(self._ids)
+        self._entries[entry_id] = (user_id, scope, now, response.model_copy(deep=True))
+        self._index.add(entry_id, image_hash)
+        self._order.append((now, entry_id))
+        self._expire(now)
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(self._entries),
+            "max_distance": self.max_distance,
+            "window_seconds": self.window_seconds,
+        }
+
+# Global near-duplicate index instance
+near_duplicates = NearDuplicateIndex(
+    max_distance=settings.NEAR_DUPLICATE_MAX_DISTANCE,
+    window_seconds=settings.NEAR_DUPLICATE_WINDOW_SECONDS,
+    max_entries=settings.NEAR_DUPLICATE_MAX_ENTRIES,
+)
@@ -0,0 +1,293 @@
+"""Sampling profiler for individual requests and an event-loop stall monitor.
+
+The profiler is a background thread that wakes every ``interval_ms``
+while at least one request is being profiled. It reads the event loop
+thread's stack (``sys._current_frames``) and which task the loop is
+running. Each sample is credited to the profiled request it belongs to:
+
+- if the request's task is on the CPU, the sample is the loop thread's
+  stack, under an ``on-cpu`` root
+- otherwise it is the request's coroutine await chain, under an
+  ``awaiting`` root (time spent waiting on Supabase/Gemini/executors)
+
+Each request's samples are written as a collapsed-stack file, one
+``frame;frame;frame count`` line per stack. Those files open in speedscope
+or ``flamegraph.pl``. When no request is being profiled the thread is parked
+on an event, so there is no cost.
+
+The loop monitor is a heartbeat coroutine plus a watchdog thread. When a
+heartbeat is late by more than the threshold, the watchdog has already
+captured the loop thread's stack mid-stall, and the heartbeat logs the
+stall's duration together with that stack.
+"""
+import asyncio
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional
+from chefbot.services import metrics
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+try:
+    from asyncio.tasks import _current_tasks  # loop -> running task (a plain dict up to 3.13)
+except ImportError:
+    _current_tasks = None
+
+_SERVER_DIR = str(Path(__file__).resolve().parents[2]) + os.sep
+_SLUG = re.compile(r"[^A-Za-z0-9]+")
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    filename = code.co_filename
+    if filename.startswith(_SERVER_DIR):
+        filename = filename[len(_SERVER_DIR):]
+    elif "site-packages" + os.sep in filename:
+        filename = filename.split("site-packages" + os.sep, 1)[1]
+    else:
+        filename = os.path.basename(filename)
+    name = getattr(code, "co_qualname", code.co_name)
+    return f"{name} ({filename}:{code.co_firstlineno})".replace(";", ":")
+
+def _thread_stack(frame, max_depth: int) -> List[str]:
+    """Root-first frames of a thread, without the event loop's own frames"""
+    stack = []
+    while frame is not None and len(stack) < max_depth:
+        # Everything below Handle._run is the loop machinery, the same for every sample
+        if frame.f_code.co_name == "_run" and frame.f_code.co_filename.endswith(os.path.join("asyncio", "events.py")):
+            break
+        stack.append(_frame_name(frame))
+        frame = frame.f_back
+    stack.reverse()
+    return stack
+
+def _await_stack(task: asyncio.Task, max_depth: int) -> List[str]:
+    """Root-first coroutine chain a suspended task is awaiting on"""
+    stack = []
+    coro = task.get_coro()
+    while coro is not None and len(stack) < max_depth:
+        frame = getattr(coro, "cr_frame", None) or getattr(coro, "gi_frame", None) or getattr(coro, "ag_frame", None)
+        if frame is None:
+            break
+        stack.append(_frame_name(frame))
+        coro = getattr(coro, "cr_await", None) or getattr(coro, "gi_yieldfrom", None) or getattr(coro, "ag_await", None)
+    return stack
+
+class ProfileSession:
+    """Samples collected for one request"""
+
+    def __init__(self, task: asyncio.Task, label: str, request_id: Optional[str]):
+        self.task = task
+        self.label = label
+        self.request_id = request_id
+        self.started = time.perf_counter()
+        self.duration_ms = 0.0
+        self.stacks: Counter = Counter()
+
+    @property
+    def samples(self) -> int:
+        return sum(self.stacks.values())
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+class SamplingProfiler:
+    """Statistical profiler of selected requests on the event loop thread"""
+
+    def __init__(self, interval_ms: float = 5.0, output_dir: str = "profiles", max_files: int = 200,
+                 sample_rate: float = 0.0, enabled: bool = False, max_depth: int = 96):
+        self.interval = interval_ms / 1000
+        self.output_dir = Path(output_dir)
+        self.max_files = max_files
+        self.sample_rate = sample_rate
+        self.enabled = enabled
+        self.max_depth = max_depth
+        self._sessions: Dict[int, ProfileSession] = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self.profiles_written = 0
+        self.samples_taken = 0
+
+    def begin(self, label: str, request_id: Optional[str] = None) -> ProfileSession:
+        """Start sampling the current task"""
+        task = asyncio.current_task()
+        if self._loop is None:
+            self._loop = asyncio.get_running_loop()
+            self._loop_thread_id = threading.get_ident()
+        session = ProfileSession(task, label, request_id)
+        with self._lock:
+            self._sessions[id(session)] = session
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+                self._thread.start()
+            self._wake.set()
+        return session
+
+    def end(self, session: ProfileSession):
+        with self._lock:
+            self._sessions.pop(id(session), None)
+        session.duration_ms = (time.perf_counter() - session.started) * 1000
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            time.sleep(self.interval)
+            # Under the lock, so a session gets no samples once end() returns
+            with self._lock:
+                if not self._sessions:
+                    self._wake.clear()
+                    continue
+                self._sample(list(self._sessions.values()))
+
+    def _sample(self, sessions: List[ProfileSession]):
+        frame = sys._current_frames().get(self._loop_thread_id)
+        running = _current_tasks.get(self._loop) if _current_tasks is not None else None
+        loop_stack = None
+        for session in sessions:
+            if running is session.task or (_current_tasks is None and frame is not None):
+                if loop_stack is None:
+                    loop_stack = ";".join(["on-cpu"] + _thread_stack(frame, self.max_depth))
+                session.stacks[loop_stack] += 1
+            else:
+                session.stacks[";".join(["awaiting"] + _await_stack(session.task, self.max_depth))] += 1
+        self.samples_taken += len(sessions)
+
+    def _write(self, session: ProfileSession) -> Path:
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        slug = _SLUG.sub("-", session.label).strip("-") or "request"
+        path = self.output_dir / f"{time.strftime('%Y%m%d-%H%M%S')}_{slug}_{session.request_id or id(session)}.collapsed"
+        path.write_text(session.collapsed())
+        # Keep the newest max_files profiles
+        profiles = sorted(self.output_dir.glob("*.collapsed"), key=lambda p: p.stat().st_mtime)
+        for stale in profiles[:-self.max_files] if self.max_files > 0 else []:
+            stale.unlink(missing_ok=True)
+        return path
+
+    async def save(self, session: ProfileSession) -> Optional[Path]:
+        """Write the session's collapsed stacks (off the event loop)"""
+        if not session.stacks:
+            logger.info("Profile has no samples (request shorter than the sampling interval)",
+                        extra={"label": session.label, "duration_ms": round(session.duration_ms, 1)})
+            return None
+        path = await asyncio.to_thread(self._write, session)
+        self.profiles_written += 1
+        logger.info("Profile written", extra={
+            "path": str(path), "label": session.label, "samples": session.samples,
+            "duration_ms": round(session.duration_ms, 1),
+        })
+        return path
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "sample_rate": self.sample_rate,
+            "interval_ms": self.interval * 1000,
+            "output_dir": str(self.output_dir),
+            "active": len(self._sessions),
+            "profiles_written": self.profiles_written,
+            "samples_taken": self.samples_taken,
+            "task_attribution": _current_tasks is not None,
+        }
+
+class LoopLagMonitor:
+    """Reports event-loop stalls longer than ``threshold_ms``, with the blocking stack"""
+
+    def __init__(self, threshold_ms: float = 100.0, heartbeat_ms: float = 25.0, max_depth: int = 48):
+        self.threshold = threshold_ms / 1000
+        self.heartbeat = heartbeat_ms / 1000
+        self.max_depth = max_depth
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+        self._loop_thread_id: Optional[int] = None
+        self._last_beat = 0.0
+        self._stall_stack: Optional[List[str]] = None
+        self._stall_beat = 0.0
+        self.stalls = 0
+        self.worst_ms = 0.0
+        self.last_stall: Optional[dict] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    async def start(self):
+        if self._task is not None:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stopping.clear()
+        self._task = asyncio.create_task(self._beat())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-lag-watchdog", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._stopping.set()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        await asyncio.to_thread(self._watchdog.join)
+        self._watchdog = None
+
+    async def _beat(self):
+        while True:
+            before = time.monotonic()
+            self._last_beat = before
+            await asyncio.sleep(self.heartbeat)
+            lag = time.monotonic() - before - self.heartbeat
+            metrics.event_loop_lag.observe(max(lag, 0.0))
+            if lag > self.threshold:
+                stack = self._stall_stack if self._stall_beat == before else None
+                self._report(lag, stack)
+
+    def _watch(self):
+        # Runs in its own thread: grabs the loop thread's stack while it is stuck
+        while not self._stopping.wait(self.threshold / 2):
+            beat = self._last_beat
+            if time.monotonic() - beat > self.threshold + self.heartbeat and self._stall_beat != beat:
+                frame = sys._current_frames().get(self._loop_thread_id)
+                self._stall_stack = _thread_stack(frame, self.max_depth) if frame is not None else None
+                self._stall_beat = beat
+
+    def _report(self, lag: float, stack: Optional[List[str]]):
+        self.stalls += 1
+        self.worst_ms = max(self.worst_ms, lag * 1000)
+        metrics.event_loop_stalls.inc()
+        self.last_stall = {"blocked_ms": round(lag * 1000, 1), "at": time.time(), "stack": stack}
+        logger.warning("Event loop blocked", extra={
+            "blocked_ms": round(lag * 1000, 1), "threshold_ms": self.threshold * 1000,
+            "stack": ";".join(stack) if stack else None,
+        })
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "threshold_ms": self.threshold * 1000,
+            "stalls": self.stalls,
+            "worst_ms": round(self.worst_ms, 1),
+            "last_stall": self.last_stall,
+        }
+
+# Global instances; both can be switched at runtime through /api/debug/profiler
+profiler = SamplingProfiler(
+    interval_ms=settings.PROFILER_INTERVAL_MS,
+    output_dir=settings.PROFILER_OUTPUT_DIR,
+    max_files=settings.PROFILER_MAX_FILES,
+    sample_rate=settings.PROFILER_SAMPLE_RATE,
+    enabled=settings.PROFILER_ENABLED,
+)
+loop_monitor = LoopLagMonitor(threshold_ms=settings.LOOP_MONITOR_THRESHOLD_MS)
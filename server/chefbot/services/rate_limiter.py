@@ -0,0 +1,239 @@
+"""Per-user sliding-window rate limiting"""
+import asyncio
+import math
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+from config.settings import settings
+
+def _slide(state: Optional[List[int]], window: int) -> Tuple[int, int]:
+    """(current, previous) counts for ``window`` given the stored [window, current, previous]"""
+    if state is None:
+        return 0, 0
+    stored_window, current, previous = state
+    if stored_window == window:
+        return current, previous
+    if stored_window == window - 1:
+        return 0, current
+    return 0, 0
+
+def _estimate(current: int, previous: int, weight: float) -> float:
+    return previous * weight + current
+
+@dataclass
+class RateLimitResult:
+    allowed: bool
+    limit: int
+    remaining: int
+    reset_after: float  # seconds until the current window ends
+    retry_after: float = 0.0  # seconds until the next request would be allowed
+
+    def headers(self) -> Dict[str, str]:
+        headers = {
+            "X-RateLimit-Limit": str(self.limit),
+            "X-RateLimit-Remaining": str(self.remaining),
+            "X-RateLimit-Reset": str(math.ceil(self.reset_after)),
+        }
+        if not self.allowed:
+            headers["Retry-After"] = str(max(1, math.ceil(self.retry_after)))
+        return headers
+
+class MemoryRateLimitStore:
+    """Counters in this process only - fine for a single uvicorn worker"""
+
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        self._counters: Dict[str, List[int]] = {}
+
+    async def hit(self, key: str, window: int, weight: float, limit: int) -> Tuple[bool, int, int]:
+        """Count a request if it fits; returns (allowed, current, previous)"""
+        current, previous = _slide(self._counters.get(key), window)
+        allowed = _estimate(current, previous, weight) + 1 <= limit
+        if allowed:
+            current += 1
+        self._counters[key] = [window, current, previous]
+        if len(self._counters) > self.max_keys:
+            self._evict(window)
+        return allowed, current, previous
+
+    async def peek(self, key: str, window: int) -> Tuple[int, int]:
+        return _slide(self._counters.get(key), window)
+
+    def _evict(self, window: int):
+        for key in [key for key, state in self._counters.items() if state[0] < window - 1]:
+            del self._counters[key]
+        while len(self._counters) > self.max_keys:
+            del self._counters[next(iter(self._counters))]
+
+class SQLiteRateLimitStore:
+    """Counters in a SQLite file so every worker process on the host shares them"""
+
+    PURGE_EVERY = 1000
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        self._hits = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._db is None:
+            self._db = sqlite3.connect(self.db_path, check_same_thread=False, timeout=5, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS rate_limits ("
+                "key TEXT PRIMARY KEY, window INTEGER NOT NULL, current INTEGER NOT NULL, previous INTEGER NOT NULL)"
+            )
+        return self._db
+
+    def _hit(self, key: str, window: int, weight: float, limit: int) -> Tuple[bool, int, int]:
+        with self._db_lock:
+            db = self._connect()
+            # IMMEDIATE takes the write lock up front so read-check-write is atomic across processes
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                row = db.execute("SELECT window, current, previous FROM rate_limits WHERE key = ?", (key,)).fetchone()
+                current, previous = _slide(list(row) if row else None, window)
+                allowed = _estimate(current, previous, weight) + 1 <= limit
+                if allowed:
+                    current += 1
+                db.execute(
+                    "INSERT OR REPLACE INTO rate_limits (key, window, current, previous) VALUES (?, ?, ?, ?)",
+                    (key, window, current, previous)
+                )
+                self._hits += 1
+                if self._hits % self.PURGE_EVERY == 0:
+                    db.execute("DELETE FROM rate_limits WHERE window < ?", (window - 1,))
+                db.execute("COMMIT")
+            except Exception:
+                db.execute("ROLLBACK")
+                raise
+        return allowed, current, previous
+
+    def _peek(self, key: str, window: int) -> Tuple[int, int]:
+        with self._db_lock:
+            row = self._connect().execute(
+                "SELECT window, current, previous FROM rate_limits WHERE key = ?", (key,)
+            ).fetchone()
+        return _slide(list(row) if row else None, window)
+
+    async def hit(self, key: str, window: int, weight: float, limit: int) -> Tuple[bool, int, int]:
+        return await asyncio.to_thread(self._hit, key, window, weight, limit)
+
+    async def peek(self, key: str, window: int) -> Tuple[int, int]:
+        return await asyncio.to_thread(self._peek, key, window)
+
+    def close(self):
+        with self._db_lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+class RateLimiter:
+    """Sliding-window counter limiter: O(1) time and two counters per user.
+
+    The request rate is estimated as the current window's count plus the
+    previous window's count weighted by how much of it still overlaps the
+    sliding window. Requests are checked in middleware before the upload is
+    read, from the JWT alone; the user's plan isn't in the token, so plans
+    learned from earlier requests are kept as hints and unknown users get
+    the more generous limit until ``check`` sees the real plan.
+    """
+
+    def __init__(self, store, window_seconds: float, max_plan_hints: int = 100_000):
+        self.store = store
+        self.window_seconds = window_seconds
+        self.max_plan_hints = max_plan_hints
+        self._plans: "OrderedDict[str, str]" = OrderedDict()
+        self.allowed = 0
+        self.limited = 0
+
+    @staticmethod
+    def limit_for_plan(plan: Optional[str]) -> int:
+        if plan == "free":
+            return settings.RATE_LIMIT_FREE_PER_HOUR
+        if plan is None:
+            return max(settings.RATE_LIMIT_FREE_PER_HOUR, settings.RATE_LIMIT_PRO_PER_HOUR)
+        return settings.RATE_LIMIT_PRO_PER_HOUR
+
+    def remember_plan(self, user_id: str, plan: Optional[str]):
+        user_id = str(user_id)
+        self._plans[user_id] = plan or "free"
+        self._plans.move_to_end(user_id)
+        while len(self._plans) > self.max_plan_hints:
+            self._plans.popitem(last=False)
+
+    def _clock(self) -> Tuple[int, float, float]:
+        """(window index, weight of the previous window, seconds until the window ends)"""
+        now = time.time()
+        window = int(now // self.window_seconds)
+        elapsed = now - window * self.window_seconds
+        return window, 1 - elapsed / self.window_seconds, self.window_seconds - elapsed
+
+    def _retry_after(self, current: int, previous: int, weight: float, limit: int) -> float:
+        """Seconds until the estimate drops low enough for one more request"""
+        elapsed = 1 - weight
+        if current + 1 <= limit and previous > 0:
+            # Wait for the previous window's share to decay
+            needed = 1 - (limit - current - 1) / previous
+            return max(needed - elapsed, 0) * self.window_seconds
+        wait = weight * self.window_seconds
+        if current > 0 and limit >= 1:
+            wait += max(1 - (limit - 1) / current, 0) * self.window_seconds
+        return wait
+
+    def _result(self, allowed: bool, current: int, previous: int, weight: float, limit: int, reset_after: float) -> RateLimitResult:
+        remaining = max(0, math.floor(limit - _estimate(current, previous, weight)))
+        return RateLimitResult(
+            allowed=allowed,
+            limit=limit,
+            remaining=remaining,
+            reset_after=reset_after,
+            retry_after=0.0 if allowed else self._retry_after(current, previous, weight, limit),
+        )
+
+    async def hit(self, user_id: str) -> RateLimitResult:
+        """Count one request for ``user_id`` if it is within the limit"""
+        limit = self.limit_for_plan(self._plans.get(str(user_id)))
+        window, weight, reset_after = self._clock()
+        allowed, current, previous = await self.store.hit(str(user_id), window, weight, limit)
+        if allowed:
+            self.allowed += 1
+        else:
+            self.limited += 1
+        return self._result(allowed, current, previous, weight, limit, reset_after)
+
+    async def check(self, user: dict) -> RateLimitResult:
+        """Re-check an already counted request against the user's actual plan"""
+        self.remember_plan(user["id"], user.get("plan"))
+        limit = self.limit_for_plan(user.get("plan") or "free")
+        window, weight, reset_after = self._clock()
+        current, previous = await self.store.peek(str(user["id"]), window)
+        allowed = _estimate(current, previous, weight) <= limit
+        if not allowed:
+            self.limited += 1
+        return self._result(allowed, current, previous, weight, limit, reset_after)
+
+    def stats(self) -> dict:
+        return {
+            "store": type(self.store).__name__,
+            "window_seconds": self.window_seconds,
+            "allowed": self.allowed,
+            "limited": self.limited,
+            "plan_hints": len(self._plans),
+        }
+
+    def close(self):
+        if hasattr(self.store, "close"):
+            self.store.close()
+
+def _make_store():
+    if settings.RATE_LIMIT_DB_PATH:
+        return SQLiteRateLimitStore(settings.RATE_LIMIT_DB_PATH)
+    return MemoryRateLimitStore()
+
+# Global rate limiter instance
+rate_limiter = RateLimiter(store=_make_store(), window_seconds=settings.RATE_LIMIT_WINDOW_SECONDS)
@@ -0,0 +1,209 @@
+"""Incremental, fault-tolerant parser for the model's recipe JSON output"""
+import json
+import re
+from typing import List, Optional, Tuple
+from pydantic import ValidationError
+from chefbot.models.schemas import AnalyzeResponse, Recipe
+
+_TRAILING_COMMA = re.compile(r",(\s*[\]}])")
+_LEADING_INT = re.compile(r"\d+")
+_STRING_SPECIAL = re.compile(r'["\\]')
+_STRUCTURAL = re.compile(r'[{}\[\]":]')
+
+def _strip_trailing_commas(text: str) -> str:
+    """Remove commas directly before a closing bracket, leaving string contents alone"""
+    parts = []
+    start = 0
+    in_string = False
+    escape = False
+    for pos, char in enumerate(text):
+        if in_string:
+            if escape:
+                escape = False
+            elif char == "\\":
+                escape = True
+            elif char == '"':
+                in_string = False
+                parts.append(text[start:pos + 1])
+                start = pos + 1
+        elif char == '"':
+            parts.append(_TRAILING_COMMA.sub(r"\1", text[start:pos]))
+            start = pos
+            in_string = True
+    parts.append(_TRAILING_COMMA.sub(r"\1", text[start:]) if not in_string else text[start:])
+    return "".join(parts)
+
+def loads_lenient(text: str):
+    """json.loads that also accepts trailing commas"""
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        return json.loads(_strip_trailing_commas(text))
+
+def _string_list(value) -> List[str]:
+    if value is None:
+        return []
+    if isinstance(value, str):
+        return [value]
+    if isinstance(value, list):
+        return [item if isinstance(item, str) else json.dumps(item) for item in value if item is not None]
+    return [str(value)]
+
+def _minutes(value) -> Optional[int]:
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    if isinstance(value, str):
+        match = _LEADING_INT.search(value)
+        return int(match.group()) if match else None
+    return None
+
+def recipe_from_dict(recipe_data: dict) -> Recipe:
+    """Map one model recipe object onto our Recipe model, coercing loose types"""
+    return Recipe(
+        title=str(recipe_data.get("title") or "Unknown Recipe"),
+        ingredients=_string_list(recipe_data.get("ingredients")),
+        steps=_string_list(recipe_data.get("steps")),
+        timeMins=_minutes(recipe_data.get("timeMins"))
+    )
+
+class RecipeStreamParser:
+    """Scans model output as it arrives and reports completed pieces.
+
+    ``feed()`` returns events as soon as they are complete in the text seen so
+    far: ``("ingredients", [...])`` when the top-level ingredients array
+    closes and ``("recipe", Recipe)`` whenever an object inside the top-level
+    recipes array closes. Prose, code fences and stray braces before the real
+    JSON are skipped, trailing commas are accepted, and a malformed recipe is
+    dropped without losing the others. ``finish()`` salvages what it can when
+    the output was cut off (e.g. at ``maxOutputTokens``).
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self._pos = 0
+        self._stack: List[Tuple[str, int, Optional[str]]] = []  # (bracket, start, key)
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._last_string: Optional[str] = None
+        self._pending_key: Optional[str] = None
+        self._partial_ingredients: List[str] = []
+        self._done = False
+        self.truncated = False
+        self.skipped_recipes = 0
+        self.ingredients: Optional[List[str]] = None
+        self.recipes: List[Recipe] = []
+
+    def feed(self, text: str) -> List[Tuple[str, object]]:
+        self.buffer += text
+        events = []
+        buffer = self.buffer
+        end = len(buffer)
+        pos = self._pos
+        while pos < end and not self._done:
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                    pos += 1
+                    continue
+                match = _STRING_SPECIAL.search(buffer, pos)
+                if match is None:
+                    pos = end
+                    break
+                pos = match.start()
+                if buffer[pos] == "\\":
+                    self._escape = True
+                else:
+                    self._in_string = False
+                    self._close_string(buffer[self._string_start:pos + 1])
+                pos += 1
+                continue
+
+            if not self._stack:
+                pos = buffer.find("{", pos)
+                if pos == -1:
+                    pos = end
+                    break
+                self._stack.append(("{", pos, None))
+                pos += 1
+                continue
+
+            match = _STRUCTURAL.search(buffer, pos)
+            if match is None:
+                pos = end
+                break
+            pos = match.start()
+            char = buffer[pos]
+            if char == '"':
+                self._in_string = True
+                self._string_start = pos
+            elif char == ":":
+                self._pending_key = self._last_string
+            elif char in "{[":
+                parent = self._stack[-1][0]
+                self._stack.append((char, pos, self._pending_key if parent == "{" else None))
+                self._pending_key = None
+            else:
+                _, start, key = self._stack.pop()
+                event = self._complete(key, buffer[start:pos + 1])
+                if event is not None:
+                    events.append(event)
+                if not self._stack:
+                    # A stray {...} in leading prose yields nothing - keep looking for the real object
+                    self._done = self.ingredients is not None or bool(self.recipes)
+            pos += 1
+        self._pos = pos
+        return events
+
+    def _close_string(self, literal: str):
+        try:
+            value = json.loads(literal)
+        except json.JSONDecodeError:
+            value = literal[1:-1]
+        self._last_string = value
+        if len(self._stack) == 2 and self._stack[1][0] == "[" and self._stack[1][2] == "ingredients":
+            self._partial_ingredients.append(value)
+
+    def _complete(self, key: Optional[str], text: str) -> Optional[Tuple[str, object]]:
+        depth = len(self._stack)
+        if depth == 1 and key == "ingredients":
+            try:
+                self.ingredients = _string_list(loads_lenient(text))
+            except json.JSONDecodeError:
+                self.ingredients = list(self._partial_ingredients)
+            return ("ingredients", self.ingredients)
+        if depth == 2 and self._stack[1][2] == "recipes" and text.startswith("{"):
+            try:
+                recipe = recipe_from_dict(loads_lenient(text))
+            except (json.JSONDecodeError, ValidationError, AttributeError):
+                self.skipped_recipes += 1
+                return None
+            self.recipes.append(recipe)
+            return ("recipe", recipe)
+        return None
+
+    def finish(self) -> List[Tuple[str, object]]:
+        """Flush at end of output, salvaging a cut-off ingredient list"""
+        events = []
+        if self._stack:
+            self.truncated = True
+        if self.ingredients is None and self._partial_ingredients:
+            self.ingredients = list(self._partial_ingredients)
+            events.append(("ingredients", self.ingredients))
+        self._done = True
+        return events
+
+    def result(self) -> Optional[AnalyzeResponse]:
+        """Everything parsed so far, or None if nothing usable was found"""
+        if self.ingredients is None and not self.recipes:
+            return None
+        return AnalyzeResponse(ingredients=self.ingredients or [], recipes=list(self.recipes))
+
+def parse_recipe_response(text: str) -> Optional[AnalyzeResponse]:
+    """Parse a complete (or truncated) model response in one go"""
+    parser = RecipeStreamParser()
+    parser.feed(text)
+    parser.finish()
+    return parser.result()
@@ -0,0 +1,288 @@
+"""Data access for users, sessions and usage (PostgREST or direct Postgres)"""
+import asyncio
+import json
+import logging
+import time
+import uuid
+from abc import ABC, abstractmethod
+from datetime import date, datetime
+from decimal import Decimal
+from typing import List, Optional
+from chefbot.services import metrics
+from chefbot.services.http_client import get_supabase_client
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+try:
+    import asyncpg
+    ASYNCPG_AVAILABLE = True
+except ImportError:
+    asyncpg = None
+    ASYNCPG_AVAILABLE = False
+
+class RepositoryError(Exception):
+    """The data backend failed or returned an unexpected response"""
+
+class Repository(ABC):
+    """Hot-path queries, implemented once per backend.
+
+    Rows come back as plain dicts shaped like PostgREST's JSON (ids and
+    timestamps as strings), so callers don't care which backend is active.
+    Session and usage writes go through the same database functions
+    (``add_session_rpcs.sql``, ``add_usage_metering_rpc.sql``, ...) on both.
+    """
+
+    name = "base"
+
+    async def start(self):
+        pass
+
+    async def close(self):
+        pass
+
+    @abstractmethod
+    async def get_user(self, user_id: str) -> Optional[dict]:
+        ...
+
+    @abstractmethod
+    async def get_user_by_email(self, email: str) -> Optional[dict]:
+        ...
+
+    @abstractmethod
+    async def update_password_hash(self, user_id: str, old_hash: str, new_hash: str):
+        """Replace the password hash, only if it is still ``old_hash``"""
+
+    @abstractmethod
+    async def increment_monthly_usage(self, user_id: str, count: int, month: str, free_limit: int) -> Optional[dict]:
+        """``{"allowed", "monthly_usage", "usage_month"}``, or None for an unknown user"""
+
+    @abstractmethod
+    async def start_session(self, user_id: str, device_id: str, device_info: dict, refresh_token_hash: str,
+                            expires_at: datetime, enforce_single_device: bool) -> str:
+        """``"ok"`` or ``"conflict"``"""
+
+    @abstractmethod
+    async def rotate_session(self, user_id: str, device_id: str, old_refresh_token_hash: str,
+                             new_refresh_token_hash: str, expires_at: datetime) -> Optional[dict]:
+        ...
+
+    @abstractmethod
+    async def deactivate_session(self, user_id: str, refresh_token_hash: str, last_activity: datetime):
+        ...
+
+    @abstractmethod
+    async def touch_sessions(self, updates: List[dict]) -> int:
+        ...
+
+class PostgrestRepository(Repository):
+    """Supabase REST API over the pooled httpx client (the default)"""
+
+    name = "postgrest"
+
+    @staticmethod
+    async def _rpc(function: str, args: dict):
+        response = await get_supabase_client().post(f"/rpc/{function}", json=args)
+        if response.status_code != 200:
+            raise RepositoryError(f"{function} failed: {response.status_code} - {response.text[:200]}")
+        return response.json()
+
+    @staticmethod
+    async def _first(path: str, params: dict) -> Optional[dict]:
+        response = await get_supabase_client().get(path, params=params)
+        if response.status_code != 200:
+            raise RepositoryError(f"GET {path} failed: {response.status_code} - {response.text[:200]}")
+        rows = response.json()
+        return rows[0] if rows else None
+
+    async def get_user(self, user_id: str) -> Optional[dict]:
+        return await self._first("/users", {"id": f"eq.{user_id}"})
+
+    async def get_user_by_email(self, email: str) -> Optional[dict]:
+        return await self._first("/users", {"email": f"eq.{email}"})
+
+    async def update_password_hash(self, user_id: str, old_hash: str, new_hash: str):
+        response = await get_supabase_client().patch(
+            "/users",
+            params={"id": f"eq.{user_id}", "password_hash": f"eq.{old_hash}"},
+            json={"password_hash": new_hash}
+        )
+        if response.status_code not in [200, 204]:
+            raise RepositoryError(f"PATCH /users failed: {response.status_code} - {response.text[:200]}")
+
+    async def increment_monthly_usage(self, user_id: str, count: int, month: str, free_limit: int) -> Optional[dict]:
+        rows = await self._rpc("increment_monthly_usage", {
+            "p_user_id": user_id, "p_count": count, "p_month": month, "p_free_limit": free_limit
+        })
+        return rows[0] if rows else None
+
+    async def start_session(self, user_id: str, device_id: str, device_info: dict, refresh_token_hash: str,
+                            expires_at: datetime, enforce_single_device: bool) -> str:
+        return await self._rpc("start_user_session", {
+            "p_user_id": user_id,
+            "p_device_id": device_id,
+            "p_device_info": device_info or {},
+            "p_refresh_token_hash": refresh_token_hash,
+            "p_expires_at": expires_at.isoformat(),
+            "p_enforce_single_device": enforce_single_device
+        })
+
+    async def rotate_session(self, user_id: str, device_id: str, old_refresh_token_hash: str,
+                             new_refresh_token_hash: str, expires_at: datetime) -> Optional[dict]:
+        rows = await self._rpc("rotate_user_session", {
+            "p_user_id": user_id,
+            "p_device_id": device_id,
+            "p_old_refresh_token_hash": old_refresh_token_hash,
+            "p_new_refresh_token_hash": new_refresh_token_hash,
+            "p_expires_at": expires_at.isoformat()
+        })
+        return rows[0] if rows else None
+
+    async def deactivate_session(self, user_id: str, refresh_token_hash: str, last_activity: datetime):
+        response = await get_supabase_client().patch(
+            "/user_sessions",
+            params={"user_id": f"eq.{user_id}", "refresh_token_hash": f"eq.{refresh_token_hash}"},
+            json={"is_active": False, "last_activity": last_activity.isoformat()}
+        )
+        if response.status_code not in [200, 204]:
+            raise RepositoryError(f"PATCH /user_sessions failed: {response.status_code} - {response.text[:200]}")
+
+    async def touch_sessions(self, updates: List[dict]) -> int:
+        return await self._rpc("touch_user_sessions", {"p_updates": updates})
+
+def _jsonable(value):
+    """Convert asyncpg values to what PostgREST's JSON would have given us"""
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+def _row(record) -> Optional[dict]:
+    return {key: _jsonable(value) for key, value in record.items()} if record is not None else None
+
+class PostgresRepository(Repository):
+    """Direct asyncpg pool to the Supabase Postgres instance.
+
+    Skips the REST hop and the JSON encode/decode on both ends. asyncpg
+    prepares every statement on first use per connection and keeps it in a
+    per-connection cache, so repeat queries only send bind/execute. Point
+    ``DATABASE_URL`` at the direct connection or the session-mode pooler;
+    transaction-mode pgbouncer can't keep prepared statements.
+    """
+
+    name = "postgres"
+
+    def __init__(self, dsn: str, min_size: int, max_size: int, statement_cache_size: int, timeout: float):
+        if not ASYNCPG_AVAILABLE:
+            raise RuntimeError("DATA_BACKEND=postgres needs the 'asyncpg' package")
+        if not dsn:
+            raise RuntimeError("DATA_BACKEND=postgres needs DATABASE_URL")
+        self.dsn = dsn
+        self.min_size = min_size
+        self.max_size = max_size
+        self.statement_cache_size = statement_cache_size
+        self.timeout = timeout
+        self._pool = None
+        self._start_lock = asyncio.Lock()
+
+    @staticmethod
+    async def _init_connection(connection):
+        for type_name in ("json", "jsonb"):
+            await connection.set_type_codec(type_name, encoder=json.dumps, decoder=json.loads, schema="pg_catalog")
+
+    async def start(self):
+        async with self._start_lock:
+            if self._pool is not None:
+                return
+            self._pool = await asyncpg.create_pool(
+                self.dsn,
+                min_size=self.min_size,
+                max_size=self.max_size,
+                statement_cache_size=self.statement_cache_size,
+                init=self._init_connection,
+            )
+            logger.info("Postgres pool ready", extra={"min_size": self.min_size, "max_size": self.max_size})
+
+    async def close(self):
+        if self._pool is not None:
+            await self._pool.close()
+            self._pool = None
+
+    async def _fetch(self, method: str, operation: str, query: str, *args):
+        if self._pool is None:
+            await self.start()
+        start = time.perf_counter()
+        try:
+            # Bounded wait for a free connection: an exhausted pool fails fast instead of hanging
+            async with self._pool.acquire(timeout=self.timeout) as connection:
+                result = await getattr(connection, method)(query, *args, timeout=self.timeout)
+        except (asyncpg.PostgresError, asyncpg.InterfaceError, asyncio.TimeoutError, OSError) as e:
+            metrics.upstream_request_duration.observe(time.perf_counter() - start, "postgres", operation, "error")
+            metrics.upstream_errors.inc("postgres", operation, type(e).__name__)
+            raise RepositoryError(f"{type(e).__name__}: {e}") from e
+        metrics.upstream_request_duration.observe(time.perf_counter() - start, "postgres", operation, "ok")
+        return result
+
+    async def _fetchrow(self, operation: str, query: str, *args):
+        return await self._fetch("fetchrow", operation, query, *args)
+
+    async def _fetchval(self, operation: str, query: str, *args):
+        return await self._fetch("fetchval", operation, query, *args)
+
+    async def get_user(self, user_id: str) -> Optional[dict]:
+        return _row(await self._fetchrow("get_user", "SELECT * FROM users WHERE id = $1::uuid", str(user_id)))
+
+    async def get_user_by_email(self, email: str) -> Optional[dict]:
+        return _row(await self._fetchrow("get_user_by_email", "SELECT * FROM users WHERE email = $1", email))
+
+    async def update_password_hash(self, user_id: str, old_hash: str, new_hash: str):
+        await self._fetchval(
+            "update_password_hash", "UPDATE users SET password_hash = $3 WHERE id = $1::uuid AND password_hash = $2",
+            str(user_id), old_hash, new_hash
+        )
+
+    async def increment_monthly_usage(self, user_id: str, count: int, month: str, free_limit: int) -> Optional[dict]:
+        return _row(await self._fetchrow(
+            "rpc/increment_monthly_usage", "SELECT * FROM increment_monthly_usage($1::uuid, $2, $3, $4)", str(user_id), count, month, free_limit
+        ))
+
+    async def start_session(self, user_id: str, device_id: str, device_info: dict, refresh_token_hash: str,
+                            expires_at: datetime, enforce_single_device: bool) -> str:
+        return await self._fetchval(
+            "rpc/start_user_session", "SELECT start_user_session($1::uuid, $2, $3, $4, $5, $6)",
+            str(user_id), device_id, device_info or {}, refresh_token_hash, expires_at, enforce_single_device
+        )
+
+    async def rotate_session(self, user_id: str, device_id: str, old_refresh_token_hash: str,
+                             new_refresh_token_hash: str, expires_at: datetime) -> Optional[dict]:
+        return _row(await self._fetchrow(
+            "rpc/rotate_user_session", "SELECT * FROM rotate_user_session($1::uuid, $2, $3, $4, $5)",
+            str(user_id), device_id, old_refresh_token_hash, new_refresh_token_hash, expires_at
+        ))
+
+    async def deactivate_session(self, user_id: str, refresh_token_hash: str, last_activity: datetime):
+        await self._fetchval(
+            "deactivate_session", "UPDATE user_sessions SET is_active = false, last_activity = $3 "
+            "WHERE user_id = $1::uuid AND refresh_token_hash = $2",
+            str(user_id), refresh_token_hash, last_activity
+        )
+
+    async def touch_sessions(self, updates: List[dict]) -> int:
+        return await self._fetchval("rpc/touch_user_sessions", "SELECT touch_user_sessions($1::jsonb)", updates)
+
+def make_repository() -> Repository:
+    if settings.DATA_BACKEND == "postgres":
+        return PostgresRepository(
+            dsn=settings.DATABASE_URL,
+            min_size=settings.DATABASE_POOL_MIN_SIZE,
+            max_size=settings.DATABASE_POOL_MAX_SIZE,
+            statement_cache_size=settings.DATABASE_STATEMENT_CACHE_SIZE,
+            timeout=settings.DATABASE_TIMEOUT_SECONDS
+        )
+    return PostgrestRepository()
+
+# Global repository, selected by DATA_BACKEND
+repository = make_repository()
@@ -0,0 +1,116 @@
+"""Write-behind buffer for session last_activity timestamps"""
+import asyncio
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Dict, Optional, Tuple
+from chefbot.services.repository import repository
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+SessionKey = Tuple[str, str]  # (user_id, device_id)
+
+class SessionActivityBuffer:
+    """Coalesces last_activity updates per session and writes them in bulk.
+
+    ``touch`` only records the latest timestamp in memory, so authenticated
+    requests never wait on a session write. A background task sends
+    everything pending in one ``touch_user_sessions`` call per interval, and
+    ``stop`` flushes whatever is left on shutdown. A failed flush puts its
+    entries back unless a newer touch replaced them meanwhile.
+    """
+
+    def __init__(self, flush_interval: float, max_pending: int):
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pending: Dict[SessionKey, datetime] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+        self.touches = 0
+        self.flushes = 0
+        self.flushed = 0
+        self.failures = 0
+        self.dropped = 0
+        self.last_flush_ms: Optional[float] = None
+        self.max_flush_ms = 0.0
+
+    def touch(self, user_id: str, device_id: Optional[str]):
+        """Record activity on a session (no I/O)"""
+        if not device_id:
+            return
+        key = (str(user_id), device_id)
+        self.touches += 1
+        if key not in self._pending and len(self._pending) >= self.max_pending:
+            # Bookkeeping only: drop rather than grow without bound while the DB is unreachable
+            self.dropped += 1
+            return
+        self._pending[key] = datetime.now(timezone.utc)
+
+    async def flush(self) -> int:
+        """Write all pending timestamps in one call; returns how many sessions were sent"""
+        async with self._lock:
+            if not self._pending:
+                return 0
+            batch, self._pending = self._pending, {}
+            start = time.perf_counter()
+            try:
+                await repository.touch_sessions([
+                    {"user_id": user_id, "device_id": device_id, "last_activity": seen.isoformat()}
+                    for (user_id, device_id), seen in batch.items()
+                ])
+            except Exception as e:
+                self.failures += 1
+                for key, seen in batch.items():
+                    self._pending.setdefault(key, seen)
+                logger.warning("Failed to flush session activity updates: %s", e, extra={"updates": len(batch)})
+                return 0
+            finally:
+                elapsed = (time.perf_counter() - start) * 1000
+                self.last_flush_ms = elapsed
+                self.max_flush_ms = max(self.max_flush_ms, elapsed)
+            self.flushes += 1
+            self.flushed += len(batch)
+            return len(batch)
+
+    async def _flusher(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Session activity flusher error")
+
+    # ===== LIFECYCLE =====
+    async def start(self):
+        self._task = asyncio.create_task(self._flusher())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        pending = len(self._pending)
+        if pending and await self.flush():
+            logger.info("Flushed session activity updates", extra={"updates": pending})
+
+    def stats(self) -> dict:
+        return {
+            "pending": len(self._pending),
+            "touches": self.touches,
+            "flushes": self.flushes,
+            "flushed": self.flushed,
+            "coalesced": self.touches - self.dropped - self.flushed - len(self._pending),
+            "failures": self.failures,
+            "dropped": self.dropped,
+            "last_flush_ms": round(self.last_flush_ms, 2) if self.last_flush_ms is not None else None,
+            "max_flush_ms": round(self.max_flush_ms, 2),
+        }
+
+# Global session activity buffer
+session_activity = SessionActivityBuffer(
+    flush_interval=settings.SESSION_ACTIVITY_FLUSH_SECONDS,
+    max_pending=settings.SESSION_ACTIVITY_MAX_PENDING
+)
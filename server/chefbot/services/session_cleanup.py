@@ -0,0 +1,109 @@
+"""Periodic expired-session cleanup, coordinated across workers"""
+import asyncio
+import logging
+import os
+import socket
+import time
+import uuid
+from typing import Optional
+from chefbot.services.http_client import get_supabase_client
+from chefbot.services.session_service import SessionService
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+class SessionCleanupScheduler:
+    """Runs ``SessionService.cleanup_expired_sessions`` every ``interval`` seconds.
+
+    Every worker runs the loop, but a run only proceeds while this worker
+    holds the ``session_cleanup`` lease row (``acquire_maintenance_lease``).
+    The lease lasts one interval and is renewed before every chunk, so
+    there is at most one cleanup per interval across all workers, and the
+    lease is picked up by another worker if the holder dies.
+    """
+
+    LEASE_NAME = "session_cleanup"
+
+    def __init__(self, interval: float, chunk_size: int, retention_days: int):
+        self.interval = interval
+        self.chunk_size = chunk_size
+        self.retention_days = retention_days
+        self.holder = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._task: Optional[asyncio.Task] = None
+        self.runs = 0
+        self.skipped = 0
+        self.failures = 0
+        self.deactivated = 0
+        self.deleted = 0
+        self.last_run: Optional[dict] = None
+
+    async def _acquire_lease(self) -> bool:
+        response = await get_supabase_client().post(
+            "/rpc/acquire_maintenance_lease",
+            json={"p_name": self.LEASE_NAME, "p_holder": self.holder, "p_ttl_seconds": max(int(self.interval), 1)}
+        )
+        if response.status_code != 200:
+            raise RuntimeError(f"lease request failed: {response.status_code} - {response.text[:200]}")
+        return response.json() is True
+
+    async def run_once(self) -> Optional[dict]:
+        """One cleanup run; returns its report, or None if another worker holds the lease"""
+        if not await self._acquire_lease():
+            self.skipped += 1
+            return None
+        start = time.perf_counter()
+        report = await SessionService.cleanup_expired_sessions(
+            chunk_size=self.chunk_size,
+            retention_days=self.retention_days,
+            should_continue=self._acquire_lease
+        )
+        report["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 2)
+        self.runs += 1
+        self.deactivated += report["deactivated"]
+        self.deleted += report["deleted"]
+        self.last_run = {**report, "finished_at": time.time()}
+        logger.info("Session cleanup finished" if report["complete"] else "Session cleanup stopped early (lease lost)",
+                    extra={key: report[key] for key in ("deactivated", "deleted", "chunks", "elapsed_ms")})
+        return report
+
+    async def _loop(self):
+        while True:
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                self.failures += 1
+                logger.exception("Failed to cleanup expired sessions")
+            await asyncio.sleep(self.interval)
+
+    # ===== LIFECYCLE =====
+    async def start(self):
+        """Start the loop; the first run happens right away"""
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "holder": self.holder,
+            "interval_seconds": self.interval,
+            "chunk_size": self.chunk_size,
+            "runs": self.runs,
+            "skipped": self.skipped,
+            "failures": self.failures,
+            "deactivated": self.deactivated,
+            "deleted": self.deleted,
+            "last_run": self.last_run,
+        }
+
+# Global session cleanup scheduler
+session_cleanup = SessionCleanupScheduler(
+    interval=settings.SESSION_CLEANUP_INTERVAL_SECONDS,
+    chunk_size=settings.SESSION_CLEANUP_CHUNK_SIZE,
+    retention_days=settings.SESSION_CLEANUP_RETENTION_DAYS
+)
@@ -1,126 +1,96 @@
 """Session management service"""
 import hashlib
+import logging
 from datetime import datetime, timedelta, timezone
-from typing import Optional
-import httpx
+from typing import Awaitable, Callable, Optional
+from chefbot.services.http_client import get_supabase_client
+from chefbot.services.repository import RepositoryError, repository
 from fastapi import HTTPException
 from config.settings import settings
 from chefbot.utils.auth import hash_token
 
+logger = logging.getLogger(__name__)
+
 class SessionService:
     """Service for managing user sessions"""
     
     @staticmethod
-    async def create_user_session(user_id: str, device_id: str, device_info: dict, refresh_token: str) -> dict:
-        """Create a new user session and invalidate previous ones"""
-        async with httpx.AsyncClient() as client:
-            # First, invalidate all existing sessions for this user (one device policy)
-            await client.patch(
-                f"{settings.SUPABASE_URL}/rest/v1/user_sessions?user_id=eq.{user_id}",
-                headers=settings.SUPABASE_HEADERS,
-                json={"is_active": False}
+    async def start_user_session(user_id: str, device_id: str, device_info: dict, refresh_token: str,
+                                 enforce_single_device: bool = True) -> bool:
+        """Check the one-device policy and create the session in one round trip.
+
+        Returns False if another device holds the active session.
+        """
+        try:
+            result = await repository.start_session(
+                user_id, device_id, device_info, hash_token(refresh_token),
+                datetime.now(timezone.utc) + timedelta(days=settings.JWT_REFRESH_TOKEN_EXPIRE_DAYS),
+                enforce_single_device
             )
-            
-            # Create new session
-            session_data = {
-                "user_id": user_id,
-                "device_id": device_id,
-                "device_info": device_info,
-                "refresh_token_hash": hash_token(refresh_token),
-                "is_active": True,
-                "expires_at": (datetime.utcnow() + timedelta(days=settings.JWT_REFRESH_TOKEN_EXPIRE_DAYS)).isoformat()
-            }
-            
-            # Use UPSERT (INSERT ... ON CONFLICT DO UPDATE)
-            response = await client.post(
-                f"{settings.SUPABASE_URL}/rest/v1/user_sessions",
-                headers={**settings.SUPABASE_HEADERS, "Prefer": "resolution=merge-duplicates"},
-                json=session_data
+        except RepositoryError as e:
+            logger.error("Failed to create session: %s", e, extra={"user_id": user_id})
+            raise HTTPException(status_code=500, detail="Failed to create session")
+        return result == "ok"
+
+    @staticmethod
+    async def rotate_user_session(user_id: str, device_id: str, old_refresh_token: str, new_refresh_token: str) -> Optional[dict]:
+        """Validate the old refresh token's session and swap in the new one in one round trip.
+
+        Returns ``{"device_id", "email", "plan"}``, or None if the session is missing or inactive.
+        """
+        try:
+            return await repository.rotate_session(
+                user_id, device_id, hash_token(old_refresh_token), hash_token(new_refresh_token),
+                datetime.now(timezone.utc) + timedelta(days=settings.JWT_REFRESH_TOKEN_EXPIRE_DAYS)
             )
-            
-            if response.status_code not in [200, 201]:
-                print(f"Failed to create session: {response.status_code} - {response.text}")
-                raise HTTPException(status_code=500, detail="Failed to create session")
-            
-            # Handle empty response for successful creation
-            try:
-                return response.json() if response.text else {"status": "created"}
-            except Exception as json_error:
-                print(f"Session created but couldn't parse response: {json_error}")
-                return {"status": "created"}
-    
+        except RepositoryError as e:
+            logger.error("Failed to rotate session: %s", e, extra={"user_id": user_id})
+            raise HTTPException(status_code=500, detail="Failed to refresh session")
+
     @staticmethod
     async def invalidate_user_session(user_id: str, refresh_token: str):
         """Invalidate a specific user session"""
         try:
-            # Hash the refresh token for database lookup
-            token_hash = hash_token(refresh_token)
-            
-            async with httpx.AsyncClient() as client:
-                # Mark session as inactive
-                await client.patch(
-                    f"{settings.SUPABASE_URL}/rest/v1/user_sessions?user_id=eq.{user_id}&refresh_token_hash=eq.{token_hash}",
-                    headers=settings.SUPABASE_HEADERS,
-                    json={
-                        "is_active": False,
-                        "last_activity": datetime.utcnow().isoformat()
-                    }
-                )
-                
+            # Mark session as inactive
+            await repository.deactivate_session(user_id, hash_token(refresh_token), datetime.now(timezone.utc))
+
         except Exception as e:
-            print(f"Error invalidating session: {str(e)}")
+            logger.warning("Error invalidating session: %s", e, extra={"user_id": user_id})
             # Don't raise exception - logout should succeed even if session cleanup fails
     
     @staticmethod
-    async def validate_user_session(user_id: str, refresh_token: str) -> dict:
-        """Validate if user session is active and return session info"""
-        try:
-            # Hash the refresh token for database lookup
-            token_hash = hash_token(refresh_token)
-            
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"{settings.SUPABASE_URL}/rest/v1/user_sessions?user_id=eq.{user_id}&refresh_token_hash=eq.{token_hash}&is_active=eq.true",
-                    headers=settings.SUPABASE_HEADERS
-                )
-                
-                if response.status_code == 200 and response.json():
-                    session = response.json()[0]
-                    # Update last_activity
-                    await client.patch(
-                        f"{settings.SUPABASE_URL}/rest/v1/user_sessions?id=eq.{session['id']}",
-                        headers=settings.SUPABASE_HEADERS,
-                        json={"last_activity": datetime.utcnow().isoformat()}
-                    )
-                    
-                    return session
-                else:
-                    raise HTTPException(status_code=401, detail="Session not found or inactive")
-                    
-        except Exception as e:
-            print(f"Error validating user session: {str(e)}")
-            raise HTTPException(status_code=401, detail="Session validation failed")
-    
-    @staticmethod
-    async def cleanup_expired_sessions() -> int:
-        """Clean up expired sessions"""
-        try:
-            async with httpx.AsyncClient() as client:
-                # Mark expired sessions as inactive
-                await client.patch(
-                    f"{settings.SUPABASE_URL}/rest/v1/user_sessions?expires_at=lt.{datetime.utcnow().isoformat()}&is_active=eq.true",
-                    headers=settings.SUPABASE_HEADERS,
-                    json={"is_active": False}
-                )
-                
-                # Delete old inactive sessions (older than 30 days)
-                await client.delete(
-                    f"{settings.SUPABASE_URL}/rest/v1/user_sessions?expires_at=lt.{(datetime.utcnow() - timedelta(days=30)).isoformat()}",
-                    headers=settings.SUPABASE_HEADERS
-                )
-                
-                return 1  # Return success indicator
-                
-        except Exception as e:
-            print(f"Error cleaning up sessions: {str(e)}")
-            return 0
+    async def cleanup_expired_sessions(chunk_size: int = 500, retention_days: int = 30,
+                                       should_continue: Optional[Callable[[], Awaitable[bool]]] = None) -> dict:
+        """Deactivate expired sessions and delete long-expired ones in keyset chunks.
+
+        ``should_continue`` is awaited before every chunk (e.g. to renew a
+        lease); returning False stops the run early.
+        """
+        now = datetime.now(timezone.utc)
+        report = {"deactivated": 0, "deleted": 0, "chunks": 0, "complete": False}
+        passes = [
+            ("deactivated", "/rpc/deactivate_expired_sessions", now),
+            ("deleted", "/rpc/delete_expired_sessions", now - timedelta(days=retention_days)),
+        ]
+        client = get_supabase_client()
+        for key, path, before in passes:
+            cursor_expires_at, cursor_id = None, None
+            while True:
+                if should_continue is not None and not await should_continue():
+                    return report
+                response = await client.post(path, json={
+                    "p_before": before.isoformat(),
+                    "p_after_expires_at": cursor_expires_at,
+                    "p_after_id": cursor_id,
+                    "p_limit": chunk_size
+                })
+                if response.status_code != 200:
+                    raise RuntimeError(f"{path} failed: {response.status_code} - {response.text[:200]}")
+                chunk = response.json()[0]
+                report["chunks"] += 1
+                report[key] += chunk["processed"]
+                if chunk["processed"] < chunk_size:
+                    break
+                cursor_expires_at, cursor_id = chunk["last_expires_at"], chunk["last_id"]
+        report["complete"] = True
+        return report
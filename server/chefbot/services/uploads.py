@@ -0,0 +1,263 @@
+"""Streaming, size-bounded multipart upload reader for the analysis endpoints.
+
+The request body is fed through python-multipart chunk by chunk as it
+arrives, rather than parsed up front by FastAPI's ``File()``/``Form()``:
+
+- a ``Content-Length`` over the cap is rejected before any of the body is read
+- each image part is sniffed from its first bytes. JPEG, PNG, WebP and
+  HEIC/HEIF are accepted, and so are GIF, BMP and TIFF, which the image
+  pipeline converts to JPEG. Anything else is rejected (skipped, for
+  batches) without reading the rest of it, whatever its Content-Type says;
+  so is an empty part
+- a part growing past ``UPLOAD_MAX_MB`` aborts the request with 413
+- image bytes go into a ``SpooledTemporaryFile`` that moves to disk past
+  ``UPLOAD_SPOOL_MAX_BYTES``, so a slow upload holds at most that much memory
+- the image's sha256 (for the analysis cache key) is computed as the chunks
+  arrive, so the image is never needed as a single bytes object
+"""
+import asyncio
+import hashlib
+import logging
+from dataclasses import dataclass, field
+from tempfile import SpooledTemporaryFile
+from typing import Dict, List, Optional
+from fastapi import HTTPException, Request
+from multipart import MultipartParser
+from multipart.exceptions import MultipartParseError
+from multipart.multipart import parse_options_header
+from chefbot.services import metrics
+from chefbot.services.image_pipeline import CONVERTED_MIME_TYPES, SUPPORTED_MIME_TYPES, sniff_mime_type
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Bytes needed to recognise every format sniff_mime_type knows
+SNIFF_BYTES = 12
+# Room for the multipart boundaries, part headers and text fields
+FORM_OVERHEAD_BYTES = 64 * 1024
+
+UNSUPPORTED_IMAGE = "Only image uploads are supported."
+EMPTY_IMAGE = "The uploaded image is empty."
+
+@dataclass
+class ImageUpload:
+    """One uploaded image, spooled to memory or disk"""
+    filename: Optional[str]
+    content_type: Optional[str]
+    spool: Optional[SpooledTemporaryFile] = None
+    mime_type: Optional[str] = None
+    size: int = 0
+    sha256: bytes = b""
+    error: Optional[str] = None
+    _head: bytes = b""
+    _digest: Optional["hashlib._Hash"] = None
+
+    def read_bytes(self) -> bytes:
+        """The whole image; blocks on disk I/O once spooled, so call it off the loop"""
+        self.spool.seek(0)
+        data = self.spool.read()
+        self.spool.seek(0)
+        return data
+
+    def close(self):
+        if self.spool is not None:
+            self.spool.close()
+            self.spool = None
+
+@dataclass
+class UploadForm:
+    """The image parts and text fields of one analysis request"""
+    files: List[ImageUpload] = field(default_factory=list)
+    fields: Dict[str, str] = field(default_factory=dict)
+    bytes_read: int = 0
+
+    def close(self):
+        for upload in self.files:
+            upload.close()
+
+def check_upload_headers(request: Request, max_files: int = 1):
+    """Reject an upload from its headers alone (before the body is read)"""
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or not params.get(b"boundary"):
+        raise HTTPException(status_code=415, detail="Expected a multipart/form-data upload.")
+    length = request.headers.get("content-length")
+    if length and length.isdigit() and int(length) > max_files * settings.UPLOAD_MAX_BYTES + FORM_OVERHEAD_BYTES:
+        metrics.uploads_rejected.inc("too_large")
+        raise HTTPException(status_code=413, detail=f"Image too large (max {settings.UPLOAD_MAX_MB} MB).")
+
+class _UploadReader:
+    """python-multipart callbacks queue events; ``apply`` handles them after each chunk"""
+
+    def __init__(self, file_field: str, max_files: int, reject_invalid: bool):
+        self.file_field = file_field
+        self.max_files = max_files
+        self.reject_invalid = reject_invalid
+        self.form = UploadForm()
+        self._events: List[tuple] = []
+        self._header_field = b""
+        self._header_value = b""
+        self._headers: Dict[bytes, bytes] = {}
+        self._current: Optional[ImageUpload] = None
+        self._field_name: Optional[str] = None
+        self._field_data = bytearray()
+        self._field_count = 0
+
+    # ----- python-multipart callbacks (event collection only) -----
+    def on_part_begin(self):
+        self._headers = {}
+
+    def on_header_field(self, data: bytes, start: int, end: int):
+        self._header_field += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int):
+        self._header_value += data[start:end]
+
+    def on_header_end(self):
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field = self._header_value = b""
+
+    def on_headers_finished(self):
+        self._events.append(("begin", dict(self._headers)))
+
+    def on_part_data(self, data: bytes, start: int, end: int):
+        self._events.append(("data", data[start:end]))
+
+    def on_part_end(self):
+        self._events.append(("end", None))
+
+    # ----- event handling -----
+    def _begin(self, headers: Dict[bytes, bytes]):
+        _, options = parse_options_header(headers.get(b"content-disposition", b""))
+        name = options.get(b"name", b"").decode("latin-1")
+        if b"filename" not in options:
+            self._field_count += 1
+            if self._field_count > settings.UPLOAD_MAX_FIELDS:
+                raise HTTPException(status_code=400, detail="Too many form fields.")
+            self._field_name = name
+            self._field_data = bytearray()
+            return
+        if name != self.file_field:
+            raise HTTPException(status_code=400, detail=f"Unexpected file field '{name}'.")
+        if len(self.form.files) >= self.max_files:
+            detail = "Only one image per request." if self.max_files == 1 else f"At most {self.max_files} images per batch."
+            raise HTTPException(status_code=400, detail=detail)
+        content_type = headers.get(b"content-type")
+        self._current = ImageUpload(
+            filename=options[b"filename"].decode("utf-8", "replace") or None,
+            content_type=content_type.decode("latin-1") if content_type else None,
+            _digest=hashlib.sha256(),
+        )
+        self.form.files.append(self._current)
+
+    def _reject(self, upload: ImageUpload, reason: str, detail: str):
+        metrics.uploads_rejected.inc(reason)
+        if self.reject_invalid:
+            raise HTTPException(status_code=400, detail=detail)
+        upload.error = detail
+
+    def _sniff(self, upload: ImageUpload) -> bool:
+        """Resolve the real mime type from the first bytes; False for an unsupported format"""
+        mime_type = sniff_mime_type(upload._head)
+        if mime_type in SUPPORTED_MIME_TYPES or mime_type in CONVERTED_MIME_TYPES:
+            upload.mime_type = mime_type
+            upload.spool = SpooledTemporaryFile(max_size=settings.UPLOAD_SPOOL_MAX_BYTES)
+            return True
+        self._reject(upload, "not_image", UNSUPPORTED_IMAGE)
+        return False
+
+    async def _write(self, upload: ImageUpload, data: bytes):
+        upload.size += len(data)
+        if upload.size > settings.UPLOAD_MAX_BYTES:
+            metrics.uploads_rejected.inc("too_large")
+            raise HTTPException(status_code=413, detail=f"Image too large (max {settings.UPLOAD_MAX_MB} MB).")
+        if upload.error:
+            return  # a batch image that isn't one: count it, don't keep it
+        if upload.spool is None:
+            upload._head += data
+            if len(upload._head) < SNIFF_BYTES:
+                return
+            data, upload._head = upload._head, upload._head[:SNIFF_BYTES]
+            if not self._sniff(upload):
+                return
+        upload._digest.update(data)
+        # The spool now holds upload.size bytes; writes past its in-memory
+        # size (including the one that spills it to disk) are disk I/O
+        if upload.size > settings.UPLOAD_SPOOL_MAX_BYTES:
+            await asyncio.to_thread(upload.spool.write, data)
+        else:
+            upload.spool.write(data)
+
+    def _end_file(self, upload: ImageUpload):
+        if upload.size == 0:
+            self._reject(upload, "empty", EMPTY_IMAGE)
+        elif upload.spool is None and not upload.error:
+            # Shorter than SNIFF_BYTES: sniff whatever arrived
+            head = upload._head
+            if self._sniff(upload):
+                upload._digest.update(head)
+                upload.spool.write(head)
+        if upload.spool is not None:
+            upload.spool.seek(0)
+        upload.sha256 = upload._digest.digest()
+        upload._digest = None
+
+    async def apply(self):
+        events, self._events = self._events, []
+        for kind, value in events:
+            if kind == "begin":
+                self._begin(value)
+            elif kind == "data":
+                if self._current is not None:
+                    await self._write(self._current, value)
+                else:
+                    self._field_data += value
+                    if len(self._field_data) > settings.UPLOAD_MAX_FIELD_BYTES:
+                        raise HTTPException(status_code=413, detail=f"Form field '{self._field_name}' is too large.")
+            elif self._current is not None:
+                self._end_file(self._current)
+                self._current = None
+            elif self._field_name is not None:
+                self.form.fields[self._field_name] = self._field_data.decode("utf-8", "replace")
+                self._field_name = None
+
+async def read_upload(request: Request, file_field: str = "file", max_files: int = 1,
+                      reject_invalid: bool = True) -> UploadForm:
+    """Stream a multipart analysis upload into spooled image buffers.
+
+    Raises 413 as soon as an image passes ``UPLOAD_MAX_MB`` and, with
+    ``reject_invalid``, 400 as soon as a part's first bytes show it isn't an
+    image. Otherwise non-images are kept as ``ImageUpload``s with ``error`` set.
+    Callers run ``check_upload_headers`` first, before any other checks.
+    """
+    _, params = parse_options_header(request.headers.get("content-type", ""))
+    if not params.get(b"boundary"):
+        raise HTTPException(status_code=415, detail="Expected a multipart/form-data upload.")
+    reader = _UploadReader(file_field, max_files, reject_invalid)
+    parser = MultipartParser(params[b"boundary"], {
+        "on_part_begin": reader.on_part_begin,
+        "on_part_data": reader.on_part_data,
+        "on_part_end": reader.on_part_end,
+        "on_header_field": reader.on_header_field,
+        "on_header_value": reader.on_header_value,
+        "on_header_end": reader.on_header_end,
+        "on_headers_finished": reader.on_headers_finished,
+    })
+    form = reader.form
+    try:
+        async for chunk in request.stream():
+            form.bytes_read += len(chunk)
+            parser.write(chunk)
+            await reader.apply()
+        parser.finalize()
+        await reader.apply()
+        if reader._current is not None:
+            raise HTTPException(status_code=400, detail="Upload ended mid-file.")
+    except MultipartParseError as e:
+        form.close()
+        logger.info("Malformed upload: %s", e)
+        raise HTTPException(status_code=400, detail="Malformed multipart upload.")
+    except BaseException:
+        form.close()
+        raise
+    metrics.upload_bytes.observe(form.bytes_read)
+    return form
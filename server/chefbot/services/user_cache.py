@@ -0,0 +1,92 @@
+"""Short-lived in-process cache of user records"""
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+from config.settings import settings
+
+UserLoader = Callable[[], Awaitable[Optional[dict]]]
+
+class UserCache:
+    """Bounded LRU of user rows with a short TTL and single-flight loading.
+
+    Concurrent misses for the same user share one fetch. Callers always get
+    a copy, so request handlers can mutate their user dict freely. Code that
+    changes a user row must call ``invalidate`` (or ``update``); other worker
+    processes see the change once their entry expires.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[float, dict]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._versions: Dict[str, int] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    async def get(self, user_id: str, loader: UserLoader) -> Optional[dict]:
+        """Cached user row, loading it with ``loader`` on a miss"""
+        user_id = str(user_id)
+        entry = self._entries.get(user_id)
+        if entry is not None:
+            expires_at, user = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return dict(user)
+            del self._entries[user_id]
+
+        task = self._inflight.get(user_id)
+        if task is None:
+            self.misses += 1
+            task = asyncio.create_task(self._load(user_id, loader))
+            self._inflight[user_id] = task
+            task.add_done_callback(lambda _: self._inflight.pop(user_id, None))
+        else:
+            self.coalesced += 1
+        # Shielded so one cancelled request doesn't cancel the fetch for the others
+        user = await asyncio.shield(task)
+        return dict(user) if user is not None else None
+
+    async def _load(self, user_id: str, loader: UserLoader) -> Optional[dict]:
+        version = self._versions.get(user_id, 0)
+        user = await loader()
+        # Don't cache a row that was invalidated while we were fetching it
+        if user is not None and self._versions.get(user_id, 0) == version:
+            self._entries[user_id] = (time.monotonic() + self.ttl_seconds, user)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return user
+
+    def update(self, user_id: str, fields: dict):
+        """Apply fields we just wrote to the database to the cached row"""
+        entry = self._entries.get(str(user_id))
+        if entry is not None:
+            entry[1].update(fields)
+
+    def invalidate(self, user_id: str):
+        """Drop a user's cached row (call after changing it in the database)"""
+        user_id = str(user_id)
+        self._entries.pop(user_id, None)
+        self._versions[user_id] = self._versions.get(user_id, 0) + 1
+        if len(self._versions) > self.max_entries:
+            # Versions only matter while a load is in flight
+            self._versions = {key: value for key, value in self._versions.items() if key in self._inflight}
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses + self.coalesced
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_rate": round((self.hits + self.coalesced) / total, 3) if total else 0.0,
+        }
+
+# Global user cache instance
+user_cache = UserCache(max_entries=settings.USER_CACHE_MAX_ENTRIES, ttl_seconds=settings.USER_CACHE_TTL_SECONDS)
@@ -1,8 +1,13 @@
 """Authentication utilities and JWT token management"""
+import asyncio
 import hashlib
+import heapq
+import time
 import jwt
+from collections import OrderedDict
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Tuple
 from passlib.context import CryptContext
 from passlib.exc import UnknownHashError
 from config.settings import settings
@@ -21,6 +26,71 @@ except Exception as e:
     pwd_context = None
     BCRYPT_AVAILABLE = False
 
+# Rounds used for new hashes (None = passlib's default until calibrated)
+bcrypt_rounds: Optional[int] = None
+
+def configure_password_hashing(rounds: Optional[int]):
+    """Hash with ``rounds``; stored hashes below ``rounds`` count as outdated and are upgraded.
+
+    There is no upper bound, so a stronger stored hash (from an earlier
+    calibration or another worker) is never rehashed down to ``rounds``.
+    ``BCRYPT_MIN_ROUNDS`` is a safety floor for pinned or calibrated values.
+    """
+    global pwd_context, bcrypt_rounds
+    if not BCRYPT_AVAILABLE or rounds is None:
+        return
+    rounds = max(rounds, settings.BCRYPT_MIN_ROUNDS)
+    pwd_context = CryptContext(
+        schemes=["bcrypt"],
+        deprecated="auto",
+        bcrypt__default_rounds=rounds,
+        bcrypt__min_rounds=rounds,
+    )
+    bcrypt_rounds = rounds
+
+def measure_bcrypt_rounds(target_ms: float, min_rounds: int, max_rounds: int) -> Tuple[int, float]:
+    """Highest rounds whose hash time fits ``target_ms`` on this host, with the estimated ms"""
+    from passlib.hash import bcrypt as bcrypt_handler
+    handler = bcrypt_handler.using(rounds=min_rounds)
+    samples = []
+    for _ in range(3):
+        start = time.perf_counter()
+        handler.hash("calibration")
+        samples.append((time.perf_counter() - start) * 1000)
+    base_ms = min(samples)
+    # Each extra round doubles the cost
+    rounds = min_rounds
+    while rounds < max_rounds and base_ms * 2 ** (rounds + 1 - min_rounds) <= target_ms:
+        rounds += 1
+    return rounds, base_ms * 2 ** (rounds - min_rounds)
+
+async def calibrate_password_hashing() -> Optional[int]:
+    """Pick bcrypt rounds for this host at startup (BCRYPT_ROUNDS pins them instead)"""
+    if not BCRYPT_AVAILABLE:
+        return None
+    if settings.BCRYPT_ROUNDS > 0:
+        rounds = settings.BCRYPT_ROUNDS
+        logger.info("bcrypt rounds pinned", extra={"rounds": rounds})
+    else:
+        rounds, estimated_ms = await asyncio.to_thread(
+            measure_bcrypt_rounds, settings.BCRYPT_TARGET_MS, settings.BCRYPT_MIN_ROUNDS, settings.BCRYPT_MAX_ROUNDS
+        )
+        logger.info("bcrypt rounds calibrated", extra={"rounds": rounds, "hash_ms": round(estimated_ms),
+                                                      "budget_ms": settings.BCRYPT_TARGET_MS})
+    configure_password_hashing(rounds)
+    # Process workers pick up the rounds when they start
+    shutdown_password_executor()
+    return rounds
+
+def password_needs_rehash(hashed_password: str) -> bool:
+    """True if a verified hash should be replaced: legacy format or outdated bcrypt rounds"""
+    if not (BCRYPT_AVAILABLE and pwd_context):
+        return False
+    try:
+        return pwd_context.needs_update(hashed_password)
+    except ValueError:
+        return True  # sha256$ fallback and unsalted MD5/SHA-1/SHA-256
+
 def hash_password(password: str) -> str:
     """Hash a password using bcrypt or fallback method"""
     try:
@@ -75,6 +145,41 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
         logger.error(f"❌ Password verification error: {e}")
         return False
 
+# bcrypt is CPU-bound; run it in a dedicated pool so logins don't stall the event loop
+_password_executor: Optional[Executor] = None
+
+def _get_password_executor() -> Executor:
+    global _password_executor
+    if _password_executor is None:
+        if settings.PASSWORD_HASH_EXECUTOR == "process":
+            _password_executor = ProcessPoolExecutor(
+                max_workers=settings.PASSWORD_HASH_WORKERS,
+                initializer=configure_password_hashing,
+                initargs=(bcrypt_rounds,)
+            )
+        else:
+            # bcrypt releases the GIL while hashing, so threads scale across cores
+            _password_executor = ThreadPoolExecutor(
+                max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash"
+            )
+    return _password_executor
+
+async def hash_password_async(password: str) -> str:
+    """hash_password in the password executor"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_password_executor(), hash_password, password)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """verify_password in the password executor"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_password_executor(), verify_password, plain_password, hashed_password)
+
+def shutdown_password_executor():
+    global _password_executor
+    if _password_executor is not None:
+        _password_executor.shutdown(wait=False, cancel_futures=True)
+        _password_executor = None
+
 def hash_token(token: str) -> str:
     """Hash a token for secure storage"""
     return hashlib.sha256(token.encode()).hexdigest()
@@ -107,15 +212,82 @@ def create_token_pair(user_id: str, device_id: str) -> Dict[str, str]:
         "refresh_token": refresh_token
     }
 
+class VerifiedTokenCache:
+    """Payloads of tokens that already passed signature and claim checks.
+
+    Keyed by a SHA-256 digest of the token, so raw tokens aren't kept in
+    memory. An entry is never served at or after the token's ``exp`` and is
+    dropped from memory once that time passes; tokens without ``exp`` are not
+    cached. Bounded LRU.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[bytes, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._expiry_heap: List[Tuple[float, bytes]] = []
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token: str) -> Optional[Dict[str, Any]]:
+        key = self._key(token)
+        entry = self._entries.get(key)
+        if entry is None or entry[0] <= time.time():
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return dict(entry[1])  # callers may mutate the payload; the cached one stays intact
+
+    def set(self, token: str, payload: Dict[str, Any]):
+        exp = payload.get("exp")
+        if not isinstance(exp, (int, float)) or self.max_entries <= 0:
+            return
+        key = self._key(token)
+        self._entries[key] = (float(exp), dict(payload))
+        self._entries.move_to_end(key)
+        heapq.heappush(self._expiry_heap, (float(exp), key))
+        self._evict()
+
+    def _evict(self):
+        now = time.time()
+        heap = self._expiry_heap
+        while heap and heap[0][0] <= now:
+            exp, key = heapq.heappop(heap)
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == exp:
+                del self._entries[key]
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        # LRU evictions leave stale heap items behind; rebuild when they dominate
+        if len(heap) > 2 * self.max_entries:
+            self._expiry_heap = [(entry[0], key) for key, entry in self._entries.items()]
+            heapq.heapify(self._expiry_heap)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+verified_tokens = VerifiedTokenCache(max_entries=settings.JWT_CACHE_MAX_ENTRIES)
+
 def verify_token(token: str, required_type: str = "access") -> str:
     """Verify JWT token and return user_id"""
+    return verify_token_payload(token, required_type).get("user_id")
+
+def verify_token_payload(token: str, required_type: str = "access") -> Dict[str, Any]:
+    """Verify JWT token and return its payload"""
     try:
-        payload = jwt.decode(token, settings.JWT_SECRET, algorithms=["HS256"])
+        payload = verified_tokens.get(token)
+        if payload is None:
+            payload = jwt.decode(token, settings.JWT_SECRET, algorithms=["HS256"])
+            verified_tokens.set(token, payload)
         
         if payload.get("type") != required_type:
             raise jwt.InvalidTokenError(f"Token type mismatch. Expected {required_type}")
         
-        return payload.get("user_id")
+        return payload
     except jwt.ExpiredSignatureError:
         raise jwt.ExpiredSignatureError("Token has expired")
     except jwt.InvalidTokenError as e:
@@ -0,0 +1,180 @@
+"""Structured logging: JSON lines written by a background thread, request ids and timing spans.
+
+Log calls only put the record on a queue; a ``QueueListener`` thread
+formats it and writes to stdout, so the event loop never blocks on I/O.
+The request id and the current request's trace live in contextvars. Tasks
+spawned inside a request (``asyncio.gather``, streaming responses) inherit
+them. ``span("gemini")`` records a nested timing into the trace, and the
+middleware logs the whole trace as one ``request`` line when the response
+is finished.
+"""
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Iterator, List, Optional
+
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+_trace_var: ContextVar[Optional["Trace"]] = ContextVar("trace", default=None)
+_span_var: ContextVar[Optional[str]] = ContextVar("span", default=None)
+
+# LogRecord attributes that aren't user-supplied ``extra`` fields
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "request_id"}
+
+# Third-party loggers kept at WARNING; upstream calls are covered by /metrics and spans
+QUIET_LOGGERS = ("httpx", "httpcore", "hpack")
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_handler: Optional[logging.Handler] = None
+
+class Trace:
+    """Timing spans and fields collected over one request (or background job)"""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.spans: List[dict] = []
+        self.fields: dict = {}
+
+    def add_span(self, name: str, parent: Optional[str], start: float, end: float, fields: dict):
+        entry = {"span": name, "at_ms": round((start - self.start) * 1000, 1), "ms": round((end - start) * 1000, 1)}
+        if parent:
+            entry["parent"] = parent
+        entry.update(fields)
+        self.spans.append(entry)
+
+    def timeline(self) -> List[dict]:
+        """Spans in start order (they are recorded as they finish, children first)"""
+        return sorted(self.spans, key=lambda entry: entry["at_ms"])
+
+    def elapsed_ms(self) -> float:
+        return round((time.perf_counter() - self.start) * 1000, 1)
+
+@contextmanager
+def trace(request_id: Optional[str] = None) -> Iterator[Trace]:
+    """Bind a request id and a fresh trace to the current context"""
+    current = Trace()
+    id_token = request_id_var.set(request_id or uuid.uuid4().hex)
+    trace_token = _trace_var.set(current)
+    span_token = _span_var.set(None)
+    try:
+        yield current
+    finally:
+        _span_var.reset(span_token)
+        _trace_var.reset(trace_token)
+        request_id_var.reset(id_token)
+
+@contextmanager
+def span(name: str, **fields):
+    """Time a stage of the current request; nests under the enclosing span.
+
+    A no-op outside a traced request, so services can use it unconditionally.
+    """
+    current = _trace_var.get()
+    if current is None:
+        yield
+        return
+    parent = _span_var.get()
+    token = _span_var.set(name)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        try:
+            _span_var.reset(token)
+        except ValueError:
+            pass  # async generator finalized in another context
+        current.add_span(name, parent, start, time.perf_counter(), fields)
+
+def annotate(**fields):
+    """Attach fields (user id, cache outcome, ...) to the current request's log line"""
+    current = _trace_var.get()
+    if current is not None:
+        current.fields.update(fields)
+
+class _RequestIdFilter(logging.Filter):
+    """Stamps the request id on the record in the caller's context, before it is queued"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        return True
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """Queues records with args merged and tracebacks rendered, formatting is left to the listener"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line; ``extra`` fields become top-level keys"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        if getattr(record, "request_id", None):
+            entry["request_id"] = record.request_id
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS:
+                entry[key] = value
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+class TextFormatter(logging.Formatter):
+    """Human-readable lines for local development"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = f"{self.formatTime(record, '%H:%M:%S')} {record.levelname:7s} {record.name}: {record.getMessage()}"
+        if getattr(record, "request_id", None):
+            line += f" request_id={record.request_id}"
+        extra = {key: value for key, value in record.__dict__.items() if key not in _RECORD_ATTRS}
+        if extra:
+            line += " " + json.dumps(extra, default=str)
+        if record.exc_text:
+            line += "\n" + record.exc_text
+        return line
+
+def configure_logging(level: str = "INFO", fmt: str = "json"):
+    """Route the root logger through a queue to a stdout writer thread (idempotent)"""
+    global _listener, _handler
+    if _listener is not None:
+        return
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(TextFormatter() if fmt == "text" else JsonFormatter())
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=False)
+    _listener.start()
+
+    _handler = _QueueHandler(log_queue)
+    _handler.addFilter(_RequestIdFilter())
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(_handler)
+    root.setLevel(level.upper())
+    # httpx logs every request at INFO, including the Gemini key in the query string
+    for name in QUIET_LOGGERS:
+        logging.getLogger(name).setLevel(max(logging.WARNING, root.level))
+
+def shutdown_logging():
+    """Drain the queue and stop the writer thread"""
+    global _listener, _handler
+    if _listener is not None:
+        logging.getLogger().removeHandler(_handler)
+        _listener.stop()
+        _listener = _handler = None
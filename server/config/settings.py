@@ -15,6 +15,8 @@ class Settings:
     JWT_SECRET: str = os.getenv("JWT_SECRET")
     JWT_ACCESS_TOKEN_EXPIRE_HOURS: int = 24
     JWT_REFRESH_TOKEN_EXPIRE_DAYS: int = 7
+    # Verified token payloads kept in memory until their exp (0 disables)
+    JWT_CACHE_MAX_ENTRIES: int = int(os.getenv("JWT_CACHE_MAX_ENTRIES", "10000"))
     
     # Google OAuth Configuration
     GOOGLE_CLIENT_ID: str = os.getenv("GOOGLE_CLIENT_ID")
@@ -22,6 +24,16 @@ class Settings:
     # Email Configuration (Resend)
     RESEND_API_KEY: str = os.getenv("RESEND_API_KEY")
     FRONTEND_URL: str = os.getenv("FRONTEND_URL", "https://your-app-domain.com")
+    EMAIL_FROM: str = os.getenv("EMAIL_FROM", "Chef Bot <onboarding@resend.dev>")  # Free Resend domain
+
+    # Email Outbox
+    EMAIL_TRANSPORT: str = os.getenv("EMAIL_TRANSPORT", "auto")  # auto | resend | log
+    EMAIL_API_URL: str = os.getenv("EMAIL_API_URL", "https://api.resend.com")
+    EMAIL_OUTBOX_DB_PATH: str = os.getenv("EMAIL_OUTBOX_DB_PATH", "email_outbox.db")
+    EMAIL_BATCH_SIZE: int = int(os.getenv("EMAIL_BATCH_SIZE", "50"))
+    EMAIL_MAX_ATTEMPTS: int = int(os.getenv("EMAIL_MAX_ATTEMPTS", "6"))
+    EMAIL_RETRY_BASE_SECONDS: float = float(os.getenv("EMAIL_RETRY_BASE_SECONDS", "5"))
+    EMAIL_TIMEOUT_SECONDS: float = float(os.getenv("EMAIL_TIMEOUT_SECONDS", "10"))
     
     # Usage Limits
     FREE_MAX_MONTHLY: int = int(os.getenv("FREE_MAX_MONTHLY", "10"))
@@ -30,7 +42,94 @@ class Settings:
     # Rate Limiting
     RATE_LIMIT_FREE_PER_HOUR: int = int(os.getenv("RATE_LIMIT_FREE_PER_HOUR", "3"))
     RATE_LIMIT_PRO_PER_HOUR: int = int(os.getenv("RATE_LIMIT_PRO_PER_HOUR", "70"))
+    RATE_LIMIT_ENABLED: bool = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+    RATE_LIMIT_WINDOW_SECONDS: float = float(os.getenv("RATE_LIMIT_WINDOW_SECONDS", "3600"))
+    # Empty keeps counters in memory; set a path to share limits between workers on one host
+    RATE_LIMIT_DB_PATH: str = os.getenv("RATE_LIMIT_DB_PATH", "")
+    
+    # Analysis Result Cache
+    ANALYSIS_CACHE_ENABLED: bool = os.getenv("ANALYSIS_CACHE_ENABLED", "true").lower() == "true"
+    ANALYSIS_CACHE_MAX_ENTRIES: int = int(os.getenv("ANALYSIS_CACHE_MAX_ENTRIES", "512"))
+    ANALYSIS_CACHE_TTL_SECONDS: float = float(os.getenv("ANALYSIS_CACHE_TTL_SECONDS", "3600"))
+    ANALYSIS_CACHE_DB_PATH: str = os.getenv("ANALYSIS_CACHE_DB_PATH", "")  # empty = memory only
+    ANALYSIS_CACHE_SKIP_USAGE_ON_HIT: bool = os.getenv("ANALYSIS_CACHE_SKIP_USAGE_ON_HIT", "true").lower() == "true"
+    
+    # Near-Duplicate Image Reuse (perceptual hash)
+    NEAR_DUPLICATE_ENABLED: bool = os.getenv("NEAR_DUPLICATE_ENABLED", "true").lower() == "true"
+    NEAR_DUPLICATE_MAX_DISTANCE: int = int(os.getenv("NEAR_DUPLICATE_MAX_DISTANCE", "8"))  # bits out of 64
+    NEAR_DUPLICATE_WINDOW_SECONDS: float = float(os.getenv("NEAR_DUPLICATE_WINDOW_SECONDS", "900"))
+    NEAR_DUPLICATE_MAX_ENTRIES: int = int(os.getenv("NEAR_DUPLICATE_MAX_ENTRIES", "200000"))
+    
+    # Image Normalization (before upload to Gemini)
+    IMAGE_MAX_EDGE: int = int(os.getenv("IMAGE_MAX_EDGE", "1536"))
+    IMAGE_JPEG_QUALITY: int = int(os.getenv("IMAGE_JPEG_QUALITY", "85"))
+    IMAGE_PIPELINE_WORKERS: int = int(os.getenv("IMAGE_PIPELINE_WORKERS", "2"))
+    
+    # Upload Ingestion (streamed into a spooled buffer; over-size uploads get 413 while streaming)
+    UPLOAD_MAX_MB: int = int(os.getenv("UPLOAD_MAX_MB", "15"))  # per image
+    UPLOAD_SPOOL_MAX_BYTES: int = int(os.getenv("UPLOAD_SPOOL_MAX_BYTES", str(1024 * 1024)))  # in memory, then disk
+    UPLOAD_MAX_FIELD_BYTES: int = int(os.getenv("UPLOAD_MAX_FIELD_BYTES", "16384"))  # prompt and other text fields
+    UPLOAD_MAX_FIELDS: int = int(os.getenv("UPLOAD_MAX_FIELDS", "8"))
+
+    @property
+    def UPLOAD_MAX_BYTES(self) -> int:
+        return self.UPLOAD_MAX_MB * 1024 * 1024
+    
+    # Batch Analysis
+    ANALYZE_BATCH_MAX_FILES: int = int(os.getenv("ANALYZE_BATCH_MAX_FILES", "5"))
+    ANALYZE_BATCH_CONCURRENCY: int = int(os.getenv("ANALYZE_BATCH_CONCURRENCY", "4"))
+
+    # Analysis Job Queue
+    JOB_QUEUE_DB_PATH: str = os.getenv("JOB_QUEUE_DB_PATH", "analysis_jobs.db")
+    JOB_QUEUE_WORKERS: int = int(os.getenv("JOB_QUEUE_WORKERS", "2"))
+    JOB_LONG_POLL_MAX_SECONDS: float = float(os.getenv("JOB_LONG_POLL_MAX_SECONDS", "30"))
+    JOB_RETENTION_SECONDS: int = int(os.getenv("JOB_RETENTION_SECONDS", "86400"))
+    # A running job whose process stops renewing its lease for this long is requeued
+    JOB_LEASE_SECONDS: float = float(os.getenv("JOB_LEASE_SECONDS", "120"))
+    JOB_POLL_SECONDS: float = float(os.getenv("JOB_POLL_SECONDS", "2"))
     
+    # User Cache
+    USER_CACHE_ENABLED: bool = os.getenv("USER_CACHE_ENABLED", "true").lower() == "true"
+    USER_CACHE_TTL_SECONDS: float = float(os.getenv("USER_CACHE_TTL_SECONDS", "30"))
+    USER_CACHE_MAX_ENTRIES: int = int(os.getenv("USER_CACHE_MAX_ENTRIES", "10000"))
+
+    # Password Hashing
+    PASSWORD_HASH_EXECUTOR: str = os.getenv("PASSWORD_HASH_EXECUTOR", "thread")  # thread | process
+    PASSWORD_HASH_WORKERS: int = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+    # bcrypt cost: calibrated at startup to fit BCRYPT_TARGET_MS unless BCRYPT_ROUNDS pins it
+    BCRYPT_ROUNDS: int = int(os.getenv("BCRYPT_ROUNDS", "0"))
+    BCRYPT_TARGET_MS: float = float(os.getenv("BCRYPT_TARGET_MS", "250"))
+    BCRYPT_MIN_ROUNDS: int = int(os.getenv("BCRYPT_MIN_ROUNDS", "10"))  # safety floor, below the calibrated value
+    BCRYPT_MAX_ROUNDS: int = int(os.getenv("BCRYPT_MAX_ROUNDS", "14"))
+
+    # Session Activity (last_activity is written behind, in bulk)
+    SESSION_ACTIVITY_ENABLED: bool = os.getenv("SESSION_ACTIVITY_ENABLED", "true").lower() == "true"
+    SESSION_ACTIVITY_FLUSH_SECONDS: float = float(os.getenv("SESSION_ACTIVITY_FLUSH_SECONDS", "30"))
+    SESSION_ACTIVITY_MAX_PENDING: int = int(os.getenv("SESSION_ACTIVITY_MAX_PENDING", "50000"))
+
+    # Session Cleanup (periodic, chunked, one worker at a time via a lease row)
+    SESSION_CLEANUP_ENABLED: bool = os.getenv("SESSION_CLEANUP_ENABLED", "true").lower() == "true"
+    SESSION_CLEANUP_INTERVAL_SECONDS: float = float(os.getenv("SESSION_CLEANUP_INTERVAL_SECONDS", "3600"))
+    SESSION_CLEANUP_CHUNK_SIZE: int = int(os.getenv("SESSION_CLEANUP_CHUNK_SIZE", "500"))
+    SESSION_CLEANUP_RETENTION_DAYS: int = int(os.getenv("SESSION_CLEANUP_RETENTION_DAYS", "30"))
+
+    # Metrics (Prometheus text format on /metrics)
+    METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+
+    # Logging (JSON lines from a background writer thread; "text" for local development)
+    LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
+    LOG_FORMAT: str = os.getenv("LOG_FORMAT", "json")  # json | text
+
+    # Profiling (opt-in; both switchable at runtime via PUT /api/debug/profiler with X-Profile-Token)
+    PROFILER_ENABLED: bool = os.getenv("PROFILER_ENABLED", "false").lower() == "true"
+    PROFILER_SAMPLE_RATE: float = float(os.getenv("PROFILER_SAMPLE_RATE", "0.0"))  # fraction of requests
+    PROFILER_ADMIN_TOKEN: str = os.getenv("PROFILER_ADMIN_TOKEN", "")  # X-Profile-Token value; empty = header off
+    PROFILER_INTERVAL_MS: float = float(os.getenv("PROFILER_INTERVAL_MS", "5"))
+    PROFILER_OUTPUT_DIR: str = os.getenv("PROFILER_OUTPUT_DIR", "profiles")
+    PROFILER_MAX_FILES: int = int(os.getenv("PROFILER_MAX_FILES", "200"))
+    LOOP_MONITOR_ENABLED: bool = os.getenv("LOOP_MONITOR_ENABLED", "false").lower() == "true"
+    LOOP_MONITOR_THRESHOLD_MS: float = float(os.getenv("LOOP_MONITOR_THRESHOLD_MS", "100"))
+
     # Security
     MAX_LOGIN_ATTEMPTS: int = 5
     LOCKOUT_DURATION_MINUTES: int = 15
@@ -39,6 +138,25 @@ class Settings:
     SUPABASE_URL: str = os.getenv("SUPABASE_URL")
     SUPABASE_SERVICE_KEY: str = os.getenv("SUPABASE_SERVICE_KEY")
     
+    # Data Backend: postgrest (Supabase REST) | postgres (direct asyncpg pool, needs DATABASE_URL)
+    DATA_BACKEND: str = os.getenv("DATA_BACKEND", "postgrest")
+    DATABASE_URL: str = os.getenv("DATABASE_URL", "")
+    DATABASE_POOL_MIN_SIZE: int = int(os.getenv("DATABASE_POOL_MIN_SIZE", "1"))
+    DATABASE_POOL_MAX_SIZE: int = int(os.getenv("DATABASE_POOL_MAX_SIZE", "10"))
+    DATABASE_STATEMENT_CACHE_SIZE: int = int(os.getenv("DATABASE_STATEMENT_CACHE_SIZE", "100"))
+    DATABASE_TIMEOUT_SECONDS: float = float(os.getenv("DATABASE_TIMEOUT_SECONDS", "10"))  # pool acquire and per query
+    
+    # Upstream HTTP Clients (connection pools)
+    HTTP2_ENABLED: bool = os.getenv("HTTP2_ENABLED", "false").lower() == "true"
+    HTTP_KEEPALIVE_EXPIRY_SECONDS: float = float(os.getenv("HTTP_KEEPALIVE_EXPIRY_SECONDS", "30.0"))
+    SUPABASE_MAX_CONNECTIONS: int = int(os.getenv("SUPABASE_MAX_CONNECTIONS", "20"))
+    SUPABASE_MAX_KEEPALIVE: int = int(os.getenv("SUPABASE_MAX_KEEPALIVE", "10"))
+    SUPABASE_TIMEOUT_SECONDS: float = float(os.getenv("SUPABASE_TIMEOUT_SECONDS", "5.0"))
+    GEMINI_MAX_CONNECTIONS: int = int(os.getenv("GEMINI_MAX_CONNECTIONS", "10"))
+    GEMINI_MAX_KEEPALIVE: int = int(os.getenv("GEMINI_MAX_KEEPALIVE", "5"))
+    GEMINI_TIMEOUT_SECONDS: float = float(os.getenv("GEMINI_TIMEOUT_SECONDS", "30.0"))
+    GEMINI_API_URL: str = os.getenv("GEMINI_API_URL", "")  # empty = Google's endpoint; set for a local fake
+    
     # API Configuration
     API_TITLE: str = "Chef Bot API"
     API_DESCRIPTION: str = "AI-powered recipe analysis API for mobile applications"
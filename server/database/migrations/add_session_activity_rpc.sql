@@ -0,0 +1,35 @@
+-- Bulk last_activity writes for the API's session activity buffer
+-- Run this in your Supabase SQL Editor
+
+-- touch_user_sessions: apply a batch of buffered (user_id, device_id,
+-- last_activity) entries in one statement. Timestamps never move backwards
+-- and inactive sessions are left alone. Returns the number of sessions updated.
+
+DROP FUNCTION IF EXISTS public.touch_user_sessions(JSONB);
+
+CREATE OR REPLACE FUNCTION public.touch_user_sessions(p_updates JSONB)
+RETURNS INTEGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+    v_updated INTEGER;
+BEGIN
+    UPDATE user_sessions s
+    SET last_activity = GREATEST(COALESCE(s.last_activity, u.last_activity), u.last_activity)
+    FROM jsonb_to_recordset(p_updates) AS u(user_id UUID, device_id TEXT, last_activity TIMESTAMPTZ)
+    WHERE s.user_id = u.user_id
+      AND s.device_id = u.device_id
+      AND s.is_active = true;
+
+    GET DIAGNOSTICS v_updated = ROW_COUNT;
+    RETURN v_updated;
+END;
+$$;
+
+COMMENT ON FUNCTION public.touch_user_sessions(JSONB) IS 'Apply buffered session last_activity timestamps in bulk.';
+
+-- Only the API (service role) may touch sessions
+REVOKE EXECUTE ON FUNCTION public.touch_user_sessions(JSONB) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.touch_user_sessions(JSONB) TO service_role;
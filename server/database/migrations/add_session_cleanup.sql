@@ -0,0 +1,138 @@
+-- Chunked, multi-worker-safe session cleanup
+-- Run this in your Supabase SQL Editor
+
+-- Keyset indexes on (expires_at, id): one over active sessions for the
+-- deactivate pass, one over all sessions for the delete pass
+CREATE INDEX IF NOT EXISTS idx_user_sessions_active_expires ON user_sessions(expires_at, id) WHERE is_active = true;
+CREATE INDEX IF NOT EXISTS idx_user_sessions_expires ON user_sessions(expires_at, id) INCLUDE (is_active);
+
+-- Lease rows for periodic jobs. Advisory locks don't fit here: PostgREST
+-- hands each request a pooled connection, so a session-level lock wouldn't
+-- outlive the call that took it.
+CREATE TABLE IF NOT EXISTS maintenance_leases (
+    name TEXT PRIMARY KEY,
+    holder TEXT NOT NULL,
+    expires_at TIMESTAMP WITH TIME ZONE NOT NULL
+);
+
+ALTER TABLE maintenance_leases ENABLE ROW LEVEL SECURITY;
+
+-- acquire_maintenance_lease: take or renew the named lease for p_ttl_seconds.
+-- Succeeds if nobody holds it, the holder's lease ran out, or p_holder already
+-- holds it.
+
+DROP FUNCTION IF EXISTS public.acquire_maintenance_lease(TEXT, TEXT, INTEGER);
+
+CREATE OR REPLACE FUNCTION public.acquire_maintenance_lease(p_name TEXT, p_holder TEXT, p_ttl_seconds INTEGER)
+RETURNS BOOLEAN
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+BEGIN
+    INSERT INTO maintenance_leases (name, holder, expires_at)
+    VALUES (p_name, p_holder, NOW() + make_interval(secs => p_ttl_seconds))
+    ON CONFLICT (name) DO UPDATE
+    SET holder = EXCLUDED.holder,
+        expires_at = EXCLUDED.expires_at
+    WHERE maintenance_leases.expires_at < NOW() OR maintenance_leases.holder = EXCLUDED.holder;
+
+    RETURN FOUND;
+END;
+$$;
+
+COMMENT ON FUNCTION public.acquire_maintenance_lease(TEXT, TEXT, INTEGER) IS 'Take or renew a named lease so only one API worker runs a periodic job.';
+
+-- deactivate_expired_sessions / delete_expired_sessions: process the next
+-- p_limit sessions after the (p_after_expires_at, p_after_id) cursor, in
+-- (expires_at, id) order. Return how many rows were processed and the new
+-- cursor; processed < p_limit means the range is exhausted.
+
+DROP FUNCTION IF EXISTS public.deactivate_expired_sessions(TIMESTAMPTZ, TIMESTAMPTZ, UUID, INTEGER);
+
+CREATE OR REPLACE FUNCTION public.deactivate_expired_sessions(
+    p_before TIMESTAMPTZ,
+    p_after_expires_at TIMESTAMPTZ,
+    p_after_id UUID,
+    p_limit INTEGER
+)
+RETURNS TABLE (processed INTEGER, last_expires_at TIMESTAMPTZ, last_id UUID)
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+#variable_conflict use_column
+BEGIN
+    RETURN QUERY
+    WITH batch AS (
+        SELECT s.id, s.expires_at
+        FROM user_sessions s
+        WHERE s.is_active = true
+          AND s.expires_at < p_before
+          AND (p_after_expires_at IS NULL OR (s.expires_at, s.id) > (p_after_expires_at, p_after_id))
+        ORDER BY s.expires_at, s.id
+        LIMIT p_limit
+        FOR UPDATE SKIP LOCKED
+    ), updated AS (
+        UPDATE user_sessions s
+        SET is_active = false
+        FROM batch
+        WHERE s.id = batch.id
+        RETURNING batch.expires_at, batch.id
+    )
+    SELECT COUNT(*)::INTEGER,
+           (SELECT u.expires_at FROM updated u ORDER BY u.expires_at DESC, u.id DESC LIMIT 1),
+           (SELECT u.id FROM updated u ORDER BY u.expires_at DESC, u.id DESC LIMIT 1)
+    FROM updated;
+END;
+$$;
+
+COMMENT ON FUNCTION public.deactivate_expired_sessions(TIMESTAMPTZ, TIMESTAMPTZ, UUID, INTEGER) IS 'Deactivate one keyset chunk of expired sessions.';
+
+DROP FUNCTION IF EXISTS public.delete_expired_sessions(TIMESTAMPTZ, TIMESTAMPTZ, UUID, INTEGER);
+
+CREATE OR REPLACE FUNCTION public.delete_expired_sessions(
+    p_before TIMESTAMPTZ,
+    p_after_expires_at TIMESTAMPTZ,
+    p_after_id UUID,
+    p_limit INTEGER
+)
+RETURNS TABLE (processed INTEGER, last_expires_at TIMESTAMPTZ, last_id UUID)
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+#variable_conflict use_column
+BEGIN
+    RETURN QUERY
+    WITH batch AS (
+        SELECT s.id, s.expires_at
+        FROM user_sessions s
+        WHERE s.expires_at < p_before
+          AND (p_after_expires_at IS NULL OR (s.expires_at, s.id) > (p_after_expires_at, p_after_id))
+        ORDER BY s.expires_at, s.id
+        LIMIT p_limit
+        FOR UPDATE SKIP LOCKED
+    ), deleted AS (
+        DELETE FROM user_sessions s
+        USING batch
+        WHERE s.id = batch.id
+        RETURNING batch.expires_at, batch.id
+    )
+    SELECT COUNT(*)::INTEGER,
+           (SELECT d.expires_at FROM deleted d ORDER BY d.expires_at DESC, d.id DESC LIMIT 1),
+           (SELECT d.id FROM deleted d ORDER BY d.expires_at DESC, d.id DESC LIMIT 1)
+    FROM deleted;
+END;
+$$;
+
+COMMENT ON FUNCTION public.delete_expired_sessions(TIMESTAMPTZ, TIMESTAMPTZ, UUID, INTEGER) IS 'Delete one keyset chunk of long-expired sessions.';
+
+-- Only the API (service role) may run maintenance
+REVOKE ALL ON TABLE maintenance_leases FROM anon, authenticated;
+REVOKE EXECUTE ON FUNCTION public.acquire_maintenance_lease(TEXT, TEXT, INTEGER) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION public.deactivate_expired_sessions(TIMESTAMPTZ, TIMESTAMPTZ, UUID, INTEGER) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION public.delete_expired_sessions(TIMESTAMPTZ, TIMESTAMPTZ, UUID, INTEGER) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.acquire_maintenance_lease(TEXT, TEXT, INTEGER) TO service_role;
+GRANT EXECUTE ON FUNCTION public.deactivate_expired_sessions(TIMESTAMPTZ, TIMESTAMPTZ, UUID, INTEGER) TO service_role;
+GRANT EXECUTE ON FUNCTION public.delete_expired_sessions(TIMESTAMPTZ, TIMESTAMPTZ, UUID, INTEGER) TO service_role;
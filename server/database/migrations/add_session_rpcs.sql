@@ -0,0 +1,107 @@
+-- Single-round-trip session procedures for login and token refresh
+-- Run this in your Supabase SQL Editor
+
+-- start_user_session: device-policy check + invalidate other devices + session
+-- upsert in one call. The users row is locked for the duration so two
+-- concurrent logins from different devices can't both win.
+-- Returns 'ok', or 'conflict' when another device holds the active session
+-- (only checked when p_enforce_single_device is true).
+
+DROP FUNCTION IF EXISTS public.start_user_session(UUID, TEXT, JSONB, TEXT, TIMESTAMPTZ, BOOLEAN);
+
+CREATE OR REPLACE FUNCTION public.start_user_session(
+    p_user_id UUID,
+    p_device_id TEXT,
+    p_device_info JSONB,
+    p_refresh_token_hash TEXT,
+    p_expires_at TIMESTAMPTZ,
+    p_enforce_single_device BOOLEAN DEFAULT true
+)
+RETURNS TEXT
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+BEGIN
+    PERFORM 1 FROM users WHERE id = p_user_id FOR UPDATE;
+
+    IF p_enforce_single_device
+       AND EXISTS (SELECT 1 FROM user_sessions WHERE user_id = p_user_id AND is_active = true)
+       AND NOT EXISTS (SELECT 1 FROM user_sessions WHERE user_id = p_user_id AND is_active = true AND device_id = p_device_id)
+    THEN
+        RETURN 'conflict';
+    END IF;
+
+    UPDATE user_sessions
+    SET is_active = false
+    WHERE user_id = p_user_id AND device_id <> p_device_id AND is_active = true;
+
+    INSERT INTO user_sessions (user_id, device_id, device_info, refresh_token_hash, is_active, last_activity, expires_at)
+    VALUES (p_user_id, p_device_id, COALESCE(p_device_info, '{}'::jsonb), p_refresh_token_hash, true, NOW(), p_expires_at)
+    ON CONFLICT (user_id, device_id) DO UPDATE
+    SET device_info = EXCLUDED.device_info,
+        refresh_token_hash = EXCLUDED.refresh_token_hash,
+        is_active = true,
+        last_activity = NOW(),
+        expires_at = EXCLUDED.expires_at;
+
+    RETURN 'ok';
+END;
+$$;
+
+COMMENT ON FUNCTION public.start_user_session(UUID, TEXT, JSONB, TEXT, TIMESTAMPTZ, BOOLEAN) IS 'Login: enforce one-device policy and upsert the session atomically.';
+
+-- rotate_user_session: validate the presented refresh token's session, swap
+-- in the new token hash, deactivate other devices and return the user
+-- profile, in one call. No rows means the session is missing or inactive.
+
+DROP FUNCTION IF EXISTS public.rotate_user_session(UUID, TEXT, TEXT, TEXT, TIMESTAMPTZ);
+
+CREATE OR REPLACE FUNCTION public.rotate_user_session(
+    p_user_id UUID,
+    p_device_id TEXT,
+    p_old_refresh_token_hash TEXT,
+    p_new_refresh_token_hash TEXT,
+    p_expires_at TIMESTAMPTZ
+)
+RETURNS TABLE (device_id TEXT, email TEXT, plan TEXT)
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+#variable_conflict use_column
+DECLARE
+    v_session_id UUID;
+BEGIN
+    UPDATE user_sessions s
+    SET refresh_token_hash = p_new_refresh_token_hash,
+        last_activity = NOW(),
+        expires_at = p_expires_at
+    WHERE s.user_id = p_user_id
+      AND s.device_id = p_device_id
+      AND s.refresh_token_hash = p_old_refresh_token_hash
+      AND s.is_active = true
+    RETURNING s.id INTO v_session_id;
+
+    IF v_session_id IS NULL THEN
+        RETURN;
+    END IF;
+
+    UPDATE user_sessions
+    SET is_active = false
+    WHERE user_id = p_user_id AND id <> v_session_id AND is_active = true;
+
+    RETURN QUERY
+    SELECT p_device_id, u.email::TEXT, u.plan::TEXT
+    FROM users u
+    WHERE u.id = p_user_id;
+END;
+$$;
+
+COMMENT ON FUNCTION public.rotate_user_session(UUID, TEXT, TEXT, TEXT, TIMESTAMPTZ) IS 'Refresh: validate and rotate the refresh token, returning the user profile.';
+
+-- Only the API (service role) may manage sessions
+REVOKE EXECUTE ON FUNCTION public.start_user_session(UUID, TEXT, JSONB, TEXT, TIMESTAMPTZ, BOOLEAN) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION public.rotate_user_session(UUID, TEXT, TEXT, TEXT, TIMESTAMPTZ) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.start_user_session(UUID, TEXT, JSONB, TEXT, TIMESTAMPTZ, BOOLEAN) TO service_role;
+GRANT EXECUTE ON FUNCTION public.rotate_user_session(UUID, TEXT, TEXT, TEXT, TIMESTAMPTZ) TO service_role;
@@ -0,0 +1,53 @@
+-- Atomic monthly usage metering
+-- Run this in your Supabase SQL Editor
+
+-- increment_monthly_usage rolls the usage month over, checks the free-tier
+-- limit and charges usage in a single conditional UPDATE. Concurrent calls
+-- for the same user queue on the row lock and re-evaluate the WHERE clause
+-- against the committed row, so no increment is lost and the limit can't be
+-- overshot. A negative p_count refunds usage (never below zero). Called by the API through PostgREST: POST /rest/v1/rpc/increment_monthly_usage
+
+DROP FUNCTION IF EXISTS public.increment_monthly_usage(UUID, INTEGER, TEXT, INTEGER);
+
+CREATE OR REPLACE FUNCTION public.increment_monthly_usage(
+    p_user_id UUID,
+    p_count INTEGER,
+    p_month TEXT,
+    p_free_limit INTEGER
+)
+RETURNS TABLE (allowed BOOLEAN, monthly_usage INTEGER, usage_month TEXT)
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+#variable_conflict use_column
+BEGIN
+    RETURN QUERY
+    UPDATE users u
+    SET monthly_usage = GREATEST((CASE WHEN u.usage_month IS DISTINCT FROM p_month THEN 0 ELSE COALESCE(u.monthly_usage, 0) END) + p_count, 0),
+        usage_month = p_month
+    WHERE u.id = p_user_id
+      AND (
+          u.plan IS DISTINCT FROM 'free'
+          OR p_free_limit IS NULL
+          OR (CASE WHEN u.usage_month IS DISTINCT FROM p_month THEN 0 ELSE COALESCE(u.monthly_usage, 0) END) + p_count <= p_free_limit
+      )
+    RETURNING true, u.monthly_usage, u.usage_month;
+
+    IF NOT FOUND THEN
+        -- Over the limit (or unknown user): report current usage without charging
+        RETURN QUERY
+        SELECT false,
+               (CASE WHEN u.usage_month IS DISTINCT FROM p_month THEN 0 ELSE COALESCE(u.monthly_usage, 0) END)::INTEGER,
+               p_month
+        FROM users u
+        WHERE u.id = p_user_id;
+    END IF;
+END;
+$$;
+
+COMMENT ON FUNCTION public.increment_monthly_usage(UUID, INTEGER, TEXT, INTEGER) IS 'Atomically roll over usage month, check free-tier limit and increment monthly_usage.';
+
+-- Only the API (service role) may charge usage
+REVOKE EXECUTE ON FUNCTION public.increment_monthly_usage(UUID, INTEGER, TEXT, INTEGER) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.increment_monthly_usage(UUID, INTEGER, TEXT, INTEGER) TO service_role;
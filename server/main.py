@@ -1,48 +1,86 @@
 """Main FastAPI application"""
+import logging
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
-import httpx
 from config.settings import settings
 from chefbot.api.routes import auth, analyze, utility
-from chefbot.services.session_service import SessionService
+from chefbot.services.http_client import upstream_clients
+from chefbot.services.repository import repository
+from chefbot.services.analysis_cache import analysis_cache
+from chefbot.services.job_queue import analysis_jobs
+from chefbot.services.email_outbox import email_outbox
+from chefbot.services.session_activity import session_activity
+from chefbot.services.session_cleanup import session_cleanup
+from chefbot.services.rate_limiter import rate_limiter
+from chefbot.services.profiler import loop_monitor, profiler
+from chefbot.api.middleware import MetricsMiddleware, ProfilerMiddleware, RateLimitMiddleware, RequestLoggingMiddleware
+from chefbot.utils.auth import calibrate_password_hashing, shutdown_password_executor
+from chefbot.utils.log import configure_logging, shutdown_logging
 
-# Initialize session service
-session_service = SessionService()
+configure_logging(settings.LOG_LEVEL, settings.LOG_FORMAT)
+logger = logging.getLogger("chefbot")
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan management"""
     # Startup
-    print("🚀 Starting ChefBot API...")
-    print(f"Provider: {settings.PROVIDER}")
-    print(f"Environment: {'✅ Configured' if settings.SUPABASE_URL and settings.SUPABASE_SERVICE_KEY else '❌ Missing env vars'}")
+    logger.info("Starting ChefBot API", extra={
+        "provider": settings.PROVIDER,
+        "configured": bool(settings.SUPABASE_URL and settings.SUPABASE_SERVICE_KEY),
+    })
     
-    # Test database connection
-    try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{settings.SUPABASE_URL}/rest/v1/users?select=count",
-                headers=settings.SUPABASE_HEADERS
-            )
-            if response.status_code == 200:
-                print("✅ Database connection successful")
-            else:
-                print(f"❌ Database connection failed: {response.status_code}")
-    except Exception as e:
-        print(f"❌ Database connection error: {str(e)}")
+    # Pick bcrypt cost for this host before any password is hashed
+    await calibrate_password_hashing()
+    
+    # Open pooled upstream connections
+    await upstream_clients.start()
+    await repository.start()
+    logger.info("Data backend ready", extra={"backend": repository.name})
     
-    # Cleanup old sessions on startup
+    # Test database connection (also warms up the Supabase pool)
     try:
-        await session_service.cleanup_expired_sessions()
-        print("✅ Cleaned up expired sessions")
+        response = await upstream_clients.supabase.get("/users?select=count")
+        if response.status_code == 200:
+            logger.info("Database connection successful")
+        else:
+            logger.error("Database connection failed", extra={"status": response.status_code})
     except Exception as e:
-        print(f"⚠️ Failed to cleanup expired sessions: {str(e)}")
+        logger.error("Database connection error: %s", e)
+    
+    # Cleanup expired sessions now and then every interval (one worker at a time)
+    if settings.SESSION_CLEANUP_ENABLED:
+        await session_cleanup.start()
+    
+    # Start analysis job workers (re-queues jobs left over from the last run)
+    await analysis_jobs.start(analyze.run_analysis_job)
+    
+    # Start the email outbox worker (sends anything queued before a restart)
+    await email_outbox.start()
+    
+    # Start the session last_activity flusher
+    if settings.SESSION_ACTIVITY_ENABLED:
+        await session_activity.start()
+    
+    # Watch for event-loop stalls (can also be switched on at runtime)
+    if settings.LOOP_MONITOR_ENABLED:
+        await loop_monitor.start()
     
     yield
     
     # Shutdown
-    print("🛑 Shutting down ChefBot API...")
+    logger.info("Shutting down ChefBot API")
+    await loop_monitor.stop()
+    await session_cleanup.stop()
+    await analysis_jobs.stop()
+    await email_outbox.stop()
+    await session_activity.stop()  # final flush needs the repository
+    await repository.close()
+    await upstream_clients.close()
+    analysis_cache.close()
+    rate_limiter.close()
+    shutdown_password_executor()
+    shutdown_logging()
 
 # Create FastAPI application
 app = FastAPI(
@@ -70,6 +108,11 @@ app = FastAPI(
     ]
 )
 
+# Rate limit analysis uploads before the body is read (added first so CORS
+# headers still wrap its 429 responses)
+if settings.RATE_LIMIT_ENABLED:
+    app.add_middleware(RateLimitMiddleware, limiter=rate_limiter)
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -79,10 +122,21 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Wraps CORS and rate limiting, so latency covers them and 429s are counted
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
+# Sampled/admin-requested profiling (inside the logging middleware, so profiles carry the request id)
+app.add_middleware(ProfilerMiddleware, profiler=profiler, admin_token=settings.PROFILER_ADMIN_TOKEN)
+
+# Request id and timing spans for everything below, one log line per request
+app.add_middleware(RequestLoggingMiddleware)
+
 # Include routers
 app.include_router(auth.router)
 app.include_router(analyze.router)
 app.include_router(utility.router)
+app.include_router(utility.metrics_router)
 
 # Root endpoint
 @app.get("/")